@@ -17,9 +17,16 @@ data/
   │       └── {expert_username}/
   │           ├── comments.json
   │           ├── comments.enriched.json
+  │           ├── comments.enriched.json.journal   (results not yet compacted into comments.enriched.json)
+  │           ├── comments.enriched.json.batch   (ENRICHMENT_MODE=batch: pending batch ID and attempts)
   │           └── comments.json.state
-  └── python/
-      └── ...
+  ├── python/
+  │   └── ...
+  ├── hunks/
+  │   └── {hash[:2]}/{hash}.diff   (full diff hunks when HUNK_COMPACTION=true)
+  ├── llm_cache.sqlite   (model responses keyed by prompt hash, shared with tone analysis)
+  ├── embedding_cache.sqlite   (embedding vectors keyed by model and text hash)
+  └── local_classifier.json   (optional model saved by src/local_classifier.py)
 """
 
 import os
@@ -36,7 +43,14 @@ from dotenv import load_dotenv
 from src.expert_finder import GitHubExpertFinder
 from src.comment_crawler import GitHubCommentCrawler
 from src.comment_enricher import CommentEnricher
+from src.batch_enricher import BatchEnricher
 from src.embedding_importer import CommentEmbedder
+from src.comment_filter import CommentFilter
+from src.near_dedup import NearDuplicateIndex, NearDuplicateDetector
+from src.hunk_store import HunkStore, compact_file
+from src.llm_cache import LLMResponseCache
+from src.embedding_cache import EmbeddingCache
+from src.local_classifier import LocalClassifier, load_enriched_corpus
 
 # Load environment variables from .env file
 load_dotenv()
@@ -65,7 +79,7 @@ class GitHubDataPipeline:
             qdrant_url (str, optional): URL to Qdrant server
             qdrant_key (str, optional): API key for Qdrant authentication
             openai_model (str, optional): OpenAI model for comment enrichment
-            embedding_model (str, optional): OpenAI model for embeddings
+            embedding_model (str, optional): Model for embeddings (default: the embedding backend's)
         """
         # Load GitHub tokens from .env file if not provided
         if github_tokens is None:
@@ -93,8 +107,16 @@ class GitHubDataPipeline:
         self.qdrant_url = qdrant_url or os.getenv("QDRANT_URL", "http://localhost:6333")
         self.qdrant_key = qdrant_key or os.getenv("QDRANT_API_KEY")
         self.openai_model = openai_model or os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-        self.embedding_model = embedding_model or os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+        self.embedding_backend = os.getenv("EMBEDDING_BACKEND", "openai").lower()
+        # Empty means the backend's default model
+        self.embedding_model = embedding_model or os.getenv("EMBEDDING_MODEL") or None
         self.use_rest_api = os.getenv("USE_REST_API", "false").lower() == "true"
+        self.near_dedup = os.getenv("NEAR_DEDUP", "false").lower() == "true"
+        self.near_dedup_threshold = float(os.getenv("NEAR_DEDUP_THRESHOLD", "0.8"))
+        self.near_dedup_embeddings = os.getenv("NEAR_DEDUP_EMBEDDINGS", "share").lower()
+        self.hunk_compaction = os.getenv("HUNK_COMPACTION", "false").lower() == "true"
+        self.hunk_window_lines = int(os.getenv("HUNK_WINDOW_LINES", "10"))
+        self.use_local_classifier = os.getenv("LOCAL_CLASSIFIER", "false").lower() == "true"
 
         # Validate required keys
         if not self.github_tokens:
@@ -106,20 +128,101 @@ class GitHubDataPipeline:
         # Create output directory if it doesn't exist
         os.makedirs(self.output_dir, exist_ok=True)
         
+        # Content-addressed store for full diff hunks, shared by all languages
+        self.hunk_store = HunkStore(os.path.join(self.output_dir, "hunks"))
+        
+        # Responses to identical prompts (temperature 0) are reused across runs and languages
+        self.llm_cache = None
+        if os.getenv("LLM_CACHE", "false").lower() == "true":
+            self.llm_cache = LLMResponseCache(
+                os.path.join(self.output_dir, "llm_cache.sqlite"),
+                max_bytes=int(os.getenv("LLM_CACHE_MAX_MB", "256")) * 1024 * 1024,
+                bypass=os.getenv("LLM_CACHE_BYPASS", "false").lower() == "true"
+            )
+        
+        # Vectors of unchanged comment text are reused across runs and collections
+        self.embedding_cache = None
+        if os.getenv("EMBEDDING_CACHE", "false").lower() == "true":
+            self.embedding_cache = EmbeddingCache(
+                os.path.join(self.output_dir, "embedding_cache.sqlite"),
+                max_bytes=int(os.getenv("EMBEDDING_CACHE_MAX_MB", "1024")) * 1024 * 1024,
+                bypass=os.getenv("EMBEDDING_CACHE_BYPASS", "false").lower() == "true"
+            )
+        
         # Initialize components with all tokens
         self.expert_finder = GitHubExpertFinder(self.github_tokens)  # Pass all tokens to expert finder for rotation
-        self.comment_crawler = GitHubCommentCrawler(self.github_tokens)  # Comment crawler can use all tokens
+        self.comment_filter = CommentFilter(rules=os.getenv("COMMENT_FILTER_RULES"))
+        self.comment_crawler = GitHubCommentCrawler(self.github_tokens, self.comment_filter)  # Comment crawler can use all tokens
         self.comment_enricher = CommentEnricher(
             api_key=self.openai_key,
-            model=self.openai_model
+            model=self.openai_model,
+            batch_size=int(os.getenv("ENRICHMENT_BATCH_SIZE", "1")),
+            batch_token_budget=int(os.getenv("ENRICHMENT_BATCH_TOKEN_BUDGET", "6000")),
+            concurrency=int(os.getenv("ENRICHMENT_CONCURRENCY", "1")),
+            requests_per_minute=int(os.getenv("OPENAI_RPM", "500")),
+            tokens_per_minute=int(os.getenv("OPENAI_TPM", "200000")),
+            base_url=os.getenv("OPENAI_BASE_URL"),
+            journal_compact_every=int(os.getenv("ENRICHMENT_JOURNAL_COMPACT_EVERY", "100")),
+            llm_cache=self.llm_cache,
+            diff_token_budget=int(os.getenv("ENRICHMENT_DIFF_TOKEN_BUDGET", "300")),
+            comment_token_budget=int(os.getenv("ENRICHMENT_COMMENT_TOKEN_BUDGET", "500")),
+            structured_output=os.getenv("ENRICHMENT_STRUCTURED_OUTPUT", "false").lower() == "true",
+            escalation_model=os.getenv("ENRICHMENT_ESCALATION_MODEL") or None,
+            escalation_threshold=float(os.getenv("ENRICHMENT_ESCALATION_THRESHOLD", "0.8"))
         )
+        # "sync" enriches immediately; "batch" submits to the Batch API and merges on later runs
+        self.enrichment_mode = os.getenv("ENRICHMENT_MODE", "sync").lower()
+        self.batch_enricher = BatchEnricher(
+            self.comment_enricher,
+            max_attempts=int(os.getenv("ENRICHMENT_BATCH_MAX_ATTEMPTS", "3"))
+        )
+        # Re-enrich failed records (enrichment_failed or missing fields) after each enrichment
+        self.enrichment_repair = os.getenv("ENRICHMENT_REPAIR", "false").lower() == "true"
+        self.enrichment_repair_max_attempts = int(os.getenv("ENRICHMENT_REPAIR_MAX_ATTEMPTS", "3"))
+        self.enrichment_repair_max_seconds = float(os.getenv("ENRICHMENT_REPAIR_MAX_SECONDS", "300"))
+        
+        # Local pre-classifier trained on every comment enriched so far
+        self.local_classifier = None
+        if self.use_local_classifier:
+            self.local_classifier = LocalClassifier(
+                min_confidence=float(os.getenv("LOCAL_CLASSIFIER_MIN_CONFIDENCE", "0.9")),
+                audit_rate=float(os.getenv("LOCAL_CLASSIFIER_AUDIT_RATE", "0.05"))
+            )
+            used = self.local_classifier.train(load_enriched_corpus(self.output_dir))
+            logger.info(f"Local classifier trained on {used} enriched comments")
         self.embedder = CommentEmbedder(
             openai_api_key=self.openai_key,
             embedding_model=self.embedding_model,
             qdrant_url=self.qdrant_url,
-            qdrant_api_key=self.qdrant_key
+            qdrant_api_key=self.qdrant_key,
+            near_duplicate_mode=self.near_dedup_embeddings if self.near_dedup else "embed",
+            embedding_batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", "256")),
+            embedding_token_budget=int(os.getenv("EMBEDDING_TOKEN_BUDGET", "100000")),
+            embedding_cache=self.embedding_cache,
+            incremental=os.getenv("EMBEDDING_INCREMENTAL", "true").lower() == "true",
+            embedding_dimensions=int(os.getenv("EMBEDDING_DIMENSIONS") or 0) or None,
+            embedding_backend=self.embedding_backend,
+            local_runtime=os.getenv("EMBEDDING_LOCAL_RUNTIME", "torch"),
+            embedding_threads=int(os.getenv("EMBEDDING_THREADS") or 0) or None,
+            embedding_template=os.getenv("EMBEDDING_TEMPLATE", "compact-v2"),
+            embedding_text_token_budget=int(os.getenv("EMBEDDING_TEXT_TOKEN_BUDGET", "512")),
+            embedding_diff_lines=int(os.getenv("EMBEDDING_DIFF_LINES", "10")),
+            chunk_tokens=int(os.getenv("EMBEDDING_CHUNK_TOKENS", "2048")),
+            chunk_overlap=int(os.getenv("EMBEDDING_CHUNK_OVERLAP", "200")),
+            pool_chunks=os.getenv("EMBEDDING_POOL_CHUNKS", "true").lower() == "true",
+            upload_workers=int(os.getenv("QDRANT_UPLOAD_WORKERS", "4")),
+            prefer_grpc=os.getenv("QDRANT_PREFER_GRPC", "false").lower() == "true",
+            collection_profile=os.getenv("QDRANT_COLLECTION_PROFILE", "default"),
+            hnsw_m=int(os.getenv("QDRANT_HNSW_M") or 0) or None,
+            hnsw_ef_construct=int(os.getenv("QDRANT_HNSW_EF_CONSTRUCT") or 0) or None,
+            payload_indexes=[field.strip() for field in os.getenv(
+                "QDRANT_PAYLOAD_INDEXES", "expert_name,language,framework,review_type,repo,parent_id"
+            ).split(",") if field.strip()]
         )
         
+        # Near-duplicate indexes shared by all experts of a language
+        self.near_dedup_language_indexes = {}  # language -> NearDuplicateIndex
+        
         # Task management
         self.active_tasks = set()
         self.max_concurrent_tasks = int(os.getenv("MAX_CONCURRENT_TASKS", "5"))
@@ -145,6 +248,14 @@ class GitHubDataPipeline:
         """Get the directory path for a specific expert within a language."""
         return os.path.join(self.get_language_dir(language), "experts", username)
     
+    def record_embedding_stats(self, stats: Dict[str, int]) -> None:
+        """Add the counts of one process_and_upload run to the pipeline results."""
+        totals = self.results.setdefault("embedding", {})
+        for key, value in stats.items():
+            totals[key] = totals.get(key, 0) + value
+        if totals.get("upload_seconds"):
+            totals["vectors_per_second"] = round(totals["uploaded_vectors"] / totals["upload_seconds"], 1)
+    
     def get_experts_file_path(self, language: str) -> str:
         """Get the path to the experts.json file for a specific language."""
         return os.path.join(self.get_language_dir(language), "experts.json")
@@ -311,9 +422,41 @@ class GitHubDataPipeline:
                 logger.error(f"Error removing empty directory for {username}: {e}")
             return None
         
+        # Trim diff hunks to a window ending at the commented line; full hunks go to the hunk store
+        if self.hunk_compaction:
+            size_before, size_after = await asyncio.to_thread(
+                compact_file, output_file, self.hunk_store, self.hunk_window_lines
+            )
+            logger.info(f"Compacted diff hunks for {username}: {size_before} -> {size_after} bytes")
+        
         logger.info(f"Collected {len(comments)} comments for {username}")
         return comments
     
+    def get_near_dedup_detector(self, language: str, username: str) -> Optional[NearDuplicateDetector]:
+        """
+        Build the near-duplicate detector for an expert (expert index first, then language index).
+        
+        Args:
+            language (str): Programming language
+            username (str): GitHub username
+            
+        Returns:
+            NearDuplicateDetector: Detector, or None if near-duplicate suppression is disabled
+        """
+        if not self.near_dedup:
+            return None
+        
+        if language not in self.near_dedup_language_indexes:
+            self.near_dedup_language_indexes[language] = NearDuplicateIndex(
+                os.path.join(self.get_language_dir(language), "near_dedup_index.json"),
+                threshold=self.near_dedup_threshold
+            )
+        expert_index = NearDuplicateIndex(
+            os.path.join(self.get_expert_dir(language, username), "near_dedup_index.json"),
+            threshold=self.near_dedup_threshold
+        )
+        return NearDuplicateDetector([expert_index, self.near_dedup_language_indexes[language]])
+    
     async def enrich_comments(self, username: str, language: str,
                               continue_enrichment: bool = True) -> Optional[List[Dict[str, Any]]]:
         """
@@ -337,16 +480,49 @@ class GitHubDataPipeline:
             return None
         
         # Run in a thread to avoid blocking the event loop
-        enriched_comments = await asyncio.to_thread(
-            self.comment_enricher.enrich_comments,
-            input_file=input_file,
-            output_file=output_file,
-            continue_enrichment=continue_enrichment
-        )
+        if self.enrichment_mode == "batch":
+            enriched_comments = await asyncio.to_thread(
+                self.batch_enricher.enrich_comments,
+                input_file=input_file,
+                output_file=output_file,
+                near_dedup=self.get_near_dedup_detector(language, username),
+                local_classifier=self.local_classifier
+            )
+        else:
+            enriched_comments = await asyncio.to_thread(
+                self.comment_enricher.enrich_comments,
+                input_file=input_file,
+                output_file=output_file,
+                continue_enrichment=continue_enrichment,
+                near_dedup=self.get_near_dedup_detector(language, username),
+                local_classifier=self.local_classifier
+            )
+        
+        # Retry only the records that failed or lack classification fields (in batch mode
+        # once the batch is merged, including comments that failed every submission)
+        if self.enrichment_repair and not self.is_batch_pending(language, username):
+            repair_stats = await asyncio.to_thread(
+                self.comment_enricher.repair_enriched,
+                output_file,
+                max_attempts=self.enrichment_repair_max_attempts,
+                max_seconds=self.enrichment_repair_max_seconds
+            )
+            totals = self.results.setdefault("enrichment_repair", {})
+            for key, value in repair_stats.items():
+                totals[key] = totals.get(key, 0) + value
+            if repair_stats["repaired"]:
+                enriched_comments = self.comment_enricher.load_enriched(output_file)
         
         logger.info(f"Enriched {len(enriched_comments)} comments for {username}")
         return enriched_comments
     
+    def is_batch_pending(self, language: str, username: str) -> bool:
+        """Whether an expert has an enrichment batch that is not merged yet (ENRICHMENT_MODE=batch)."""
+        if self.enrichment_mode != "batch":
+            return False
+        output_file = os.path.join(self.get_expert_dir(language, username), "comments.enriched.json")
+        return self.batch_enricher.is_pending(output_file)
+    
     async def create_embeddings(self, username: str, language: str, collection_name: str) -> bool:
         """
         Create embeddings and import to Qdrant.
@@ -369,11 +545,12 @@ class GitHubDataPipeline:
         
         # Run in a thread to avoid blocking the event loop
         try:
-            await asyncio.to_thread(
+            stats = await asyncio.to_thread(
                 self.embedder.process_and_upload,
                 input_file=input_file,
                 collection_name=collection_name
             )
+            self.record_embedding_stats(stats)
             logger.info(f"Successfully created embeddings for {username} and imported to Qdrant")
             return True
         except Exception as e:
@@ -454,6 +631,13 @@ class GitHubDataPipeline:
                 continue_enrichment=continue_enrichment
             )
             
+            if self.is_batch_pending(language, username):
+                # Embedding now would leave out the comments still being classified
+                logger.info(f"Enrichment batch pending for {username}; embedding on a later run")
+                self.results.setdefault("batch_pending_experts", []).append(username)
+                self.active_tasks.discard(username)
+                return
+            
             if not enriched:
                 logger.warning(f"No enriched comments for {username}")
                 self.results["experts_failed"] += 1
@@ -521,14 +705,10 @@ class GitHubDataPipeline:
                     collection_name=collection_name
                 )
                 
-                # Handle the case where process_and_upload doesn't return a value
-                # We'll use the log message to infer success and the comment count for records
-                records_uploaded = comment_count  # Assume all records uploaded if no errors
-                
-                logger.info(f"Successfully processed embeddings for {username} (estimated {records_uploaded} records)")
+                self.record_embedding_stats(result)
+                logger.info(f"Successfully processed embeddings for {username} ({comment_count} records: "
+                            f"{result['new']} new, {result['updated']} updated, {result['unchanged']} unchanged)")
                 
-                # Mark as successful even if the return value is None
-                # as long as no exception was raised
                 self.results["experts_processed"] += 1
                 self.results["successful_experts"].append(username)
                 
@@ -725,6 +905,19 @@ class GitHubDataPipeline:
         duration = end_time - start_time
         self.results["end_time"] = end_time.isoformat()
         self.results["duration_seconds"] = duration.total_seconds()
+        self.results["comment_filter"] = self.comment_filter.get_stats()
+        if self.llm_cache:
+            self.results["llm_cache"] = self.llm_cache.get_stats()
+        if self.embedding_cache:
+            self.results["embedding_cache"] = self.embedding_cache.get_stats()
+        self.results["prompt_tokens"] = self.comment_enricher.get_prompt_token_stats()
+        self.results["embedding_text_tokens"] = self.embedder.text_token_stats.summary()
+        self.results["embedding_text_truncations"] = self.embedder.get_truncation_stats()
+        self.results["enrichment_usage"] = self.comment_enricher.get_usage_stats()
+        if self.comment_enricher.escalation_model:
+            self.results["enrichment_cascade"] = self.comment_enricher.get_cascade_stats()
+        if self.local_classifier:
+            self.results["local_classifier"] = self.local_classifier.get_stats()
         
         # Save results in language directory
         results_file = os.path.join(self.get_language_dir(language), "pipeline_results.json")
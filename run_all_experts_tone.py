@@ -8,6 +8,7 @@ import shutil
 from dotenv import load_dotenv
 from datetime import datetime
 from src.tone_pipeline import ToneAnalysisPipeline
+from src.llm_cache import LLMResponseCache
 
 # Setup logging
 logging.basicConfig(
@@ -175,6 +176,13 @@ def main():
                         help="Process only this language (e.g. 'php')")
     parser.add_argument("--expert", type=str,
                         help="Process only this expert (must use with --language)")
+    parser.add_argument("--cache", action="store_true",
+                        default=os.getenv("LLM_CACHE", "false").lower() == "true",
+                        help="Reuse model responses from the LLM response cache (default: LLM_CACHE, off)")
+    parser.add_argument("--cache-file", type=str,
+                        help="SQLite file caching model responses; implies --cache (default: <data-dir>/llm_cache.sqlite)")
+    parser.add_argument("--bypass-cache", action="store_true",
+                        help="Ignore cached responses (fresh answers are still written to the cache)")
     
     args = parser.parse_args()
     
@@ -202,11 +210,21 @@ def main():
         
         logger.info(f"Will analyze {len(files_to_analyze)} expert files")
         
+        # Responses are shared with comment enrichment through the same cache file
+        llm_cache = None
+        if args.cache or args.cache_file:
+            llm_cache = LLMResponseCache(
+                args.cache_file or os.path.join(args.data_dir, "llm_cache.sqlite"),
+                max_bytes=int(os.getenv("LLM_CACHE_MAX_MB", "256")) * 1024 * 1024,
+                bypass=args.bypass_cache or os.getenv("LLM_CACHE_BYPASS", "false").lower() == "true"
+            )
+        
         # Create pipeline
         pipeline = ToneAnalysisPipeline(
             api_key=api_key,
             model=args.model,
-            data_dir=args.data_dir
+            data_dir=args.data_dir,
+            llm_cache=llm_cache
         )
         
         # Process each file
@@ -219,6 +237,8 @@ def main():
                 logger.error(f"Error analyzing {file_info[0]}: {e}")
         
         logger.info(f"All analysis complete! Processed {len(results)} files")
+        if llm_cache:
+            logger.info(f"LLM cache stats: {llm_cache.get_stats()}")
         return 0
         
     except Exception as e:
@@ -0,0 +1,333 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import io
+import json
+import logging
+import argparse
+from datetime import datetime
+
+from comment_enricher import CommentEnricher, MalformedBatchError
+
+logger = logging.getLogger(__name__)
+
+class BatchEnricher:
+    """
+    Offline Batch API mode for CommentEnricher: submit, poll and merge.
+
+    On the first run every pending comment request is written to a JSONL file and
+    submitted as one batch; the batch ID is kept next to the enriched output. Later
+    runs poll the batch and, once it has finished, merge the results into the
+    enriched output by comment_url and resubmit the comments whose request failed.
+    A comment that failed max_attempts times is written out marked with
+    enrichment_failed (as repair_enriched does) instead of being billed again.
+    Works against any OpenAI-compatible files/batches endpoint, including a local
+    stand-in via the enricher's base_url.
+    """
+
+    ENDPOINT = "/v1/chat/completions"
+    COMPLETION_WINDOW = "24h"
+    ACTIVE_STATUSES = ("validating", "in_progress", "finalizing", "cancelling")
+
+    def __init__(self, enricher, max_attempts=3):
+        """
+        Initialize with the enricher providing the client, model and prompts.
+
+        Args:
+            enricher (CommentEnricher): Configured comment enricher
+            max_attempts (int): Submissions per comment before it is marked failed
+        """
+        self.enricher = enricher
+        self.client = enricher.client
+        self.max_attempts = max_attempts
+
+    def state_file(self, output_file):
+        """Return the path of the batch state file for an output file."""
+        return f"{output_file}.batch"
+
+    def _load_state(self, output_file):
+        state_file = self.state_file(output_file)
+        if not os.path.exists(state_file):
+            return None
+        try:
+            with open(state_file, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading batch state {state_file}: {e}")
+            return None
+
+    def _save_state(self, output_file, state):
+        with open(self.state_file(output_file), "w") as f:
+            json.dump(state, f, indent=2)
+
+    def is_pending(self, output_file):
+        """Whether a submitted batch for an output file has not been merged yet."""
+        state = self._load_state(output_file)
+        return bool(state and state.get("batch_id"))
+
+    def build_requests(self, pending, attempts=None):
+        """
+        Build one batch request line per enrichment request.
+
+        Comments are packed with the enricher's batch_size and token budget, so a
+        line may classify several comments.
+
+        Args:
+            pending (list): Review comment objects still to enrich
+            attempts (dict, optional): Failed submissions so far by comment_url; lines with
+                a previously failed comment are recorded as resubmitted prompts
+
+        Returns:
+            tuple: (JSONL lines, mapping of custom_id -> list of comment URLs)
+        """
+        lines = []
+        requests_map = {}
+        attempts = attempts or {}
+        for i, batch in enumerate(self.enricher.make_batches(pending)):
+            custom_id = f"request-{i}"
+            kind = "resubmit" if any(review.get("comment_url") in attempts for review in batch) else "first_pass"
+            lines.append(json.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": self.ENDPOINT,
+                "body": self.enricher.build_request(batch, kind),
+            }, ensure_ascii=False))
+            requests_map[custom_id] = [review.get("comment_url") for review in batch]
+        return lines, requests_map
+
+    def submit(self, pending, output_file, attempts=None):
+        """
+        Write pending requests to a JSONL file and submit them as a batch.
+
+        Args:
+            pending (list): Review comment objects still to enrich
+            output_file (str): Path to the enriched output file
+            attempts (dict, optional): Failed submissions so far by comment_url
+
+        Returns:
+            dict: Persisted batch state
+        """
+        lines, requests_map = self.build_requests(pending, attempts)
+        input_path = f"{output_file}.batch_input.jsonl"
+        content = "\n".join(lines) + "\n"
+        with open(input_path, "w", encoding="utf-8") as f:
+            f.write(content)
+
+        uploaded = self.client.files.create(
+            file=(os.path.basename(input_path), io.BytesIO(content.encode("utf-8"))),
+            purpose="batch"
+        )
+        batch = self.client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint=self.ENDPOINT,
+            completion_window=self.COMPLETION_WINDOW
+        )
+
+        state = {
+            "batch_id": batch.id,
+            "input_file_id": uploaded.id,
+            "submitted_at": datetime.now().isoformat(),
+            "requests": requests_map,
+            "attempts": attempts or {},
+        }
+        self._save_state(output_file, state)
+        logger.info(f"Submitted batch {batch.id} with {len(lines)} requests for {len(pending)} comments")
+        return state
+
+    def _parse_output(self, text, state, reviews_by_url):
+        """
+        Parse a batch output file into classifications keyed by comment_url.
+
+        Args:
+            text (str): Content of the batch output file
+            state (dict): Persisted batch state
+            reviews_by_url (dict): Input reviews keyed by comment_url
+
+        Returns:
+            dict: comment_url -> classification
+        """
+        classifications = {}
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                # Its comments are missing from the result and count as a failed attempt
+                logger.warning(f"Skipping unreadable batch output line: {e}")
+                continue
+            urls = state["requests"].get(record.get("custom_id"), [])
+            response = record.get("response") or {}
+            if record.get("error") or response.get("status_code") != 200:
+                error = record.get("error") or (response.get("body") or {}).get("error")
+                logger.warning(f"Batch request {record.get('custom_id')} failed "
+                               f"(status {response.get('status_code')}): {error}")
+                continue
+
+            self.enricher.record_usage(response["body"].get("usage"))
+            try:
+                content = response["body"]["choices"][0]["message"]["content"].strip()
+                results = self.enricher.parse_response(content, len(urls))
+            except (MalformedBatchError, KeyError, IndexError, AttributeError) as e:
+                # Counted as a failed attempt of these comments by the caller
+                logger.warning(f"Batch request {record.get('custom_id')}: {e}")
+                continue
+            classifications.update(zip(urls, results))
+
+        return {url: value for url, value in classifications.items() if url in reviews_by_url}
+
+    def enrich_comments(self, input_file, output_file=None, near_dedup=None, local_classifier=None):
+        """
+        Advance batch enrichment for one comment file.
+
+        Polls an outstanding batch and, once it has finished, merges it. Then
+        submits every comment still missing from the output as a new batch; use
+        is_pending() to tell whether the output is complete.
+
+        Args:
+            input_file (str): Path to JSON file containing comments
+            output_file (str, optional): Path to output file. Default is input_file + ".enriched"
+            near_dedup (NearDuplicateDetector, optional): Copies enrichment from already classified
+                near-duplicates instead of submitting them
+            local_classifier (LocalClassifier, optional): Answers confidently classifiable comments
+                instead of submitting them
+
+        Returns:
+            list: Comments enriched so far
+        """
+        if not output_file:
+            output_file = self.enricher.default_output_file(input_file)
+
+        try:
+            with open(input_file, "r", encoding="utf-8") as f:
+                reviews = json.load(f)
+        except Exception as e:
+            logger.error(f"Error reading input file: {e}")
+            return []
+
+        enriched_reviews = self.enricher.load_enriched(output_file)
+        reviews_by_url = {review.get("comment_url"): review for review in reviews}
+
+        state = self._load_state(output_file) or {}
+        attempts = state.get("attempts", {})
+        if state.get("batch_id"):
+            batch = self.client.batches.retrieve(state["batch_id"])
+            if batch.status in self.ACTIVE_STATUSES:
+                logger.info(f"Batch {batch.id} is {batch.status}; {len(enriched_reviews)} comments enriched so far")
+                return enriched_reviews
+
+            classifications = {}
+            if batch.output_file_id:
+                output_text = self.client.files.content(batch.output_file_id).text
+                classifications = self._parse_output(output_text, state, reviews_by_url)
+
+            merged = 0
+            failed = 0
+            processed_urls = {review.get("comment_url") for review in enriched_reviews}
+            for urls in state["requests"].values():
+                for url in urls:
+                    if url in processed_urls or url not in reviews_by_url:
+                        continue
+                    review = reviews_by_url[url]
+                    classification = classifications.get(url)
+                    if classification is not None:
+                        enriched_reviews.append({**review, **classification})
+                        if local_classifier:
+                            local_classifier.observe(review, classification)
+                        if near_dedup:
+                            near_dedup.register(review, classification)
+                        attempts.pop(url, None)
+                        merged += 1
+                        continue
+                    # Failed, expired or unparsable: resubmitted until max_attempts
+                    attempts[url] = attempts.get(url, 0) + 1
+                    if attempts[url] >= self.max_attempts:
+                        enriched_reviews.append({**review, "enrichment_failed": True,
+                                                 "enrichment_attempts": attempts.pop(url)})
+                        failed += 1
+                    processed_urls.add(url)
+            self.enricher.save_enriched(enriched_reviews, output_file)
+
+            logger.info(f"Batch {batch.id} {batch.status}: merged {merged} classifications into {output_file}"
+                        f"{f', marked {failed} comments failed after {self.max_attempts} attempts' if failed else ''}")
+            if near_dedup:
+                near_dedup.save()
+            os.remove(self.state_file(output_file))
+
+        # Submit every comment that is still missing from the output
+        processed_urls = {review.get("comment_url") for review in enriched_reviews}
+        pending = []
+        for review in reviews:
+            if review.get("comment_url") in processed_urls:
+                continue
+            if near_dedup:
+                representative_url, enrichment, _ = near_dedup.find(review)
+                if representative_url:
+                    enriched_reviews.append({**review, **enrichment, "near_duplicate_of": representative_url})
+                    continue
+            if local_classifier:
+                classification = local_classifier.classify(review)
+                if classification:
+                    enriched_reviews.append({**review, **classification, "classified_by": "local"})
+                    continue
+            pending.append(review)
+
+        if near_dedup or local_classifier:
+            self.enricher.save_enriched(enriched_reviews, output_file)
+            if near_dedup:
+                near_dedup.save()
+
+        if pending:
+            self.submit(pending, output_file, attempts)
+        else:
+            logger.info(f"Nothing left to enrich for {input_file}")
+        return enriched_reviews
+
+
+def main():
+    """Main function to run batch enrichment from command line."""
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Enrich GitHub comments through the OpenAI Batch API")
+    parser.add_argument("--input", type=str, required=True,
+                        help="Path to JSON file containing comments")
+    parser.add_argument("--output", type=str,
+                        help="Path to output file (default: <input>.enriched.json)")
+    parser.add_argument("--api-key", type=str,
+                        help="OpenAI API key (or use OPENAI_API_KEY env variable)")
+    parser.add_argument("--base-url", type=str, default=os.getenv("OPENAI_BASE_URL"),
+                        help="OpenAI-compatible API base URL, e.g. a local stand-in")
+    parser.add_argument("--model", type=str, default="gpt-4o-mini",
+                        help="OpenAI model to use (default: gpt-4o-mini)")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="Maximum comments classified per request line (default: 1)")
+    parser.add_argument("--max-attempts", type=int, default=3,
+                        help="Submissions per comment before it is marked failed (default: 3)")
+
+    args = parser.parse_args()
+
+    try:
+        enricher = CommentEnricher(
+            api_key=args.api_key,
+            model=args.model,
+            batch_size=args.batch_size,
+            base_url=args.base_url
+        )
+        batch_enricher = BatchEnricher(enricher, max_attempts=args.max_attempts)
+        enriched = batch_enricher.enrich_comments(
+            input_file=args.input,
+            output_file=args.output
+        )
+        output_file = args.output or enricher.default_output_file(args.input)
+        pending = " (batch pending)" if batch_enricher.is_pending(output_file) else ""
+        print(f"{len(enriched)} comments enriched so far{pending}")
+        return 0
+    except Exception as e:
+        logger.error(f"Error: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenAI files and batches endpoints used by batch_enricher.py.
+
+Batches are answered without a model: every request line gets a fixed, valid
+classification, except lines holding a comment that contains the fail marker,
+which come back as failed requests. A batch reports "in_progress" for the first
+`polls` retrieves and "completed" after that, so polling is exercised too.
+
+    python src/batch_stand_in.py --port 8090
+    python src/batch_enricher.py --input comments.json --base-url http://127.0.0.1:8090/v1 --api-key local
+    python src/batch_stand_in.py --self-check
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import json
+import time
+import uuid
+import logging
+import argparse
+import tempfile
+import threading
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from local_classifier import LocalClassifier
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DEFAULT_FAIL_MARKER = "[fail]"
+
+
+class BatchStandIn:
+    """In-memory files and batches of the stand-in server."""
+
+    def __init__(self, polls=1, fail_marker=DEFAULT_FAIL_MARKER):
+        """
+        Initialize an empty store.
+
+        Args:
+            polls (int): Retrieves a batch answers "in_progress" before it completes
+            fail_marker (str): Comments containing this text make their request line fail
+        """
+        self.polls = polls
+        self.fail_marker = fail_marker
+        self.files = {}  # file_id -> {"filename", "purpose", "content"}
+        self.batches = {}  # batch_id -> batch object
+        self._retrieves = {}  # batch_id -> retrieves so far
+        self._lock = threading.Lock()
+
+    def create_file(self, filename, purpose, content):
+        """Store an uploaded file and return its file object."""
+        file_id = f"file-{uuid.uuid4().hex[:24]}"
+        with self._lock:
+            self.files[file_id] = {"filename": filename, "purpose": purpose, "content": content}
+        return self._file_object(file_id)
+
+    def _file_object(self, file_id):
+        stored = self.files[file_id]
+        return {
+            "id": file_id, "object": "file", "bytes": len(stored["content"]), "created_at": int(time.time()),
+            "filename": stored["filename"], "purpose": stored["purpose"], "status": "processed",
+        }
+
+    def create_batch(self, input_file_id, endpoint, completion_window):
+        """Register a batch over an uploaded input file and return the batch object."""
+        if input_file_id not in self.files:
+            raise KeyError(f"No such file: {input_file_id}")
+        batch_id = f"batch_{uuid.uuid4().hex[:24]}"
+        batch = {
+            "id": batch_id, "object": "batch", "endpoint": endpoint, "input_file_id": input_file_id,
+            "completion_window": completion_window, "status": "validating", "created_at": int(time.time()),
+            "output_file_id": None, "error_file_id": None,
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+        }
+        with self._lock:
+            self.batches[batch_id] = batch
+            self._retrieves[batch_id] = 0
+        return batch
+
+    def retrieve_batch(self, batch_id):
+        """Return a batch, completing it once it has been polled `polls` times."""
+        with self._lock:
+            batch = self.batches[batch_id]
+            if batch["status"] == "completed":
+                return batch
+            self._retrieves[batch_id] += 1
+            if self._retrieves[batch_id] <= self.polls:
+                batch["status"] = "in_progress"
+                return batch
+        self._complete(batch)
+        return batch
+
+    def _complete(self, batch):
+        """Answer every request line of a batch and store the output file."""
+        lines = self.files[batch["input_file_id"]]["content"].decode("utf-8").splitlines()
+        output = []
+        failed = 0
+        for line in lines:
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            payload = json.loads(request["body"]["messages"][-1]["content"])
+            comments = payload if isinstance(payload, list) else [payload]
+            if any(self.fail_marker in (comment.get("comment") or "") for comment in comments):
+                failed += 1
+                output.append({"id": f"batch_req_{uuid.uuid4().hex[:12]}", "custom_id": request["custom_id"],
+                               "response": {"status_code": 500, "body": {"error": {"message": "stand-in failure"}}},
+                               "error": None})
+                continue
+            answers = [self.classify(comment) for comment in comments]
+            if isinstance(payload, list):
+                content = json.dumps({"results": [{"id": comment["id"], **answer}
+                                                  for comment, answer in zip(comments, answers)]})
+            else:
+                content = json.dumps(answers[0])
+            output.append({"id": f"batch_req_{uuid.uuid4().hex[:12]}", "custom_id": request["custom_id"],
+                           "response": {"status_code": 200, "body": {
+                               "choices": [{"index": 0, "message": {"role": "assistant", "content": content}}],
+                               "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                           }},
+                           "error": None})
+
+        output_file = self.create_file(f"{batch['id']}_output.jsonl", "batch_output",
+                                       "".join(json.dumps(record) + "\n" for record in output).encode("utf-8"))
+        with self._lock:
+            batch.update(status="completed", output_file_id=output_file["id"],
+                         request_counts={"total": len(output), "completed": len(output) - failed, "failed": failed})
+
+    @staticmethod
+    def classify(comment):
+        """Fixed, valid classification of a prompt payload."""
+        return {"review_type": "other", "language": LocalClassifier.infer_language(comment) or "none",
+                "framework": "none"}
+
+
+def make_handler(stand_in):
+    """Build the HTTP request handler serving a BatchStandIn under /v1."""
+
+    class StandInHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _read_body(self):
+            return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        def do_GET(self):
+            parts = self.path.split("?")[0].strip("/").split("/")
+            if parts[:2] == ["v1", "batches"] and len(parts) == 3 and parts[2] in stand_in.batches:
+                self._send_json(200, stand_in.retrieve_batch(parts[2]))
+            elif parts[:2] == ["v1", "files"] and len(parts) == 4 and parts[3] == "content" \
+                    and parts[2] in stand_in.files:
+                data = stand_in.files[parts[2]]["content"]
+                self.send_response(200)
+                self.send_header("Content-Type", "application/octet-stream")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            else:
+                self._send_json(404, {"error": {"message": f"not found: {self.path}"}})
+
+        def do_POST(self):
+            path = self.path.split("?")[0].rstrip("/")
+            try:
+                if path == "/v1/files":
+                    # Multipart form with "purpose" and "file" fields
+                    message = BytesParser(policy=HTTP).parsebytes(
+                        f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode("utf-8") + self._read_body()
+                    )
+                    fields = {part.get_param("name", header="content-disposition"): part
+                              for part in message.iter_parts()}
+                    upload = fields["file"]
+                    self._send_json(200, stand_in.create_file(upload.get_filename(),
+                                                              fields["purpose"].get_content().strip(),
+                                                              upload.get_payload(decode=True)))
+                elif path == "/v1/batches":
+                    request = json.loads(self._read_body())
+                    self._send_json(200, stand_in.create_batch(request["input_file_id"], request["endpoint"],
+                                                               request["completion_window"]))
+                else:
+                    self._send_json(404, {"error": {"message": f"not found: {self.path}"}})
+            except (KeyError, ValueError) as e:
+                self._send_json(400, {"error": {"message": str(e)}})
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    return StandInHandler
+
+
+def start_server(stand_in, host="127.0.0.1", port=0):
+    """
+    Serve a stand-in from a background thread.
+
+    Args:
+        stand_in (BatchStandIn): Files and batches to serve
+        host (str): Host to bind
+        port (int): Port to bind (0 picks a free port)
+
+    Returns:
+        tuple: (server, base_url for the OpenAI client)
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(stand_in))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def self_check(max_attempts=2):
+    """
+    Run BatchEnricher against a stand-in through submit, poll, merge, resubmit and max_attempts.
+
+    Args:
+        max_attempts (int): Submissions per comment before it is marked failed (at least 2)
+
+    Returns:
+        list: Descriptions of the checks that failed (empty if all passed)
+    """
+    from comment_enricher import CommentEnricher
+    from batch_enricher import BatchEnricher
+
+    stand_in = BatchStandIn(polls=1)
+    server, base_url = start_server(stand_in)
+    failures = []
+
+    def check(condition, description):
+        if not condition:
+            failures.append(description)
+        logger.info(f"{'ok' if condition else 'FAILED'}: {description}")
+
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            input_file = os.path.join(work_dir, "comments.json")
+            output_file = os.path.join(work_dir, "comments.enriched.json")
+            comments = [
+                {"comment_url": "https://github.com/o/r/pull/1#discussion_r1", "file_path": "app.py",
+                 "comment": "Close the file with a context manager."},
+                {"comment_url": "https://github.com/o/r/pull/1#discussion_r2", "file_path": "main.go",
+                 "comment": "Check the error returned here."},
+                {"comment_url": "https://github.com/o/r/pull/1#discussion_r3", "file_path": "app.py",
+                 "comment": f"{DEFAULT_FAIL_MARKER} This request always fails."},
+            ]
+            with open(input_file, "w", encoding="utf-8") as f:
+                json.dump(comments, f)
+
+            enricher = CommentEnricher(api_key="stand-in", base_url=base_url, rate_limit_delay=0)
+            batch_enricher = BatchEnricher(enricher, max_attempts=max_attempts)
+
+            def run():
+                return batch_enricher.enrich_comments(input_file, output_file)
+
+            enriched = run()
+            check(not enriched and batch_enricher.is_pending(output_file), "first run submits a batch")
+            check(not run() and batch_enricher.is_pending(output_file), "in-progress batch is only polled")
+
+            enriched = run()
+            merged = {record["comment_url"] for record in enriched if not record.get("enrichment_failed")}
+            check(merged == {comments[0]["comment_url"], comments[1]["comment_url"]},
+                  "completed batch is merged by comment_url")
+            state = batch_enricher._load_state(output_file) or {}
+            check(state.get("attempts") == {comments[2]["comment_url"]: 1}
+                  and list(state.get("requests", {}).values()) == [[comments[2]["comment_url"]]],
+                  "failed comment is resubmitted alone with its attempt counted")
+
+            for _ in range(max_attempts - 1):
+                run()  # polled
+                enriched = run()  # merged
+            failed = [record for record in enriched if record.get("enrichment_failed")]
+            check(len(enriched) == 3 and [record["comment_url"] for record in failed] == [comments[2]["comment_url"]]
+                  and failed[0].get("enrichment_attempts") == max_attempts,
+                  f"comment is marked enrichment_failed after {max_attempts} attempts")
+            check(not batch_enricher.is_pending(output_file) and not os.path.exists(f"{output_file}.batch"),
+                  "nothing is pending once every comment is settled")
+    finally:
+        server.shutdown()
+        server.server_close()
+    return failures
+
+
+def main():
+    """Main function to run the batch stand-in server or its self-check from command line."""
+    parser = argparse.ArgumentParser(description="Local stand-in for the OpenAI files and batches endpoints")
+    parser.add_argument("--host", type=str, default="127.0.0.1",
+                        help="HTTP host (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8090,
+                        help="HTTP port (default: 8090)")
+    parser.add_argument("--polls", type=int, default=1,
+                        help="Retrieves a batch reports in_progress before it completes (default: 1)")
+    parser.add_argument("--fail-marker", type=str, default=DEFAULT_FAIL_MARKER,
+                        help=f"Comments containing this text make their request fail (default: {DEFAULT_FAIL_MARKER})")
+    parser.add_argument("--self-check", action="store_true",
+                        help="Run BatchEnricher against an in-process stand-in and report the round trip")
+
+    args = parser.parse_args()
+
+    try:
+        if args.self_check:
+            failures = self_check()
+            print("Batch round trip OK" if not failures else f"Batch round trip FAILED: {failures}")
+            return 0 if not failures else 1
+
+        server = ThreadingHTTPServer((args.host, args.port),
+                                     make_handler(BatchStandIn(polls=args.polls, fail_marker=args.fail_marker)))
+        logger.info(f"Serving batch stand-in on http://{args.host}:{args.port}/v1")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
+        return 0
+    except Exception as e:
+        logger.error(f"Error: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Benchmark Qdrant collection profiles on a sample of an existing comment collection.
+
+For each profile the sampled vectors are loaded into a scratch collection, and the
+tool reports estimated RAM, index build time, search latency and recall@k of the
+profile's search against an exact full scan.
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import json
+import time
+import random
+import logging
+import argparse
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+from collection_profiles import COLLECTION_PROFILES, get_profile, collection_config, search_params, estimate_memory
+from qdrant_uploader import QdrantUploader
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def sample_points(client, collection_name, limit, seed=None):
+    """
+    Read a uniform random sample of up to `limit` comment points with vectors and payload.
+
+    Chunk points (those with a parent_id) are excluded, as they would repeat their
+    parent's neighbourhood. The IDs of every remaining point are scrolled without
+    vectors, a random subset is drawn and only that subset is retrieved, so the
+    sample does not follow the collection's ID order.
+
+    Args:
+        client (QdrantClient): Qdrant client
+        collection_name (str): Source collection
+        limit (int): Maximum number of points
+        seed (int, optional): Seed of the random sample, for repeatable runs
+
+    Returns:
+        list: Records with id, vector and payload, in random order
+    """
+    comments_only = models.Filter(must=[models.IsEmptyCondition(is_empty=models.PayloadField(key="parent_id"))])
+    point_ids = []
+    offset = None
+    while True:
+        records, offset = client.scroll(
+            collection_name=collection_name,
+            scroll_filter=comments_only,
+            limit=1024,
+            offset=offset,
+            with_payload=False,
+            with_vectors=False
+        )
+        point_ids.extend(record.id for record in records)
+        if offset is None:
+            break
+
+    sampled_ids = random.Random(seed).sample(point_ids, min(limit, len(point_ids)))
+    points = []
+    for start in range(0, len(sampled_ids), 256):
+        points.extend(client.retrieve(
+            collection_name=collection_name,
+            ids=sampled_ids[start:start + 256],
+            with_payload=True,
+            with_vectors=True
+        ))
+    # retrieve() does not keep the requested order
+    rng = random.Random(seed)
+    rng.shuffle(points)
+    return points
+
+
+def wait_until_indexed(client, collection_name, timeout=600):
+    """
+    Wait until the optimizer has finished building the collection's index.
+
+    Returns:
+        bool: True if the collection became green before the timeout
+    """
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if client.get_collection(collection_name).status == models.CollectionStatus.GREEN:
+            return True
+        time.sleep(0.5)
+    logger.warning(f"Collection '{collection_name}' still indexing after {timeout}s")
+    return False
+
+
+def percentile(values, p):
+    """Return the p-th percentile of a list of numbers."""
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))] if values else None
+
+
+def benchmark_profile(client, profile, corpus, queries, k=10, hnsw_ef=None, collection_name="comments_bench",
+                      keep=False):
+    """
+    Load a sample into a scratch collection of one profile and measure it.
+
+    Args:
+        client (QdrantClient): Qdrant client
+        profile (dict): Profile from get_profile()
+        corpus (list): Records to index
+        queries (list): Query vectors
+        k (int): Neighbours per query
+        hnsw_ef (int, optional): Candidates explored per search
+        collection_name (str): Name of the scratch collection
+        keep (bool): Keep the scratch collection afterwards
+
+    Returns:
+        dict: Memory estimate, build time, search latency and recall@k
+    """
+    vector_size = len(corpus[0].vector)
+    if client.collection_exists(collection_name):
+        client.delete_collection(collection_name)
+    client.create_collection(collection_name=collection_name, **collection_config(profile, vector_size))
+
+    start = time.time()
+    uploader = QdrantUploader(client, collection_name)
+    uploader.add(models.PointStruct(id=record.id, vector=record.vector, payload=record.payload) for record in corpus)
+    uploader.close()
+    upload_seconds = time.time() - start
+    wait_until_indexed(client, collection_name)
+    build_seconds = time.time() - start
+
+    recalls = []
+    latencies = []
+    for query in queries:
+        exact = client.query_points(
+            collection_name=collection_name, query=query, limit=k,
+            search_params=search_params(profile, exact=True), with_payload=False
+        ).points
+        search_start = time.perf_counter()
+        approximate = client.query_points(
+            collection_name=collection_name, query=query, limit=k,
+            search_params=search_params(profile, hnsw_ef=hnsw_ef), with_payload=False
+        ).points
+        latencies.append((time.perf_counter() - search_start) * 1000)
+        expected = {point.id for point in exact}
+        if expected:
+            recalls.append(len(expected & {point.id for point in approximate}) / len(expected))
+
+    if not keep:
+        client.delete_collection(collection_name)
+
+    payload_bytes = sum(len(json.dumps(record.payload or {})) for record in corpus) // len(corpus)
+    return {
+        "profile": profile["name"],
+        "points": len(corpus),
+        "estimated_ram_bytes": estimate_memory(profile, len(corpus), vector_size, payload_bytes),
+        "upload_seconds": round(upload_seconds, 2),
+        "build_seconds": round(build_seconds, 2),
+        "search_ms_p50": round(percentile(latencies, 50), 2) if latencies else None,
+        "search_ms_p95": round(percentile(latencies, 95), 2) if latencies else None,
+        f"recall@{k}": round(sum(recalls) / len(recalls), 4) if recalls else None,
+    }
+
+
+def main():
+    """Main function to run the profile benchmark from command line."""
+    parser = argparse.ArgumentParser(description="Benchmark Qdrant collection profiles on sampled comment vectors")
+
+    parser.add_argument("--collection", type=str, default="github_comments",
+                        help="Existing collection to sample vectors from")
+    parser.add_argument("--qdrant-url", type=str, default="http://localhost:6333",
+                        help="Qdrant server URL")
+    parser.add_argument("--qdrant-key", type=str,
+                        help="Qdrant API key for authentication")
+    parser.add_argument("--profiles", type=str, nargs="+", default=list(COLLECTION_PROFILES),
+                        choices=list(COLLECTION_PROFILES),
+                        help="Profiles to compare (default: all)")
+    parser.add_argument("--hnsw-m", type=int,
+                        help="Override the profiles' HNSW edges per node")
+    parser.add_argument("--hnsw-ef-construct", type=int,
+                        help="Override the profiles' HNSW build-time neighbours")
+    parser.add_argument("--hnsw-ef", type=int,
+                        help="Candidates explored per search (default: Qdrant's)")
+    parser.add_argument("--sample", type=int, default=10000,
+                        help="Points indexed per profile (default: 10000)")
+    parser.add_argument("--queries", type=int, default=100,
+                        help="Held-out points used as queries (default: 100)")
+    parser.add_argument("--k", type=int, default=10,
+                        help="Neighbours per query for recall@k (default: 10)")
+    parser.add_argument("--seed", type=int,
+                        help="Seed of the random point sample, for repeatable runs")
+    parser.add_argument("--keep", action="store_true",
+                        help="Keep the scratch collections")
+    parser.add_argument("--output", type=str,
+                        help="Write the results as JSON to this file")
+
+    args = parser.parse_args()
+
+    try:
+        client = QdrantClient(url=args.qdrant_url, api_key=args.qdrant_key) if args.qdrant_key \
+            else QdrantClient(url=args.qdrant_url)
+        points = sample_points(client, args.collection, args.sample + args.queries, seed=args.seed)
+        if len(points) <= args.queries:
+            logger.error(f"Collection '{args.collection}' has too few points ({len(points)}) to benchmark")
+            return 1
+        queries = [record.vector for record in points[-args.queries:]]
+        corpus = points[:-args.queries]
+        logger.info(f"Benchmarking {len(args.profiles)} profiles on {len(corpus)} points and {len(queries)} queries")
+
+        results = []
+        for name in args.profiles:
+            profile = get_profile(name, args.hnsw_m, args.hnsw_ef_construct)
+            result = benchmark_profile(
+                client, profile, corpus, queries, k=args.k, hnsw_ef=args.hnsw_ef,
+                collection_name=f"{args.collection}_bench_{name.replace('-', '_')}", keep=args.keep
+            )
+            logger.info(f"{name}: {result}")
+            results.append(result)
+
+        print(f"\n{'profile':<14}{'RAM (MB)':>10}{'build (s)':>11}{'p50 (ms)':>10}{'p95 (ms)':>10}{f'recall@{args.k}':>11}")
+        for result in results:
+            print(f"{result['profile']:<14}{result['estimated_ram_bytes']['total'] / 2 ** 20:>10.1f}"
+                  f"{result['build_seconds']:>11.2f}{result['search_ms_p50']:>10.2f}{result['search_ms_p95']:>10.2f}"
+                  f"{result[f'recall@{args.k}']:>11.4f}")
+
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+        return 0
+    except Exception as e:
+        logger.error(f"Error: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    exit(main())
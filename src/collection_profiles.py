@@ -0,0 +1,183 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import logging
+from qdrant_client.http import models
+
+logger = logging.getLogger(__name__)
+
+# Storage profiles of comment collections. Quantized profiles keep the small
+# quantized vectors in RAM and the originals on disk, and rescore the
+# oversampled candidates with the originals.
+COLLECTION_PROFILES = {
+    "default": {
+        "quantization": None, "on_disk": False, "on_disk_payload": False,
+        "hnsw_m": 16, "hnsw_ef_construct": 100, "oversampling": None,
+    },
+    "on-disk": {
+        "quantization": None, "on_disk": True, "on_disk_payload": True,
+        "hnsw_m": 16, "hnsw_ef_construct": 100, "oversampling": None,
+    },
+    "int8": {
+        "quantization": "int8", "on_disk": True, "on_disk_payload": True,
+        "hnsw_m": 16, "hnsw_ef_construct": 100, "oversampling": 2.0,
+    },
+    "binary": {
+        "quantization": "binary", "on_disk": True, "on_disk_payload": True,
+        "hnsw_m": 16, "hnsw_ef_construct": 100, "oversampling": 3.0,
+    },
+    "int8-compact": {
+        "quantization": "int8", "on_disk": True, "on_disk_payload": True,
+        "hnsw_m": 8, "hnsw_ef_construct": 64, "oversampling": 2.0,
+    },
+}
+
+# Payload fields filtered on by expert searches (parent_id links chunks to their comment)
+DEFAULT_PAYLOAD_INDEXES = ("expert_name", "language", "framework", "review_type", "repo", "parent_id")
+
+
+def get_profile(name, hnsw_m=None, hnsw_ef_construct=None):
+    """
+    Look up a collection profile, optionally overriding its HNSW parameters.
+
+    Args:
+        name (str): Profile name in COLLECTION_PROFILES
+        hnsw_m (int, optional): Edges per node of the HNSW graph
+        hnsw_ef_construct (int, optional): Neighbours considered while building the graph
+
+    Returns:
+        dict: Profile settings
+    """
+    if name not in COLLECTION_PROFILES:
+        raise ValueError(f"Unknown collection profile: {name} (choose from {', '.join(COLLECTION_PROFILES)})")
+    profile = dict(COLLECTION_PROFILES[name], name=name)
+    if hnsw_m:
+        profile["hnsw_m"] = hnsw_m
+    if hnsw_ef_construct:
+        profile["hnsw_ef_construct"] = hnsw_ef_construct
+    return profile
+
+
+def collection_config(profile, vector_size):
+    """
+    Build the create_collection arguments of a profile.
+
+    Args:
+        profile (dict): Profile from get_profile()
+        vector_size (int): Size of embedding vectors
+
+    Returns:
+        dict: Keyword arguments for QdrantClient.create_collection (without collection_name)
+    """
+    quantization_config = None
+    if profile["quantization"] == "int8":
+        quantization_config = models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, quantile=0.99, always_ram=True)
+        )
+    elif profile["quantization"] == "binary":
+        quantization_config = models.BinaryQuantization(
+            binary=models.BinaryQuantizationConfig(always_ram=True)
+        )
+
+    return {
+        "vectors_config": models.VectorParams(
+            size=vector_size,
+            distance=models.Distance.COSINE,
+            on_disk=profile["on_disk"]
+        ),
+        "hnsw_config": models.HnswConfigDiff(
+            m=profile["hnsw_m"],
+            ef_construct=profile["hnsw_ef_construct"],
+            on_disk=profile["on_disk"]
+        ),
+        "quantization_config": quantization_config,
+        "on_disk_payload": profile["on_disk_payload"],
+    }
+
+
+def search_params(profile, hnsw_ef=None, exact=False):
+    """
+    Build the search parameters of a profile.
+
+    Quantized profiles oversample candidates and rescore them with the original vectors.
+
+    Args:
+        profile (dict): Profile from get_profile()
+        hnsw_ef (int, optional): Candidates explored per search (default: Qdrant's)
+        exact (bool): Full scan over the original vectors (ground truth for recall)
+
+    Returns:
+        models.SearchParams: Search parameters
+    """
+    if exact:
+        return models.SearchParams(exact=True, quantization=models.QuantizationSearchParams(ignore=True))
+    quantization = None
+    if profile["quantization"]:
+        quantization = models.QuantizationSearchParams(
+            ignore=False, rescore=True, oversampling=profile["oversampling"]
+        )
+    return models.SearchParams(hnsw_ef=hnsw_ef, quantization=quantization)
+
+
+def estimate_memory(profile, points, vector_size, payload_bytes=0):
+    """
+    Estimate the RAM a collection needs under a profile.
+
+    Counts vectors (originals unless on disk, plus quantized copies), HNSW links
+    and payload (unless on disk). Qdrant's own overhead is not included.
+
+    Args:
+        profile (dict): Profile from get_profile()
+        points (int): Number of points
+        vector_size (int): Size of embedding vectors
+        payload_bytes (int): Average payload size per point
+
+    Returns:
+        dict: Estimated bytes per component and in total
+    """
+    originals = 0 if profile["on_disk"] else points * vector_size * 4
+    quantized = 0
+    if profile["quantization"] == "int8":
+        quantized = points * vector_size
+    elif profile["quantization"] == "binary":
+        quantized = points * ((vector_size + 7) // 8)
+    # Layer 0 keeps 2*m links per node, 4 bytes each
+    links = 0 if profile["on_disk"] else points * profile["hnsw_m"] * 2 * 4
+    payload = 0 if profile["on_disk_payload"] else points * payload_bytes
+    return {
+        "vectors": originals,
+        "quantized_vectors": quantized,
+        "hnsw_links": links,
+        "payload": payload,
+        "total": originals + quantized + links + payload,
+    }
+
+
+def create_payload_indexes(client, collection_name, fields=DEFAULT_PAYLOAD_INDEXES):
+    """
+    Create keyword payload indexes that are missing from a collection.
+
+    Args:
+        client (QdrantClient): Qdrant client
+        collection_name (str): Name of the collection
+        fields (iterable): Payload fields to index
+
+    Returns:
+        list: Fields that were indexed now
+    """
+    existing = client.get_collection(collection_name).payload_schema or {}
+    created = []
+    for field in fields:
+        if field in existing:
+            continue
+        client.create_payload_index(
+            collection_name=collection_name,
+            field_name=field,
+            field_schema=models.PayloadSchemaType.KEYWORD,
+            wait=True
+        )
+        created.append(field)
+    if created:
+        logger.info(f"Created payload indexes on {', '.join(created)} in '{collection_name}'")
+    return created
@@ -9,18 +9,20 @@ import argparse
 from tqdm import tqdm
 from github_api import GitHubAPI
 from restapi_crawler import RestAPICommentCrawler
+from comment_filter import CommentFilter
 
 logger = logging.getLogger(__name__)
 
 class GitHubCommentCrawler:
     """Crawler for GitHub comments using GraphQL API with token rotation and REST API fallback."""
     
-    def __init__(self, github_tokens):
+    def __init__(self, github_tokens, comment_filter=None):
         """
         Initialize the crawler with one or multiple GitHub tokens.
         
         Args:
             github_tokens (str or list): A single GitHub token or a list of tokens
+            comment_filter (CommentFilter, optional): Shared comment filter (default rules if omitted)
         """
         # Handle both single token and list of tokens
         if isinstance(github_tokens, str):
@@ -30,9 +32,10 @@ class GitHubCommentCrawler:
             
         self.current_token_index = 0
         self.api = GitHubAPI(self.github_tokens[0])
+        self.comment_filter = comment_filter or CommentFilter()
         
         # Initialize REST API crawler as ultimate fallback
-        self.rest_crawler = RestAPICommentCrawler(self.github_tokens[0])
+        self.rest_crawler = RestAPICommentCrawler(self.github_tokens[0], self.comment_filter)
     
     def rotate_token(self):
         """
@@ -51,7 +54,7 @@ class GitHubCommentCrawler:
         
         # Update API instances with new token
         self.api = GitHubAPI(new_token)
-        self.rest_crawler = RestAPICommentCrawler(new_token)
+        self.rest_crawler = RestAPICommentCrawler(new_token, self.comment_filter)
         
         logger.info(f"Rotated to GitHub token {self.current_token_index + 1}/{len(self.github_tokens)}")
         return True
@@ -403,17 +406,13 @@ class GitHubCommentCrawler:
         with open(output_file, "w", encoding="utf-8") as f:
             json.dump(all_comments, f, ensure_ascii=False, indent=2)
         
+        logger.info(f"Comment filter stats: {self.comment_filter.format_stats()}")
         print(f"Comments saved to {output_file}")
         return all_comments
 
     def is_valid_comment(self, comment_text):
         """
-        Check if a comment is valid for collection.
-        
-        Criteria:
-        - Not blank or only whitespace
-        - Not too short (at least 10 characters)
-        - Appears to be in English (heuristic check)
+        Check if a comment is valid for collection using the shared comment filter.
         
         Args:
             comment_text (str): The comment text to validate
@@ -421,40 +420,7 @@ class GitHubCommentCrawler:
         Returns:
             bool: True if the comment is valid, False otherwise
         """
-        if not comment_text or not comment_text.strip():
-            logger.debug("Skipping blank comment")
-            return False
-            
-        # Skip very short comments
-        if len(comment_text.strip()) < 10:
-            logger.debug(f"Skipping short comment: {comment_text.strip()}")
-            return False
-            
-        # Simple heuristic to check if comment is likely in English
-        # Count English alphabet characters vs. total non-whitespace characters
-        text = comment_text.strip()
-        alpha_count = sum(c.isalpha() and c.isascii() for c in text)
-        non_space_count = sum(not c.isspace() for c in text)
-        
-        if non_space_count == 0:
-            return False
-            
-        # If less than 40% of characters are English alphabet letters, likely not English
-        english_ratio = alpha_count / non_space_count
-        if english_ratio < 0.4:
-            logger.debug(f"Skipping likely non-English comment (ratio: {english_ratio:.2f})")
-            return False
-            
-        # Additional check for common English words
-        # common_words = ['the', 'a', 'an', 'and', 'or', 'but', 'if', 'this', 'that', 'is', 'are', 
-        #                  'it', 'to', 'in', 'for', 'with', 'on', 'as', 'by', 'at', 'from']
-        
-        # words = set(text.lower().split())
-        # if not any(word in words for word in common_words) and len(words) > 5:
-        #     logger.debug("Comment lacks common English words, might not be English")
-        #     return False
-            
-        return True
+        return self.comment_filter.is_valid(comment_text)
 
 # Add command-line functionality when run directly
 if __name__ == "__main__":
@@ -476,6 +442,8 @@ if __name__ == "__main__":
                         help="Collect all historical comments")
     parser.add_argument("--use-rest-api", action="store_true", 
                         help="Force using REST API instead of GraphQL")
+    parser.add_argument("--filter-rules", type=str,
+                        help="Comma-separated comment filter rules (default: blank,min_length,english_ratio)")
     
     args = parser.parse_args()
     
@@ -491,7 +459,7 @@ if __name__ == "__main__":
         os.makedirs(args.output_dir)
     
     # Initialize crawler with tokens
-    crawler = GitHubCommentCrawler(tokens)
+    crawler = GitHubCommentCrawler(tokens, CommentFilter(rules=args.filter_rules))
     
     # Collect comments
     output_file = os.path.join(args.output_dir, f"{args.expert_name}_comments.json")
@@ -3,29 +3,249 @@ import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 import os
+import re
 import json
+import math
 import time
+import asyncio
 import logging
+import threading
 import argparse
 from pathlib import Path
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI, BadRequestError, RateLimitError, APIConnectionError, InternalServerError
+from near_dedup import NearDuplicateIndex, NearDuplicateDetector
+from rate_limiter import TokenBucketRateLimiter
+from enrichment_journal import EnrichmentJournal
+from llm_cache import LLMResponseCache
+from local_classifier import LocalClassifier
+from token_counter import TokenCounter, TokenStats
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, 
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+REVIEW_TYPES = [
+    "naming convention",
+    "architecture",
+    "performance",
+    "security",
+    "style",
+    "documentation",
+    "test",
+    "dependency",
+    "best_practice",
+    "build",
+    "refactor",
+    "logic",
+    "code smell",
+    "bug",
+    "other",
+]
+
+CLASSIFICATION_FIELDS = ("review_type", "language", "framework")
+
+# Only these comment fields are sent to the model; URLs, PR titles etc. do not help classification
+PROMPT_FIELDS = ("file_path", "comment", "diff_context")
+
+# Bump when the prompts or their parsing change so cached responses are not reused
+PROMPT_VERSION = "enrich-v3"
+
+# Definitions shown to the model for every label, in REVIEW_TYPES order
+REVIEW_TYPE_DEFINITIONS = {
+    "naming convention": "The comment asks to rename a variable, function, class, file or parameter, or points out "
+                         "that a name is misleading, inconsistent with the codebase, too short, too generic or does "
+                         "not follow the casing rules of the language.",
+    "architecture": "The comment is about how the code is structured at a larger scale: module boundaries, layering, "
+                    "where a responsibility belongs, coupling between components, public interfaces, data flow or "
+                    "the choice of a design pattern.",
+    "performance": "The comment is about speed, memory, allocations, algorithmic complexity, unnecessary work, "
+                   "caching, I/O or network round trips, database queries, or scalability under load.",
+    "security": "The comment is about vulnerabilities or unsafe handling: injection, escaping, authentication, "
+                "authorization, secrets, cryptography, input validation at trust boundaries, or exposure of "
+                "sensitive data.",
+    "style": "The comment is about formatting, whitespace, import order, line length, brace placement, quoting or "
+             "other purely cosmetic conventions that do not change behavior.",
+    "documentation": "The comment asks for, corrects or discusses docstrings, code comments, README files, "
+                     "changelogs, API documentation, examples or type annotations that only document intent.",
+    "test": "The comment is about tests: missing coverage, test structure, fixtures, mocks, flaky or slow tests, "
+            "assertions, or how a change should be verified.",
+    "dependency": "The comment is about third-party packages or modules: adding, removing, upgrading or pinning "
+                  "a dependency, licensing, vendoring, or relying on an optional import.",
+    "best_practice": "The comment recommends an idiomatic or commonly accepted way of writing the code in this "
+                     "language or framework, such as using a standard library helper, a context manager or an "
+                     "established API instead of a hand-written equivalent.",
+    "build": "The comment is about build scripts, packaging, continuous integration, compiler or linter flags, "
+             "generated files, release configuration or the development environment.",
+    "refactor": "The comment suggests restructuring existing code without changing its behavior: extracting a "
+                "function, removing duplication, simplifying control flow or reorganizing code for readability.",
+    "logic": "The comment questions the reasoning of the code: a condition, edge case, ordering, state handling or "
+             "an algorithm that may not do what the author intends, without pointing at a definite defect.",
+    "code smell": "The comment points out a symptom of deeper design problems: overly long functions, deep nesting, "
+                  "magic numbers, dead code, global state, primitive obsession or similar maintainability risks.",
+    "bug": "The comment identifies a definite defect: wrong results, crashes, exceptions, off-by-one errors, race "
+           "conditions, resource leaks or behavior that contradicts the stated intent.",
+    "other": "The comment does not fit any other label, for example questions, praise, process remarks, "
+             "acknowledgements or discussion that does not request a change.",
+}
+
+_REVIEW_TYPE_TAXONOMY = "\n".join(
+    f'  - "{review_type}": {REVIEW_TYPE_DEFINITIONS[review_type]}' for review_type in REVIEW_TYPES
+)
+
+# Static instructions shared by every request. They form a byte-identical prefix of more than
+# 1,024 tokens so the provider can serve them from its prompt cache; per-comment data comes last.
+CLASSIFICATION_INSTRUCTIONS = """You are a code-review classifier. You receive GitHub pull request review comments written by experienced developers. Each comment is given as a JSON object with these fields:
+
+  - file_path: path of the file the comment is attached to (may be missing)
+  - comment: the text of the review comment (may be truncated)
+  - diff_context: the end of the diff hunk the comment is attached to; the last line is the line being commented on (may be missing or truncated)
+
+For every comment determine exactly three values.
+
+1. review_type: the main concern of the comment. Choose exactly one of the following labels, spelled exactly as shown:
+
+""" + _REVIEW_TYPE_TAXONOMY + """
+
+Guidelines for choosing review_type:
+  - Classify what the reviewer asks for or points out, not what the surrounding code does.
+  - If a comment raises several concerns, choose the one the reviewer emphasizes most or mentions first.
+  - Prefer "bug" over "logic" only when the reviewer is confident the code is wrong.
+  - Prefer "refactor" over "code smell" when the reviewer proposes a concrete restructuring.
+  - Prefer "best_practice" over "style" when the suggestion changes how the code works, even slightly.
+  - Use "naming convention" only when a name is the main subject; a rename suggested as part of a larger restructuring is "refactor".
+  - Use "other" for questions or remarks that do not ask for any change.
+
+2. language: the primary programming language of the file, in lowercase.
+  - Infer it from the file extension of file_path first (for example .py is "python", .ts and .tsx are "typescript", .js and .jsx are "javascript", .rb is "ruby", .go is "go", .rs is "rust", .java is "java", .kt is "kotlin", .php is "php", .cs is "c#", .cpp and .hpp are "c++").
+  - For files without a telling extension (for example Dockerfile, Makefile, YAML or JSON configuration) use the format name such as "dockerfile", "makefile", "yaml" or "json".
+  - If file_path is missing, infer the language from the syntax of diff_context.
+
+3. framework: the primary framework or library the code in that file uses, in lowercase.
+  - Infer it from import statements, decorators, base classes, file layout and APIs visible in diff_context and file_path (for example "django", "flask", "fastapi", "react", "vue", "angular", "express", "spring", "rails", "laravel", "pytest", "junit").
+  - Use the name of the framework, not of a single module or helper inside it.
+  - Use "none" when the code does not use a recognizable framework or library, or when there is not enough information to tell.
+
+All values must be lowercase strings. Do not add explanations, comments or extra keys. Do not wrap the output in markdown code fences."""
+
+SINGLE_OUTPUT_INSTRUCTIONS = """
+
+Output format: the user message contains a single review comment object. Respond with a JSON object with exactly the keys "review_type", "language" and "framework"."""
+
+BATCH_OUTPUT_INSTRUCTIONS = """
+
+Output format: the user message contains a JSON array of review comment objects, each with an "id". Respond with a JSON array containing exactly one object per input comment, in any order, each with exactly the keys "id" (copied unchanged from the input), "review_type", "language" and "framework"."""
+
+# USD per 1M tokens: (input, cached input, output); models missing here are reported without cost
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1": (2.00, 0.50, 8.00),
+}
+
+# Locate classification objects and their values in raw response text (for logprob confidences)
+_JSON_OBJECT_RE = re.compile(r"\{[^{}]*\}")
+_REVIEW_TYPE_VALUE_RE = re.compile(r'"review_type"\s*:\s*"([^"]*)"')
+_ID_VALUE_RE = re.compile(r'"id"\s*:\s*"?([^",}\s]*)')
+
+# Minimum prompt length the provider caches
+PROMPT_CACHE_MIN_TOKENS = 1024
+
+# API errors retried with backoff before they are raised (timeouts are connection errors)
+TRANSIENT_ERRORS = (RateLimitError, APIConnectionError, InternalServerError)
+API_MAX_RETRIES = 5
+
+# Why a prompt was sent; prompt token stats are kept per kind so retries do not
+# inflate the first-pass distribution
+PROMPT_KINDS = ("first_pass", "split_retry", "escalation", "repair", "resubmit")
+
+SINGLE_SYSTEM_MESSAGE = CLASSIFICATION_INSTRUCTIONS + SINGLE_OUTPUT_INSTRUCTIONS
+BATCH_SYSTEM_MESSAGE = CLASSIFICATION_INSTRUCTIONS + BATCH_OUTPUT_INSTRUCTIONS
+
+CLASSIFICATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "review_type": {"type": "string", "enum": REVIEW_TYPES},
+        "language": {"type": "string"},
+        "framework": {"type": "string"},
+    },
+    "required": list(CLASSIFICATION_FIELDS),
+    "additionalProperties": False,
+}
+
+# Structured outputs: the model is constrained to these schemas instead of free-form JSON
+SINGLE_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "review_classification", "strict": True, "schema": CLASSIFICATION_SCHEMA},
+}
+BATCH_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "review_classifications",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "results": {
+                    "type": "array",
+                    "items": {
+                        **CLASSIFICATION_SCHEMA,
+                        "properties": {"id": {"type": "string"}, **CLASSIFICATION_SCHEMA["properties"]},
+                        "required": ["id", *CLASSIFICATION_FIELDS],
+                    },
+                },
+            },
+            "required": ["results"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+def model_prices(model):
+    """Return (input, cached input, output) USD per 1M tokens of a model, matching dated snapshots by prefix."""
+    if model in MODEL_PRICES:
+        return MODEL_PRICES[model]
+    matches = [name for name in MODEL_PRICES if model.startswith(name + "-")]
+    return MODEL_PRICES[max(matches, key=len)] if matches else None
+
+
+class MalformedBatchError(ValueError):
+    """Raised when a batched classification response cannot be mapped back to its comments."""
+
+
 class CommentEnricher:
     """GitHub comment classifier using OpenAI API."""
     
-    def __init__(self, api_key=None, model="gpt-4o-mini", rate_limit_delay=0.5):
+    def __init__(self, api_key=None, model="gpt-4o-mini", rate_limit_delay=0.5,
+                 batch_size=1, batch_token_budget=6000, concurrency=1,
+                 requests_per_minute=500, tokens_per_minute=200000, base_url=None,
+                 journal_compact_every=100, llm_cache=None, diff_token_budget=300,
+                 comment_token_budget=500, structured_output=False, escalation_model=None,
+                 escalation_threshold=0.8):
         """
         Initialize with OpenAI API key.
         
         Args:
             api_key (str): OpenAI API key
             model (str): OpenAI model to use
-            rate_limit_delay (float): Delay between API calls (seconds)
+            rate_limit_delay (float): Delay between API calls (seconds), used when concurrency is 1
+            batch_size (int): Maximum comments classified per request (1 disables batching)
+            batch_token_budget (int): Approximate maximum prompt tokens of comment data per batched request
+            concurrency (int): Maximum requests in flight (1 keeps the sequential engine)
+            requests_per_minute (int): Initial request budget of the concurrent engine's rate limiter
+            tokens_per_minute (int): Initial token budget of the concurrent engine's rate limiter
+            base_url (str, optional): Alternative OpenAI-compatible API base URL (e.g. a local stand-in)
+            journal_compact_every (int): Compact the enrichment journal into the output file every N records
+            llm_cache (LLMResponseCache, optional): Persistent cache of responses to identical prompts
+            diff_token_budget (int): Maximum tokens of diff context per comment (the end, at the commented line, is kept)
+            comment_token_budget (int): Maximum tokens of comment text per comment
+            structured_output (bool): Constrain responses to a JSON schema (response_format) on every request
+            escalation_model (str, optional): Stronger model re-asked for failed, invalid-label or low-confidence
+                results of `model` (None disables the cascade)
+            escalation_threshold (float): Minimum review_type probability (from logprobs) to accept a result of `model`
         """
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         if not self.api_key:
@@ -33,11 +253,796 @@ class CommentEnricher:
             raise ValueError("Missing OpenAI API key")
             
         # Initialize client with the new API format
-        self.client = OpenAI(api_key=self.api_key)
+        self.base_url = base_url
+        self.client = OpenAI(api_key=self.api_key, base_url=base_url)
         self.model = model
         self.rate_limit_delay = rate_limit_delay
+        self.batch_size = max(1, batch_size)
+        self.batch_token_budget = batch_token_budget
+        self.concurrency = max(1, concurrency)
+        self.journal_compact_every = journal_compact_every
+        self.llm_cache = llm_cache
+        self.diff_token_budget = diff_token_budget
+        self.comment_token_budget = comment_token_budget
+        self.structured_output = structured_output
+        self.escalation_model = escalation_model
+        self.escalation_threshold = escalation_threshold
+        self.token_counter = TokenCounter(model)
+        self.prompt_token_stats = {kind: TokenStats() for kind in PROMPT_KINDS}
+        
+        # Provider-side prompt caching only applies to prefixes of at least 1,024 tokens
+        if self.token_counter.exact and self.token_counter.count(SINGLE_SYSTEM_MESSAGE) < PROMPT_CACHE_MIN_TOKENS:
+            logger.warning(f"Static prompt prefix is shorter than {PROMPT_CACHE_MIN_TOKENS} tokens "
+                           f"and will not be served from the prompt cache")
+        self.usage = {}  # model -> token totals
+        self.cascade_stats = {
+            "tier1_accepted": 0, "escalated_failed": 0, "escalated_invalid_label": 0,
+            "escalated_low_confidence": 0, "tier2_accepted": 0, "tier2_failed": 0,
+        }
+        self._usage_lock = threading.Lock()
+        
+        # Shared by every expert enriched in parallel; corrected from x-ratelimit-* headers
+        self.rate_limiter = TokenBucketRateLimiter(requests_per_minute, tokens_per_minute)
+    
+    def _estimate_tokens(self, text):
+        """Count the tokens of a text (estimated from its length when tiktoken is not installed)."""
+        return self.token_counter.count(text)
+    
+    def _truncate_diff(self, diff_context):
+        """
+        Keep the last whole lines of a diff hunk that fit the diff token budget.
+        
+        Review hunks end at the commented line, so the tail is the relevant part.
+        
+        Args:
+            diff_context (str): Diff hunk
+            
+        Returns:
+            str: Hunk within the budget
+        """
+        if self.token_counter.count(diff_context) <= self.diff_token_budget:
+            return diff_context
+        
+        kept, used = [], 0
+        for line in reversed(diff_context.splitlines()):
+            tokens = self.token_counter.count(line) + 1
+            if used + tokens > self.diff_token_budget:
+                break
+            kept.append(line)
+            used += tokens
+        if not kept:
+            # A single overlong line: keep its end
+            return self.token_counter.truncate(diff_context, self.diff_token_budget, keep="tail")
+        return "\n".join(reversed(kept))
+    
+    def _prompt_payload(self, review):
+        """
+        Select and trim the fields of a comment sent to the model.
+        
+        Args:
+            review (dict): Review comment object
+            
+        Returns:
+            dict: Prompt fields within the token budgets
+        """
+        payload = {field: review[field] for field in PROMPT_FIELDS if review.get(field)}
+        if "comment" in payload:
+            payload["comment"] = self.token_counter.truncate(payload["comment"], self.comment_token_budget)
+        if "diff_context" in payload:
+            payload["diff_context"] = self._truncate_diff(payload["diff_context"])
+        return payload
+    
+    def _to_json(self, value):
+        """Serialize prompt data as compact JSON."""
+        return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+    
+    def _extract_json(self, content):
+        """
+        Parse JSON from a model response, tolerating markdown code fences.
+        
+        Args:
+            content (str): Raw response content
+            
+        Returns:
+            dict or list: Parsed JSON
+            
+        Raises:
+            json.JSONDecodeError: If the content is not valid JSON
+        """
+        content = content.strip()
+        if content.startswith("```"):
+            content = content.split("\n", 1)[1] if "\n" in content else ""
+            content = content.rsplit("```", 1)[0]
+        return json.loads(content)
+    
+    def _normalize_classification(self, classification):
+        """Convert all string values of a classification to lowercase."""
+        for key, value in classification.items():
+            if isinstance(value, str):
+                classification[key] = value.lower()
+        return classification
+    
+    def _build_messages(self, system_message, prompt):
+        """Build the chat messages for a request."""
+        return [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": prompt}
+        ]
+    
+    def _build_single_prompt(self, review, kind="first_pass"):
+        """
+        Build the request for classifying a single comment.
+        
+        Args:
+            review (dict): Review comment object
+            kind (str): Why the prompt is sent, one of PROMPT_KINDS
+            
+        Returns:
+            list: Chat messages
+        """
+        # Variable content goes last so the static system prefix stays cacheable
+        messages = self._build_messages(SINGLE_SYSTEM_MESSAGE, self._to_json(self._prompt_payload(review)))
+        self.prompt_token_stats[kind].record(self.token_counter.count_messages(messages))
+        return messages
+    
+    def _build_batch_prompt(self, reviews, kind="first_pass"):
+        """
+        Build the request for classifying several comments at once.
+        
+        Args:
+            reviews (list): Review comment objects
+            kind (str): Why the prompt is sent, one of PROMPT_KINDS
+            
+        Returns:
+            list: Chat messages
+        """
+        payload = [{"id": str(i), **self._prompt_payload(review)} for i, review in enumerate(reviews)]
+        messages = self._build_messages(BATCH_SYSTEM_MESSAGE, self._to_json(payload))
+        self.prompt_token_stats[kind].record(self.token_counter.count_messages(messages), comments=len(reviews))
+        return messages
     
-    def enrich_comments(self, input_file, output_file=None, continue_enrichment=False):
+    def _parse_single_response(self, content):
+        """
+        Parse the classification of a single comment.
+        
+        Args:
+            content (str): Response content
+            
+        Returns:
+            dict: Classification fields, or None if the response is not a JSON object
+        """
+        try:
+            classification = self._extract_json(content)
+        except json.JSONDecodeError:
+            logger.error("Error parsing JSON from OpenAI:")
+            logger.error(content)
+            return None
+        
+        if not isinstance(classification, dict):
+            logger.error(f"Unexpected classification format from OpenAI: {content}")
+            return None
+        return self._normalize_classification(classification)
+    
+    def _parse_batch_response(self, content, count):
+        """
+        Map a batched classification response back to its comments.
+        
+        Args:
+            content (str): Response content
+            count (int): Number of comments in the batch
+            
+        Returns:
+            list: Classifications in input order
+            
+        Raises:
+            MalformedBatchError: If the response cannot be mapped back to every comment
+        """
+        try:
+            results = self._extract_json(content)
+        except json.JSONDecodeError as e:
+            raise MalformedBatchError(f"Invalid JSON in batch response: {e}")
+        
+        # Accept a bare array or an object wrapping one
+        if isinstance(results, dict):
+            results = next((value for value in results.values() if isinstance(value, list)), None)
+        if not isinstance(results, list):
+            raise MalformedBatchError("Batch response is not a JSON array")
+        
+        by_id = {}
+        for item in results:
+            if isinstance(item, dict) and "id" in item:
+                item_id = str(item.pop("id"))
+                if all(field in item for field in CLASSIFICATION_FIELDS):
+                    by_id[item_id] = self._normalize_classification(item)
+        
+        missing = [i for i in range(count) if str(i) not in by_id]
+        if missing:
+            raise MalformedBatchError(f"Batch response is missing {len(missing)}/{count} comments")
+        return [by_id[str(i)] for i in range(count)]
+    
+    def record_usage(self, usage, model=None):
+        """
+        Add the token usage of one response, including prompt tokens served from the provider's cache.
+        
+        Args:
+            usage: Usage object of a chat completion, or its dict form from a Batch API output line
+            model (str, optional): Model that served the response (default: the enrichment model)
+        """
+        if not usage:
+            return
+        
+        def value(obj, key):
+            if obj is None:
+                return None
+            return obj.get(key) if isinstance(obj, dict) else getattr(obj, key, None)
+        
+        details = value(usage, "prompt_tokens_details")
+        with self._usage_lock:
+            totals = self.usage.setdefault(model or self.model, {
+                "requests": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0
+            })
+            totals["requests"] += 1
+            totals["prompt_tokens"] += value(usage, "prompt_tokens") or 0
+            totals["completion_tokens"] += value(usage, "completion_tokens") or 0
+            totals["cached_tokens"] += value(details, "cached_tokens") or 0
+    
+    def get_prompt_token_stats(self):
+        """
+        Summarize prompt token counts per prompt kind.
+        
+        Returns:
+            dict: PROMPT_KINDS entry -> TokenStats summary, for kinds with prompts
+        """
+        summaries = {kind: stats.summary() for kind, stats in self.prompt_token_stats.items()}
+        return {kind: summary for kind, summary in summaries.items() if summary["prompts"]}
+    
+    def get_usage_stats(self):
+        """
+        Get token usage and estimated cost of the requests sent so far.
+        
+        Returns:
+            dict: Totals, cached share of prompt tokens and cost, plus the same per model
+        """
+        with self._usage_lock:
+            by_model = {model: dict(totals) for model, totals in self.usage.items()}
+        
+        stats = {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0}
+        for model, totals in by_model.items():
+            prices = model_prices(model)
+            totals["cost_usd"] = None
+            if prices:
+                input_price, cached_price, output_price = prices
+                totals["cost_usd"] = round((
+                    (totals["prompt_tokens"] - totals["cached_tokens"]) * input_price
+                    + totals["cached_tokens"] * cached_price
+                    + totals["completion_tokens"] * output_price
+                ) / 1_000_000, 6)
+                stats["cost_usd"] += totals["cost_usd"]
+            for key in ("requests", "prompt_tokens", "cached_tokens", "completion_tokens"):
+                stats[key] += totals[key]
+        
+        stats["cost_usd"] = round(stats["cost_usd"], 6)
+        stats["cached_ratio"] = round(stats["cached_tokens"] / stats["prompt_tokens"], 4) if stats["prompt_tokens"] else 0.0
+        stats["by_model"] = by_model
+        return stats
+    
+    def get_cascade_stats(self):
+        """
+        Get per-tier counts of the model cascade.
+        
+        Returns:
+            dict: Comments accepted from the first model, escalated (by reason) and answered by the second
+        """
+        with self._usage_lock:
+            stats = dict(self.cascade_stats)
+        stats["tier1_model"] = self.model
+        stats["tier2_model"] = self.escalation_model
+        return stats
+    
+    def _response_format(self, batch=False):
+        """Return the response_format for a request, or None without structured output."""
+        if not self.structured_output:
+            return None
+        return BATCH_RESPONSE_FORMAT if batch else SINGLE_RESPONSE_FORMAT
+    
+    def _cache_key(self, messages, response_format=None, model=None, logprobs=False):
+        """Return the response cache key of a request."""
+        prompt_version = PROMPT_VERSION
+        if response_format:
+            prompt_version += f"+{response_format['json_schema']['name']}"
+        if logprobs:
+            prompt_version += "+logprobs"
+        return LLMResponseCache.make_key(model or self.model, messages, temperature=0, prompt_version=prompt_version)
+    
+    def _discard_cached(self, messages, response_format=None, model=None, logprobs=False):
+        """Drop a cached response that could not be parsed, so the request is retried next time."""
+        if self.llm_cache:
+            self.llm_cache.delete(self._cache_key(messages, response_format, model, logprobs))
+    
+    def _review_type_confidences(self, token_logprobs):
+        """
+        Compute the probability of each review_type value from token logprobs.
+        
+        The probability of a value is the product of the probabilities of the tokens
+        spelling it. Objects carrying an "id" (batched responses) are keyed by it,
+        a single object by None.
+        
+        Args:
+            token_logprobs (list): (token, logprob) pairs of the response
+            
+        Returns:
+            dict: id (or None) -> confidence between 0 and 1
+        """
+        text = "".join(token for token, _ in token_logprobs)
+        offsets = []
+        position = 0
+        for token, logprob in token_logprobs:
+            offsets.append((position, position + len(token), logprob))
+            position += len(token)
+        
+        confidences = {}
+        for match in _JSON_OBJECT_RE.finditer(text):
+            review_type = _REVIEW_TYPE_VALUE_RE.search(match.group(0))
+            if not review_type:
+                continue
+            id_match = _ID_VALUE_RE.search(match.group(0))
+            start = match.start() + review_type.start(1)
+            end = match.start() + review_type.end(1)
+            logprob = sum(lp for token_start, token_end, lp in offsets if token_start < end and token_end > start)
+            confidences[id_match.group(1) if id_match else None] = math.exp(logprob)
+        return confidences
+    
+    def _chat(self, messages, response_format=None, model=None, logprobs=False):
+        """
+        Send a chat completion request and return the response text.
+        
+        Answers from the response cache are returned without calling the API.
+        Rate-limit, connection and server errors are retried with backoff.
+        
+        Args:
+            messages (list): Chat messages
+            response_format (dict, optional): Structured output format
+            model (str, optional): Model to ask (default: the enrichment model)
+            logprobs (bool): Request token logprobs and derive review_type confidences
+            
+        Returns:
+            tuple: (stripped response content, review_type confidences or None)
+            
+        Raises:
+            Exception: The API error, for transient errors once API_MAX_RETRIES attempts failed
+        """
+        model = model or self.model
+        cache_key = self._cache_key(messages, response_format, model, logprobs) if self.llm_cache else None
+        if cache_key:
+            cached = self.llm_cache.get(cache_key)
+            if cached is not None:
+                return self._from_cache(cached, logprobs)
+        
+        extra = {"response_format": response_format} if response_format else {}
+        if logprobs:
+            extra["logprobs"] = True
+        for attempt in range(1, API_MAX_RETRIES + 1):
+            try:
+                response = self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=0,
+                    **extra
+                )
+                break
+            except TRANSIENT_ERRORS as e:
+                if attempt == API_MAX_RETRIES:
+                    raise
+                logger.warning(f"OpenAI API error (attempt {attempt}/{API_MAX_RETRIES}): {e}; retrying")
+                time.sleep(min(2 ** attempt, 60))
+            finally:
+                # Pause to avoid rate limits
+                time.sleep(self.rate_limit_delay)
+        self.record_usage(response.usage, model)
+        return self._read_response(response, cache_key, logprobs)
+    
+    def _read_response(self, response, cache_key, logprobs):
+        """Extract content (and confidences) from a response and store them in the cache."""
+        choice = response.choices[0]
+        content = choice.message.content.strip()
+        confidences = None
+        if logprobs:
+            token_logprobs = [(item.token, item.logprob) for item in (choice.logprobs.content or [])] if choice.logprobs else []
+            confidences = self._review_type_confidences(token_logprobs)
+        
+        if cache_key:
+            cached = json.dumps({"content": content, "confidences": confidences}) if logprobs else content
+            self.llm_cache.put(cache_key, cached)
+        return content, confidences
+    
+    def _from_cache(self, cached, logprobs):
+        """Rebuild (content, confidences) from a cached response."""
+        if not logprobs:
+            return cached, None
+        envelope = json.loads(cached)
+        confidences = {None if key == "null" else key: value for key, value in envelope["confidences"].items()}
+        return envelope["content"], confidences
+    
+    async def _achat(self, client, messages, response_format=None, model=None, logprobs=False):
+        """
+        Send a chat completion request through the async client under the rate limiter.
+        
+        Args:
+            client (AsyncOpenAI): Async client of the running event loop
+            messages (list): Chat messages
+            response_format (dict, optional): Structured output format
+            model (str, optional): Model to ask (default: the enrichment model)
+            logprobs (bool): Request token logprobs and derive review_type confidences
+            
+        Returns:
+            tuple: (stripped response content, review_type confidences or None)
+        """
+        model = model or self.model
+        cache_key = self._cache_key(messages, response_format, model, logprobs) if self.llm_cache else None
+        if cache_key:
+            cached = self.llm_cache.get(cache_key)
+            if cached is not None:
+                return self._from_cache(cached, logprobs)
+        
+        prompt_tokens = self.token_counter.count_messages(messages)
+        extra = {"response_format": response_format} if response_format else {}
+        if logprobs:
+            extra["logprobs"] = True
+        for attempt in range(1, API_MAX_RETRIES + 1):
+            # Reserve prompt tokens plus a rough allowance for the JSON answer
+            await self.rate_limiter.acquire(prompt_tokens + 64)
+            try:
+                raw_response = await client.chat.completions.with_raw_response.create(
+                    model=model,
+                    messages=messages,
+                    temperature=0,
+                    **extra
+                )
+                break
+            except TRANSIENT_ERRORS as e:
+                headers = getattr(getattr(e, "response", None), "headers", None)
+                if headers:
+                    # A 429 carries the reset time; the limiter then holds every request until it
+                    self.rate_limiter.update_from_headers(headers)
+                if attempt == API_MAX_RETRIES:
+                    raise
+                logger.warning(f"OpenAI API error (attempt {attempt}/{API_MAX_RETRIES}): {e}; retrying")
+                await asyncio.sleep(min(2 ** attempt, 60))
+        self.rate_limiter.update_from_headers(raw_response.headers)
+        response = raw_response.parse()
+        self.record_usage(response.usage, model)
+        return self._read_response(response, cache_key, logprobs)
+    
+    def _annotate(self, classification, model, confidence):
+        """Record which model produced a classification and, if known, its review_type confidence."""
+        classification["enrichment_model"] = model
+        if confidence is not None:
+            classification["review_type_confidence"] = round(confidence, 4)
+        return classification
+    
+    def classify_comment(self, review, model=None, with_confidence=False, kind="first_pass"):
+        """
+        Classify a single review comment.
+        
+        Args:
+            review (dict): Review comment object
+            model (str, optional): Model to ask (default: the enrichment model)
+            with_confidence (bool): Derive the review_type confidence from token logprobs
+            kind (str): Why the prompt is sent, one of PROMPT_KINDS
+            
+        Returns:
+            dict: Classification fields, or None if the request was rejected or returned invalid JSON
+        """
+        model = model or self.model
+        messages = self._build_single_prompt(review, kind)
+        response_format = self._response_format()
+        try:
+            content, confidences = self._chat(messages, response_format, model, with_confidence)
+        except BadRequestError as e:
+            logger.error(f"OpenAI API rejected the request for {review.get('comment_url')}: {e}")
+            return None
+        
+        classification = self._parse_single_response(content)
+        if classification is None:
+            self._discard_cached(messages, response_format, model, with_confidence)
+            return None
+        return self._annotate(classification, model, confidences.get(None, 0.0) if confidences is not None else None)
+    
+    def _classify_tier(self, reviews, model, with_confidence, kind="first_pass"):
+        """
+        Classify several comments with one model, splitting and retrying malformed batches.
+        
+        A batch whose response cannot be parsed is split in half and each half is
+        retried; single comments fall back to classify_comment. API errors do not
+        split the batch: transient ones are retried by _chat and then raised.
+        
+        Args:
+            reviews (list): Review comment objects
+            model (str): Model to ask
+            with_confidence (bool): Derive review_type confidences from token logprobs
+            kind (str): Why the prompt is sent; the halves of a split batch are "split_retry"
+            
+        Returns:
+            list: Classification dict (or None on failure) for each review, in order
+        """
+        if len(reviews) == 1:
+            return [self.classify_comment(reviews[0], model, with_confidence, kind)]
+        
+        messages = self._build_batch_prompt(reviews, kind)
+        response_format = self._response_format(batch=True)
+        try:
+            content, confidences = self._chat(messages, response_format, model, with_confidence)
+            results = self._parse_batch_response(content, len(reviews))
+            return [
+                self._annotate(classification, model,
+                               confidences.get(str(i), 0.0) if confidences is not None else None)
+                for i, classification in enumerate(results)
+            ]
+        except MalformedBatchError as e:
+            logger.warning(f"{e}; splitting batch of {len(reviews)} comments")
+            self._discard_cached(messages, response_format, model, with_confidence)
+        
+        middle = len(reviews) // 2
+        return (self._classify_tier(reviews[:middle], model, with_confidence, "split_retry")
+                + self._classify_tier(reviews[middle:], model, with_confidence, "split_retry"))
+    
+    def _select_escalations(self, results):
+        """
+        Pick the first-tier results to re-ask on the escalation model and count them.
+        
+        Args:
+            results (list): First-tier classifications (None on failure)
+            
+        Returns:
+            list: Indices of results to escalate
+        """
+        escalate = []
+        with self._usage_lock:
+            for i, classification in enumerate(results):
+                if classification is None:
+                    reason = "escalated_failed"
+                elif classification.get("review_type") not in REVIEW_TYPES:
+                    reason = "escalated_invalid_label"
+                elif classification.get("review_type_confidence", 1.0) < self.escalation_threshold:
+                    reason = "escalated_low_confidence"
+                else:
+                    self.cascade_stats["tier1_accepted"] += 1
+                    continue
+                self.cascade_stats[reason] += 1
+                escalate.append(i)
+        return escalate
+    
+    def _merge_escalations(self, results, indices, escalated):
+        """
+        Replace escalated first-tier results with the escalation model's answers.
+        
+        A failed escalation keeps a first-tier answer with a valid label.
+        
+        Args:
+            results (list): First-tier classifications
+            indices (list): Indices that were escalated
+            escalated (list): Escalation model classifications, in the order of indices
+            
+        Returns:
+            list: Final classifications
+        """
+        results = list(results)
+        with self._usage_lock:
+            for i, classification in zip(indices, escalated):
+                if classification is not None:
+                    self.cascade_stats["tier2_accepted"] += 1
+                    results[i] = classification
+                else:
+                    self.cascade_stats["tier2_failed"] += 1
+                    if results[i] is not None and results[i].get("review_type") not in REVIEW_TYPES:
+                        results[i] = None
+        return results
+    
+    def classify_batch(self, reviews):
+        """
+        Classify several comments, escalating uncertain ones when a cascade is configured.
+        
+        Comments go to the enrichment model first. With an escalation model, failed,
+        invalid-label and low-confidence results are re-asked on the escalation model.
+        
+        Args:
+            reviews (list): Review comment objects
+            
+        Returns:
+            list: Classification dict (or None on failure) for each review, in order
+        """
+        if not self.escalation_model:
+            return self._classify_tier(reviews, self.model, False)
+        
+        results = self._classify_tier(reviews, self.model, True)
+        indices = self._select_escalations(results)
+        if not indices:
+            return results
+        logger.info(f"Escalating {len(indices)}/{len(reviews)} comments to {self.escalation_model}")
+        escalated = self._classify_tier([reviews[i] for i in indices], self.escalation_model, False, "escalation")
+        return self._merge_escalations(results, indices, escalated)
+    
+    async def aclassify_comment(self, client, review, model=None, with_confidence=False, kind="first_pass"):
+        """Async variant of classify_comment used by the concurrent engine."""
+        model = model or self.model
+        messages = self._build_single_prompt(review, kind)
+        response_format = self._response_format()
+        try:
+            content, confidences = await self._achat(client, messages, response_format, model, with_confidence)
+        except BadRequestError as e:
+            logger.error(f"OpenAI API rejected the request for {review.get('comment_url')}: {e}")
+            return None
+        
+        classification = self._parse_single_response(content)
+        if classification is None:
+            self._discard_cached(messages, response_format, model, with_confidence)
+            return None
+        return self._annotate(classification, model, confidences.get(None, 0.0) if confidences is not None else None)
+    
+    async def _aclassify_tier(self, client, reviews, model, with_confidence, kind="first_pass"):
+        """Async variant of _classify_tier used by the concurrent engine."""
+        if len(reviews) == 1:
+            return [await self.aclassify_comment(client, reviews[0], model, with_confidence, kind)]
+        
+        messages = self._build_batch_prompt(reviews, kind)
+        response_format = self._response_format(batch=True)
+        try:
+            content, confidences = await self._achat(client, messages, response_format, model, with_confidence)
+            results = self._parse_batch_response(content, len(reviews))
+            return [
+                self._annotate(classification, model,
+                               confidences.get(str(i), 0.0) if confidences is not None else None)
+                for i, classification in enumerate(results)
+            ]
+        except MalformedBatchError as e:
+            logger.warning(f"{e}; splitting batch of {len(reviews)} comments")
+            self._discard_cached(messages, response_format, model, with_confidence)
+        
+        middle = len(reviews) // 2
+        first, second = await asyncio.gather(
+            self._aclassify_tier(client, reviews[:middle], model, with_confidence, "split_retry"),
+            self._aclassify_tier(client, reviews[middle:], model, with_confidence, "split_retry")
+        )
+        return first + second
+    
+    async def aclassify_batch(self, client, reviews):
+        """Async variant of classify_batch used by the concurrent engine."""
+        if not self.escalation_model:
+            return await self._aclassify_tier(client, reviews, self.model, False)
+        
+        results = await self._aclassify_tier(client, reviews, self.model, True)
+        indices = self._select_escalations(results)
+        if not indices:
+            return results
+        logger.info(f"Escalating {len(indices)}/{len(reviews)} comments to {self.escalation_model}")
+        escalated = await self._aclassify_tier(client, [reviews[i] for i in indices], self.escalation_model, False,
+                                               "escalation")
+        return self._merge_escalations(results, indices, escalated)
+    
+    async def _classify_batches_concurrently(self, batches, on_result):
+        """
+        Classify batches with up to `concurrency` requests in flight.
+        
+        Results are handed to on_result strictly in input order, as soon as every
+        earlier batch has completed.
+        
+        Args:
+            batches (list): List of review lists
+            on_result (callable): Called with (batch, classifications) in input order
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results = [None] * len(batches)
+        next_to_merge = 0
+        
+        client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url)
+        try:
+            async def run(index, batch):
+                async with semaphore:
+                    return index, await self.aclassify_batch(client, batch)
+            
+            tasks = [asyncio.create_task(run(i, batch)) for i, batch in enumerate(batches)]
+            for finished in asyncio.as_completed(tasks):
+                index, classifications = await finished
+                results[index] = classifications
+                while next_to_merge < len(batches) and results[next_to_merge] is not None:
+                    on_result(batches[next_to_merge], results[next_to_merge])
+                    next_to_merge += 1
+        finally:
+            await client.close()
+    
+    def make_batches(self, reviews):
+        """
+        Group reviews into batches bounded by batch_size and batch_token_budget.
+        
+        Args:
+            reviews (list): Review comment objects
+            
+        Returns:
+            list: List of review lists
+        """
+        batches = []
+        current, current_tokens = [], 0
+        for review in reviews:
+            tokens = self._estimate_tokens(self._to_json(self._prompt_payload(review)))
+            if current and (len(current) >= self.batch_size or current_tokens + tokens > self.batch_token_budget):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(review)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+    
+    def build_request(self, reviews, kind="first_pass"):
+        """
+        Build the chat completion request body classifying a batch of comments.
+        
+        Used to submit requests outside this class (e.g. through the Batch API);
+        the response content is read back with parse_response().
+        
+        Args:
+            reviews (list): Review comment objects of one batch from make_batches()
+            kind (str): Why the prompt is sent, one of PROMPT_KINDS
+            
+        Returns:
+            dict: Request body with model, messages, temperature and response_format (if structured output is on)
+        """
+        if len(reviews) == 1:
+            messages = self._build_single_prompt(reviews[0], kind)
+        else:
+            messages = self._build_batch_prompt(reviews, kind)
+        body = {"model": self.model, "messages": messages, "temperature": 0}
+        response_format = self._response_format(batch=len(reviews) > 1)
+        if response_format:
+            body["response_format"] = response_format
+        return body
+    
+    def parse_response(self, content, count):
+        """
+        Parse the response content of a request built by build_request().
+        
+        Args:
+            content (str): Response content
+            count (int): Number of comments in the request
+            
+        Returns:
+            list: Classifications in input order
+            
+        Raises:
+            MalformedBatchError: If the response cannot be mapped back to every comment
+        """
+        if count == 1:
+            classification = self._parse_single_response(content)
+            if classification is None:
+                raise MalformedBatchError("Response is not a JSON object")
+            return [classification]
+        return self._parse_batch_response(content, count)
+    
+    def default_output_file(self, input_file):
+        """Return the default enriched output path for an input file."""
+        return str(Path(input_file).with_suffix('')) + ".enriched.json"
+    
+    def load_enriched(self, output_file):
+        """
+        Load previously enriched comments, including results still in the journal.
+        
+        Args:
+            output_file (str): Path to the enriched output file
+            
+        Returns:
+            list: Enriched comments, empty if nothing was enriched yet
+        """
+        enriched_reviews = EnrichmentJournal(output_file).load()
+        if enriched_reviews:
+            logger.info(f"Continuing from {len(enriched_reviews)} previously enriched comments")
+        return enriched_reviews
+    
+    def save_enriched(self, enriched_reviews, output_file):
+        """Atomically write the complete enriched comment list to the output file."""
+        EnrichmentJournal(output_file).compact(enriched_reviews)
+    
+    def enrich_comments(self, input_file, output_file=None, continue_enrichment=False, near_dedup=None,
+                        local_classifier=None):
         """
         Enrich comment dataset with classifications from OpenAI.
         
@@ -45,14 +1050,17 @@ class CommentEnricher:
             input_file (str): Path to JSON file containing comments
             output_file (str, optional): Path to output file. Default is input_file + ".enriched"
             continue_enrichment (bool): Continue enrichment from previous output file
+            near_dedup (NearDuplicateDetector, optional): Copies enrichment from already classified
+                near-duplicates instead of calling the model
+            local_classifier (LocalClassifier, optional): Answers confidently classifiable comments
+                without calling the model
             
         Returns:
             list: List of enriched comments
         """
         # Determine output file if not provided
         if not output_file:
-            input_path = Path(input_file)
-            output_file = str(input_path.with_suffix('')) + ".enriched.json"
+            output_file = self.default_output_file(input_file)
             
         # Read input data
         try:
@@ -63,16 +1071,15 @@ class CommentEnricher:
             logger.error(f"Error reading input file: {e}")
             return []
             
+        # Results are appended to a journal and periodically compacted into the output file
+        journal = EnrichmentJournal(output_file, self.journal_compact_every)
+        
         # Check existing data
-        enriched_reviews = []
-        if continue_enrichment and os.path.exists(output_file):
-            try:
-                with open(output_file, "r", encoding="utf-8") as f:
-                    enriched_reviews = json.load(f)
-                logger.info(f"Continuing from {len(enriched_reviews)} previously enriched comments")
-            except Exception as e:
-                logger.error(f"Cannot load previously enriched data: {e}")
-                enriched_reviews = []
+        if continue_enrichment:
+            enriched_reviews = self.load_enriched(output_file)
+        else:
+            journal.reset()
+            enriched_reviews = []
                 
         # Identify comments that haven't been enriched yet
         processed_urls = set(review.get("comment_url") for review in enriched_reviews if "comment_url" in review)
@@ -80,85 +1087,184 @@ class CommentEnricher:
         
         logger.info(f"Need to enrich {len(remaining_reviews)} comments")
         
+        signatures = {}  # id(review) -> MinHash signature, for registering near-duplicate representatives
+        
+        def save(new_records):
+            """Journal new records to avoid data loss, compacting periodically."""
+            enriched_reviews.extend(new_records)
+            journal.append(new_records)
+            if journal.should_compact():
+                journal.compact(enriched_reviews)
+        
+        def record(batch, classifications):
+            """Merge one batch of classifications into the output."""
+            new_records = []
+            for review, classification in zip(batch, classifications):
+                if classification is None:
+                    # Keep the comment, marked so a repair pass can retry it
+                    new_records.append({**review, "enrichment_failed": True})
+                    continue
+                # Combine original data with classification data
+                new_records.append({**review, **classification})
+                if local_classifier:
+                    local_classifier.observe(review, classification)
+                if near_dedup:
+                    near_dedup.register(review, classification, signatures.pop(id(review), None))
+            save(new_records)
+        
+        def classify_pending(pending):
+            """Classify pending reviews (batched and concurrent if enabled) and record the results."""
+            batches = self.make_batches(pending)
+            if self.concurrency > 1 and len(batches) > 1:
+                logger.info(f"Classifying {len(pending)} comments in {len(batches)} requests "
+                            f"with concurrency {self.concurrency}")
+                asyncio.run(self._classify_batches_concurrently(batches, record))
+                return
+            for batch in batches:
+                if len(batch) > 1:
+                    logger.info(f"Classifying batch of {len(batch)} comments")
+                record(batch, self.classify_batch(batch))
+        
+        # The concurrent engine needs several requests' worth of comments queued at once
+        window = self.batch_size * (self.concurrency * 4 if self.concurrency > 1 else 1)
+        
         # Process each comment
+        pending = []
         for idx, review in enumerate(remaining_reviews, start=1):
             logger.info(f"Enriching comment {idx}/{len(remaining_reviews)}")
             
-            # Build prompt for a single comment
-            prompt = f"""
-You are a code‐review classifier. Given a single GitHub review comment object in JSON, produce a JSON object with exactly these three keys:
-
-  • review_type: one of [
-      "naming convention",
-      "architecture",
-      "performance",
-      "security",
-      "style",
-      "documentation",
-      "test",
-      "dependency",
-      "best_practice",
-      "build",
-      "refactor",
-      "logic",
-      "code smell",
-      "bug",
-      "other"
-    ]
-  • language: the primary programming language of the file (infer from file_path or diff_context)
-  • framework: the primary framework or library used in that file (or "none" if not applicable)
-
-All values must be in lowercase. Output must be a JSON object (dictionary) with exactly these keys and no extra wrapping.
-
-Here is the review comment:
-{json.dumps(review, indent=2)}
-"""
-
-            try:
-                # Call OpenAI API with new format
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {"role": "system", "content": "You classify a single code review comment. Always return lowercase values."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=0
-                )
-                content = response.choices[0].message.content.strip()
-                
-                # Parse JSON result
-                try:
-                    classification = json.loads(content)
-                    
-                    # Convert all string values to lowercase
-                    for key, value in classification.items():
-                        if isinstance(value, str):
-                            classification[key] = value.lower()
-                    
-                    # Combine original data with classification data
-                    enriched = {**review, **classification}
-                    enriched_reviews.append(enriched)
-                    
-                    # Save after each comment to avoid data loss
-                    with open(output_file, "w", encoding="utf-8") as f:
-                        json.dump(enriched_reviews, f, indent=2, ensure_ascii=False)
-                        
-                except json.JSONDecodeError:
-                    logger.error(f"Error parsing JSON from OpenAI for comment #{idx}:")
-                    logger.error(content)
-                    # Add original comment without enrichment
-                    enriched_reviews.append(review)
-                    
-            except Exception as e:
-                logger.error(f"Error calling OpenAI API: {e}")
-                # Add original comment without enrichment
-                enriched_reviews.append(review)
-                
-            # Pause to avoid rate limits
-            time.sleep(self.rate_limit_delay)
+            # Reuse the classification of an already enriched near-duplicate
+            if near_dedup:
+                representative_url, enrichment, signature = near_dedup.find(review)
+                if representative_url:
+                    logger.info(f"Comment #{idx} is a near-duplicate of {representative_url}, copying enrichment")
+                    save([{**review, **enrichment, "near_duplicate_of": representative_url}])
+                    continue
+                signatures[id(review)] = signature
+            
+            # Answer confidently classifiable comments without calling the model
+            if local_classifier:
+                classification = local_classifier.classify(review)
+                if classification:
+                    save([{**review, **classification, "classified_by": "local"}])
+                    continue
+            
+            pending.append(review)
+            if len(pending) >= window:
+                classify_pending(pending)
+                pending = []
+        
+        if pending:
+            classify_pending(pending)
+        
+        journal.compact(enriched_reviews)
+            
+        if near_dedup:
+            near_dedup.save()
+            logger.info(f"Near-duplicate stats: {near_dedup.stats}")
+        if local_classifier:
+            logger.info(f"Local classifier stats: {local_classifier.get_stats()}")
+        logger.info(f"Prompt tokens ({'tiktoken' if self.token_counter.exact else 'estimated'}): "
+                    f"{self.get_prompt_token_stats()}")
+        logger.info(f"Token usage: {self.get_usage_stats()}")
+        if self.escalation_model:
+            logger.info(f"Cascade stats: {self.get_cascade_stats()}")
+        if self.llm_cache:
+            logger.info(f"LLM cache stats: {self.llm_cache.get_stats()}")
             
         logger.info(f"Complete! Saved {len(enriched_reviews)} enriched comments to {output_file}")
         return enriched_reviews
+    
+    @staticmethod
+    def needs_repair(record):
+        """Whether an enriched record failed or is missing any classification field."""
+        return bool(record.get("enrichment_failed")) or any(not record.get(field) for field in CLASSIFICATION_FIELDS)
+    
+    def _repair_record(self, record, max_attempts, deadline=None):
+        """
+        Re-classify one record with structured output, retrying under the rate limiter.
+        
+        Attempts are paced by the shared token bucket limiter rather than fixed
+        sleeps, and no attempt is started after the deadline.
+        
+        Args:
+            record (dict): Enriched record needing repair
+            max_attempts (int): Maximum classification attempts
+            deadline (float, optional): time.monotonic() value after which no attempt is started
+            
+        Returns:
+            dict: Classification, or None if every attempt failed
+        """
+        messages = self._build_single_prompt(record, "repair")
+        prompt_tokens = self.token_counter.count_messages(messages)
+        # Failures of the cheap model are better retried on the stronger one
+        model = self.escalation_model or self.model
+        for attempt in range(1, max_attempts + 1):
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            self.rate_limiter.acquire_sync(prompt_tokens + 64)
+            try:
+                content, _ = self._chat(messages, SINGLE_RESPONSE_FORMAT, model)
+            except Exception as e:
+                logger.warning(f"Repair attempt {attempt}/{max_attempts} for {record.get('comment_url')} failed: {e}")
+                continue
+            classification = self._parse_single_response(content)
+            if classification and all(classification.get(field) for field in CLASSIFICATION_FIELDS):
+                return {**{field: classification[field] for field in CLASSIFICATION_FIELDS},
+                        "enrichment_model": model}
+            self._discard_cached(messages, SINGLE_RESPONSE_FORMAT, model)
+            logger.warning(f"Repair attempt {attempt}/{max_attempts} for {record.get('comment_url')} "
+                           f"returned an incomplete classification")
+        return None
+    
+    def repair_enriched(self, output_file, max_attempts=3, max_seconds=None):
+        """
+        Re-enrich only the records that failed or are missing classification fields.
+        
+        Repaired records replace the originals by comment_url. Records that still
+        fail stay marked with enrichment_failed and an attempt count. Once
+        max_seconds have passed the remaining records are left for the next run.
+        
+        Args:
+            output_file (str): Path to the enriched output file
+            max_attempts (int): Maximum classification attempts per record
+            max_seconds (float, optional): Time budget for the whole repair pass
+            
+        Returns:
+            dict: Number of records needing repair, repaired, still failed and deferred
+        """
+        records = EnrichmentJournal(output_file).load()
+        # Repaired records are matched back by comment_url, so records without one cannot be repaired
+        broken = [record for record in records if record.get("comment_url") and self.needs_repair(record)]
+        stats = {"needed_repair": len(broken), "repaired": 0, "still_failed": 0, "deferred": 0}
+        if not broken:
+            return stats
+        
+        logger.info(f"Repairing {len(broken)}/{len(records)} enriched comments in {output_file}")
+        deadline = time.monotonic() + max_seconds if max_seconds else None
+        journal = EnrichmentJournal(output_file, self.journal_compact_every)
+        for idx, record in enumerate(broken, start=1):
+            if deadline is not None and time.monotonic() >= deadline:
+                stats["deferred"] = len(broken) - idx + 1
+                logger.warning(f"Repair time budget of {max_seconds}s used up; "
+                               f"{stats['deferred']} comments left for the next run")
+                break
+            logger.info(f"Repairing comment {idx}/{len(broken)}")
+            classification = self._repair_record(record, max_attempts, deadline)
+            if classification:
+                repaired = {key: value for key, value in record.items()
+                            if key not in ("enrichment_failed", "enrichment_attempts")}
+                journal.append([{**repaired, **classification}])
+                stats["repaired"] += 1
+            else:
+                attempts = record.get("enrichment_attempts", 1) + max_attempts
+                journal.append([{**record, "enrichment_failed": True, "enrichment_attempts": attempts}])
+                stats["still_failed"] += 1
+        
+        # The journal replaces the broken records by comment_url
+        journal.compact(journal.load())
+        logger.info(f"Repair of {output_file} complete: {stats}")
+        return stats
 
 
 def main():
@@ -177,21 +1283,102 @@ def main():
                         help="Delay between API calls in seconds (default: 0.5)")
     parser.add_argument("--continue", dest="continue_enrichment", action="store_true",
                         help="Continue enrichment from previous output file")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="Maximum comments classified per request (default: 1, no batching)")
+    parser.add_argument("--batch-token-budget", type=int, default=6000,
+                        help="Approximate prompt token budget for comment data per batched request (default: 6000)")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Maximum requests in flight (default: 1, sequential)")
+    parser.add_argument("--rpm", type=int, default=500,
+                        help="Initial requests-per-minute budget for concurrent enrichment (default: 500)")
+    parser.add_argument("--tpm", type=int, default=200000,
+                        help="Initial tokens-per-minute budget for concurrent enrichment (default: 200000)")
+    parser.add_argument("--near-dedup-index", type=str, action="append",
+                        help="Near-duplicate index file, most specific first (repeatable)")
+    parser.add_argument("--near-dedup-threshold", type=float, default=0.8,
+                        help="Minimum estimated similarity to reuse a near-duplicate's enrichment (default: 0.8)")
+    parser.add_argument("--cache-file", type=str,
+                        help="SQLite file caching model responses to identical prompts (default: no cache)")
+    parser.add_argument("--cache-max-mb", type=int, default=256,
+                        help="Maximum size of cached responses in MB before eviction (default: 256)")
+    parser.add_argument("--bypass-cache", action="store_true",
+                        help="Ignore cached responses (fresh answers are still written to the cache)")
+    parser.add_argument("--diff-token-budget", type=int, default=300,
+                        help="Maximum tokens of diff context sent per comment (default: 300)")
+    parser.add_argument("--comment-token-budget", type=int, default=500,
+                        help="Maximum tokens of comment text sent per comment (default: 500)")
+    parser.add_argument("--structured-output", action="store_true",
+                        help="Constrain responses to a JSON schema (response_format)")
+    parser.add_argument("--escalation-model", type=str,
+                        help="Stronger model re-asked for failed, invalid or low-confidence results of --model")
+    parser.add_argument("--escalation-threshold", type=float, default=0.8,
+                        help="Minimum review_type probability to accept a result of --model (default: 0.8)")
+    parser.add_argument("--repair", action="store_true",
+                        help="Only re-enrich records of the output file that failed or lack classification fields")
+    parser.add_argument("--max-attempts", type=int, default=3,
+                        help="Maximum attempts per record in repair mode (default: 3)")
+    parser.add_argument("--repair-max-seconds", type=float,
+                        help="Time budget of the repair pass; remaining records are left for the next run")
+    parser.add_argument("--local-classifier", type=str,
+                        help="Model file from local_classifier.py; confident comments skip the model call")
+    parser.add_argument("--local-min-confidence", type=float, default=0.9,
+                        help="Minimum confidence to answer a comment locally (default: 0.9)")
     
     args = parser.parse_args()
     
     try:
         api_key = args.api_key
+        llm_cache = None
+        if args.cache_file:
+            llm_cache = LLMResponseCache(
+                args.cache_file,
+                max_bytes=args.cache_max_mb * 1024 * 1024,
+                bypass=args.bypass_cache
+            )
+        
         enricher = CommentEnricher(
             api_key=api_key,
             model=args.model,
-            rate_limit_delay=args.delay
+            rate_limit_delay=args.delay,
+            batch_size=args.batch_size,
+            batch_token_budget=args.batch_token_budget,
+            concurrency=args.concurrency,
+            requests_per_minute=args.rpm,
+            tokens_per_minute=args.tpm,
+            llm_cache=llm_cache,
+            diff_token_budget=args.diff_token_budget,
+            comment_token_budget=args.comment_token_budget,
+            structured_output=args.structured_output,
+            escalation_model=args.escalation_model,
+            escalation_threshold=args.escalation_threshold
         )
         
+        if args.repair:
+            enricher.repair_enriched(
+                args.output or enricher.default_output_file(args.input),
+                max_attempts=args.max_attempts,
+                max_seconds=args.repair_max_seconds
+            )
+            return 0
+        
+        near_dedup = None
+        if args.near_dedup_index:
+            near_dedup = NearDuplicateDetector([
+                NearDuplicateIndex(index_file, threshold=args.near_dedup_threshold)
+                for index_file in args.near_dedup_index
+            ])
+        
+        local_classifier = None
+        if args.local_classifier:
+            local_classifier = LocalClassifier(min_confidence=args.local_min_confidence)
+            local_classifier.load(args.local_classifier)
+        
         enricher.enrich_comments(
             input_file=args.input,
             output_file=args.output,
-            continue_enrichment=args.continue_enrichment
+            continue_enrichment=args.continue_enrichment,
+            near_dedup=near_dedup,
+            local_classifier=local_classifier
         )
         return 0
     except Exception as e:
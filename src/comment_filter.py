@@ -0,0 +1,260 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import re
+import string
+import logging
+import threading
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# Deletion table used to count ASCII letters with a single C-level pass
+_ASCII_LETTERS_TABLE = str.maketrans("", "", string.ascii_letters)
+
+# Most frequent English character trigrams (word-boundary padded with spaces).
+# Small enough to bundle, good enough to separate English prose from other languages.
+ENGLISH_TRIGRAMS = frozenset([
+    " th", "the", "he ", " an", "and", "nd ", " of", "of ", " to", "to ", " in", "in ", "ing",
+    "ng ", " is", "is ", "ed ", " re", "re ", "er ", "on ", " it", "it ", " be", "es ", "at ",
+    " ha", " wh", " fo", "for", "or ", "ion", "tio", " co", " we", "hat", "ent", "ati", " sh",
+    "ere", "all", "his", " ma", " no", "not", "ot ", " wi", "wit", "ith", "th ", " ca", "can",
+    "an ", " on", "ts ", " so", " ar", "are", " se", " us", "use", " ne", "nee", "eed", " if",
+    "if ", " do", "thi", " ju", "jus", "ust", "st ", " bu", "but", "ut ", "hou", "oul", "uld",
+    "ld ", " ch", "che", " ad", " ge", "get", "et ", "mak", "ake", "ke ", "ly ", " al", "ver",
+    "nt ", " mo", " de", " pr", " ex", "ter", " fi", " ou", "our", " yo", "you", "ou ", "hav",
+    "ave", "ve ", " le", " wo", " ab", "abo", "bou", "out", " me", " ev", " ot", "oth", "her",
+    "hen", " ti", " mi", " pl", "ple", " lo", " ta", " ru", " te", "tes", "est", " na", "ame",
+    " va", "val", " ty", "typ", "ype", "ase", "ch ", "ay ", "ce ", "ne ", "ll ", "le ",
+])
+
+_WORD_RE = re.compile(r"[a-z]+")
+
+# Opening lines of bot output and templated boilerplate that carry no review signal.
+# Bots are matched by their actual templates rather than their names, so a human
+# comment that merely starts with "Codecov ..." or "Dependabot ..." is kept.
+BOT_TEMPLATE_RE = re.compile(
+    r"^\s*(?:#+\s*)?(?:"
+    r"<!--(?:(?!-->).)*?(?:generated|bot|template|renovate)"
+    r"|this (?:comment|review) (?:was|is) (?:automatically|auto-)generated"
+    r"|\[bot\]"
+    r"|:robot:"
+    # Codecov: "## [Codecov](https://app.codecov.io/gh/...) Report" or "## Codecov Report"
+    r"|\[(?:!\[)?codecov\]\(https?://(?:app\.)?codecov\.io/"
+    r"|#+\s*codecov report\b"
+    # Coveralls: "## Pull Request Test Coverage Report for [Build 123](https://coveralls.io/...)"
+    r"|pull request test coverage report for \[build"
+    r"|\[!\[coverage status\]\(https?://coveralls\.io/"
+    # Dependabot: "Bumps [lodash](...) from 4.17.20 to 4.17.21." and its commands
+    r"|bumps \[[^\]]+\]\([^)]*\) from \S+ to \S+"
+    r"|@dependabot (?:rebase|recreate|merge|squash and merge|cancel merge|reopen|close|ignore)\b"
+    # Renovate: "This PR contains the following updates:" and its Mend badge
+    r"|this pr contains the following updates:"
+    r"|\[!\[mend renovate\]"
+    # SonarCloud: "Kudos, SonarCloud Quality Gate passed!" and its quality gate badge
+    r"|(?:kudos, )?sonarcloud quality gate (?:passed|failed)"
+    r"|\[!\[quality gate (?:passed|failed)\]"
+    r")",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+def rule_blank(text, config):
+    """Reject blank or whitespace-only comments."""
+    return bool(text) and not text.isspace()
+
+
+def rule_min_length(text, config):
+    """Reject comments shorter than the configured minimum length."""
+    return len(text.strip()) >= config["min_length"]
+
+
+def rule_english_ratio(text, config):
+    """Reject comments whose share of ASCII letters among non-space characters is too low."""
+    non_space = "".join(text.split())
+    if not non_space:
+        return False
+    alpha_count = len(non_space) - len(non_space.translate(_ASCII_LETTERS_TABLE))
+    return alpha_count / len(non_space) >= config["min_english_ratio"]
+
+
+def rule_bot_template(text, config):
+    """Reject bot output and templated boilerplate."""
+    return BOT_TEMPLATE_RE.search(text) is None
+
+
+def rule_language_id(text, config):
+    """Reject comments whose character trigrams do not look like English."""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < config["language_id_min_words"]:
+        # Too little evidence to judge; leave it to the cheaper rules
+        return True
+    trigrams = []
+    for word in words:
+        padded = f" {word} "
+        trigrams.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    hits = sum(1 for trigram in trigrams if trigram in ENGLISH_TRIGRAMS)
+    return hits / len(trigrams) >= config["min_language_score"]
+
+
+# Registry of available rules, in the order they should run (cheapest first)
+RULES = {
+    "blank": rule_blank,
+    "min_length": rule_min_length,
+    "english_ratio": rule_english_ratio,
+    "bot_template": rule_bot_template,
+    "language_id": rule_language_id,
+}
+
+DEFAULT_RULES = ["blank", "min_length", "english_ratio"]
+
+
+def register_rule(name, func):
+    """
+    Register a custom filter rule so it can be selected by name.
+
+    Args:
+        name (str): Rule name
+        func (callable): Function (text, config) -> bool returning True to keep the comment
+    """
+    RULES[name] = func
+
+
+class CommentFilter:
+    """Shared comment validity filter with pluggable rules and per-rule reject counts."""
+
+    def __init__(self, rules=None, min_length=10, min_english_ratio=0.4,
+                 min_language_score=0.3, language_id_min_words=5):
+        """
+        Initialize the filter.
+
+        Args:
+            rules (list or str, optional): Rule names to apply in order (list or comma-separated string).
+                Default is blank, min_length and english_ratio.
+            min_length (int): Minimum stripped comment length
+            min_english_ratio (float): Minimum ASCII letter ratio among non-space characters
+            min_language_score (float): Minimum share of English trigrams for the language_id rule
+            language_id_min_words (int): Minimum number of words before language_id is applied
+        """
+        if isinstance(rules, str):
+            rules = [name.strip() for name in rules.split(",") if name.strip()]
+        rule_names = rules or DEFAULT_RULES
+
+        unknown = [name for name in rule_names if name not in RULES]
+        if unknown:
+            raise ValueError(f"Unknown comment filter rules: {', '.join(unknown)}")
+
+        self.rules = [(name, RULES[name]) for name in rule_names]
+        self.config = {
+            "min_length": min_length,
+            "min_english_ratio": min_english_ratio,
+            "min_language_score": min_language_score,
+            "language_id_min_words": language_id_min_words,
+        }
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def add_rule(self, name, func, position=None):
+        """
+        Add a rule to this filter instance.
+
+        Args:
+            name (str): Rule name used in reject counts
+            func (callable): Function (text, config) -> bool returning True to keep the comment
+            position (int, optional): Index to insert at; appended (run last) if omitted
+        """
+        if position is None:
+            self.rules.append((name, func))
+        else:
+            self.rules.insert(position, (name, func))
+
+    def check(self, comment_text):
+        """
+        Check a comment against all rules.
+
+        Args:
+            comment_text (str): The comment text to validate
+
+        Returns:
+            tuple: (is_valid, name of the first rule that rejected it or None)
+        """
+        text = comment_text or ""
+        rejected_by = None
+        for name, rule in self.rules:
+            if not rule(text, self.config):
+                rejected_by = name
+                break
+
+        with self._lock:
+            self.stats["checked"] += 1
+            if rejected_by:
+                self.stats["rejected"][rejected_by] += 1
+            else:
+                self.stats["accepted"] += 1
+
+        if rejected_by:
+            logger.debug(f"Skipping comment rejected by rule '{rejected_by}'")
+        return rejected_by is None, rejected_by
+
+    def is_valid(self, comment_text):
+        """
+        Check if a comment is valid for collection.
+
+        Args:
+            comment_text (str): The comment text to validate
+
+        Returns:
+            bool: True if the comment passes every rule
+        """
+        return self.check(comment_text)[0]
+
+    def filter_texts(self, texts):
+        """
+        Validate a batch of comment texts.
+
+        Args:
+            texts (list): Comment texts
+
+        Returns:
+            list: Booleans, True where the comment passes every rule
+        """
+        return [self.check(text)[0] for text in texts]
+
+    def filter_comments(self, comments, key="comment"):
+        """
+        Keep only the comment objects whose text passes every rule.
+
+        Args:
+            comments (list): Comment objects
+            key (str): Field holding the comment text
+
+        Returns:
+            list: Comments that passed
+        """
+        mask = self.filter_texts([comment.get(key, "") for comment in comments])
+        return [comment for comment, keep in zip(comments, mask) if keep]
+
+    def reset_stats(self):
+        """Reset the reject counters."""
+        self.stats = {"checked": 0, "accepted": 0, "rejected": Counter()}
+
+    def get_stats(self):
+        """
+        Get filter statistics.
+
+        Returns:
+            dict: Checked/accepted totals and reject counts per rule
+        """
+        with self._lock:
+            return {
+                "checked": self.stats["checked"],
+                "accepted": self.stats["accepted"],
+                "rejected": {name: self.stats["rejected"][name] for name, _ in self.rules},
+            }
+
+    def format_stats(self):
+        """Format the statistics as a single log line."""
+        stats = self.get_stats()
+        rejected = ", ".join(f"{name}={count}" for name, count in stats["rejected"].items())
+        return f"checked={stats['checked']}, accepted={stats['accepted']}, rejected: {rejected}"
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Evaluate reduced embedding dimensions on our own corpus.
+
+text-embedding-3 vectors shortened with the `dimensions` parameter equal the
+full vector truncated to its first N values and re-normalized. So full-size
+vectors sampled from an existing collection are enough to compare recall@k and
+search latency at reduced sizes, without any embedding calls. Points are sampled
+at random and chunk points are left out (see collection_benchmark.sample_points).
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import json
+import math
+import time
+import logging
+import argparse
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+from collection_profiles import COLLECTION_PROFILES, get_profile, collection_config, search_params, estimate_memory
+from collection_benchmark import sample_points, wait_until_indexed, percentile
+from qdrant_uploader import QdrantUploader
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def reduce_dimensions(vector, dimensions):
+    """
+    Shorten an embedding the way the API's `dimensions` parameter does.
+
+    Args:
+        vector (list): Full-size embedding
+        dimensions (int): Target size
+
+    Returns:
+        list: First `dimensions` values, normalized to unit length
+    """
+    head = vector[:dimensions]
+    norm = math.sqrt(sum(value * value for value in head)) or 1.0
+    return [value / norm for value in head]
+
+
+def load_and_search(client, collection_name, profile, corpus, queries, dimensions, k, exact=False, keep=False):
+    """
+    Load vectors reduced to some dimensions into a scratch collection and search it.
+
+    Args:
+        client (QdrantClient): Qdrant client
+        collection_name (str): Name of the scratch collection
+        profile (dict): Collection profile from get_profile()
+        corpus (list): Records with full-size vectors
+        queries (list): Full-size query vectors
+        dimensions (int): Vector size to evaluate
+        k (int): Neighbours per query
+        exact (bool): Full scan instead of the profile's index search
+        keep (bool): Keep the scratch collection
+
+    Returns:
+        tuple: (result IDs per query, latencies in ms, build seconds)
+    """
+    if client.collection_exists(collection_name):
+        client.delete_collection(collection_name)
+    client.create_collection(collection_name=collection_name, **collection_config(profile, dimensions))
+
+    start = time.time()
+    uploader = QdrantUploader(client, collection_name)
+    uploader.add(models.PointStruct(id=record.id, vector=reduce_dimensions(record.vector, dimensions))
+                 for record in corpus)
+    uploader.close()
+    wait_until_indexed(client, collection_name)
+    build_seconds = time.time() - start
+
+    results = []
+    latencies = []
+    for query in queries:
+        search_start = time.perf_counter()
+        points = client.query_points(
+            collection_name=collection_name, query=reduce_dimensions(query, dimensions), limit=k,
+            search_params=search_params(profile, exact=exact), with_payload=False
+        ).points
+        latencies.append((time.perf_counter() - search_start) * 1000)
+        results.append([point.id for point in points])
+
+    if not keep:
+        client.delete_collection(collection_name)
+    return results, latencies, build_seconds
+
+
+def evaluate_dimensions(client, source, dimensions_list, sample=10000, queries=100, k=10, profile="default", seed=None,
+                        keep=False):
+    """
+    Compare recall@k and latency of reduced dimensions against exact full-size search.
+
+    Args:
+        client (QdrantClient): Qdrant client
+        source (str): Collection of full-size vectors to sample from
+        dimensions_list (list): Reduced sizes to evaluate
+        sample (int): Points indexed per size
+        queries (int): Held-out points used as queries
+        k (int): Neighbours per query
+        profile (str): Collection profile of the scratch collections
+        seed (int, optional): Seed of the random point sample, for repeatable runs
+        keep (bool): Keep the scratch collections
+
+    Returns:
+        list: One result per size, full size first
+    """
+    points = sample_points(client, source, sample + queries, seed=seed)
+    if len(points) <= queries:
+        raise ValueError(f"Collection '{source}' has too few points ({len(points)}) to evaluate")
+    corpus = points[:-queries]
+    query_vectors = [record.vector for record in points[-queries:]]
+    full_size = len(corpus[0].vector)
+    collection_profile = get_profile(profile)
+    logger.info(f"Evaluating {len(corpus)} points of {full_size} dimensions with {len(query_vectors)} queries")
+
+    # Ground truth: exact neighbours at full size
+    truth, _, _ = load_and_search(client, f"{source}_eval_exact", collection_profile, corpus, query_vectors,
+                                  full_size, k, exact=True, keep=keep)
+
+    results = []
+    for dimensions in [full_size] + sorted((d for d in dimensions_list if d < full_size), reverse=True):
+        found, latencies, build_seconds = load_and_search(
+            client, f"{source}_eval_{dimensions}", collection_profile, corpus, query_vectors, dimensions, k, keep=keep
+        )
+        recalls = [len(set(expected) & set(actual)) / len(expected) for expected, actual in zip(truth, found) if expected]
+        result = {
+            "dimensions": dimensions,
+            f"recall@{k}": round(sum(recalls) / len(recalls), 4) if recalls else None,
+            "search_ms_p50": round(percentile(latencies, 50), 2),
+            "search_ms_p95": round(percentile(latencies, 95), 2),
+            "build_seconds": round(build_seconds, 2),
+            "estimated_ram_bytes": estimate_memory(collection_profile, len(corpus), dimensions)["total"],
+        }
+        logger.info(f"{dimensions} dimensions: {result}")
+        results.append(result)
+    return results
+
+
+def main():
+    """Main function to run the dimension evaluation from command line."""
+    parser = argparse.ArgumentParser(description="Compare recall@k of reduced embedding dimensions to full size")
+
+    parser.add_argument("--collection", type=str, default="github_comments",
+                        help="Collection of full-size text-embedding-3 vectors to sample")
+    parser.add_argument("--qdrant-url", type=str, default="http://localhost:6333",
+                        help="Qdrant server URL")
+    parser.add_argument("--qdrant-key", type=str,
+                        help="Qdrant API key for authentication")
+    parser.add_argument("--dimensions", type=int, nargs="+", default=[1024, 512, 256],
+                        help="Reduced sizes to evaluate (default: 1024 512 256)")
+    parser.add_argument("--sample", type=int, default=10000,
+                        help="Points indexed per size (default: 10000)")
+    parser.add_argument("--queries", type=int, default=100,
+                        help="Held-out points used as queries (default: 100)")
+    parser.add_argument("--k", type=int, default=10,
+                        help="Neighbours per query for recall@k (default: 10)")
+    parser.add_argument("--profile", type=str, default="default", choices=list(COLLECTION_PROFILES),
+                        help="Collection profile of the scratch collections (default: default)")
+    parser.add_argument("--seed", type=int,
+                        help="Seed of the random point sample, for repeatable runs")
+    parser.add_argument("--keep", action="store_true",
+                        help="Keep the scratch collections")
+    parser.add_argument("--output", type=str,
+                        help="Write the results as JSON to this file")
+
+    args = parser.parse_args()
+
+    try:
+        client = QdrantClient(url=args.qdrant_url, api_key=args.qdrant_key) if args.qdrant_key \
+            else QdrantClient(url=args.qdrant_url)
+        results = evaluate_dimensions(client, args.collection, args.dimensions, sample=args.sample,
+                                      queries=args.queries, k=args.k, profile=args.profile, seed=args.seed,
+                                      keep=args.keep)
+
+        print(f"\n{'dimensions':<12}{f'recall@{args.k}':>11}{'p50 (ms)':>10}{'p95 (ms)':>10}{'RAM (MB)':>10}")
+        for result in results:
+            print(f"{result['dimensions']:<12}{result[f'recall@{args.k}']:>11.4f}{result['search_ms_p50']:>10.2f}"
+                  f"{result['search_ms_p95']:>10.2f}{result['estimated_ram_bytes'] / 2 ** 20:>10.1f}")
+
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+        return 0
+    except Exception as e:
+        logger.error(f"Error: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,213 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import time
+import logging
+import threading
+from openai import OpenAI
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # Optional: only needed by the local backend
+    SentenceTransformer = None
+
+logger = logging.getLogger(__name__)
+
+# Vector size of known OpenAI embedding models (unknown models use the size of the first vector)
+OPENAI_EMBEDDING_DIMENSIONS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+}
+# Models that can return shortened vectors through the `dimensions` parameter
+REDUCIBLE_MODEL_PREFIX = "text-embedding-3"
+
+DEFAULT_OPENAI_MODEL = "text-embedding-3-small"
+DEFAULT_LOCAL_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+class OpenAIBackend:
+    """Embeds texts with the OpenAI embeddings API."""
+
+    name = "openai"
+    # API limits of one embeddings request
+    max_input_tokens = 8191
+    max_batch_items = 2048
+
+    def __init__(self, api_key, model=DEFAULT_OPENAI_MODEL, rate_limit_delay=0.1):
+        """
+        Initialize the backend.
+
+        Args:
+            api_key (str): OpenAI API key
+            model (str): OpenAI embedding model
+            rate_limit_delay (float): Delay after each request in seconds
+        """
+        if not api_key:
+            raise ValueError("OpenAI API key not found. Please provide via parameter or OPENAI_API_KEY environment variable")
+        self.client = OpenAI(api_key=api_key)
+        self.model = model
+        self.rate_limit_delay = rate_limit_delay
+
+    @property
+    def model_id(self):
+        """Identifier of the vectors this backend produces (cache keys, collection metadata)."""
+        return self.model
+
+    @property
+    def exact_tokens(self):
+        """Whether TokenCounter counts this model's tokens exactly (when tiktoken is installed)."""
+        return True
+
+    def full_size(self):
+        """Return the model's vector size, or None if unknown."""
+        return OPENAI_EMBEDDING_DIMENSIONS.get(self.model)
+
+    def supports_dimensions(self):
+        """Whether the model can return shortened vectors."""
+        return self.model.startswith(REDUCIBLE_MODEL_PREFIX)
+
+    def embed(self, texts, dimensions=None):
+        """
+        Embed texts in one request.
+
+        Args:
+            texts (list): Texts to embed
+            dimensions (int, optional): Reduced vector size to request
+
+        Returns:
+            list: Embedding vector for each text, in order
+
+        Raises:
+            Exception: Any API error
+        """
+        extra = {"dimensions": dimensions} if dimensions else {}
+        try:
+            response = self.client.embeddings.create(model=self.model, input=texts, **extra)
+            return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+        finally:
+            # Add delay to avoid rate limiting
+            time.sleep(self.rate_limit_delay)
+
+
+class LocalBackend:
+    """
+    Embeds texts on the CPU with a sentence-transformers model.
+
+    Needs no network once the model is in the local Hugging Face cache (or
+    `model` is a directory), so it also runs in air-gapped environments. With
+    runtime "onnx" the model runs on ONNX Runtime, which is usually faster on
+    CPU than PyTorch. Vectors are normalized, so cosine collections work as with
+    OpenAI vectors, but the two backends' vectors are not comparable: a
+    collection must be filled by one backend and model.
+    """
+
+    name = "local"
+    max_batch_items = 4096
+
+    def __init__(self, model=DEFAULT_LOCAL_MODEL, runtime="torch", threads=None, batch_size=64):
+        """
+        Load the model.
+
+        Args:
+            model (str): sentence-transformers model name or local path
+            runtime (str): "torch" or "onnx"
+            threads (int, optional): CPU threads used by the model (default: all cores)
+            batch_size (int): Texts per forward pass
+        """
+        if SentenceTransformer is None:
+            raise ImportError("The local embedding backend needs sentence-transformers "
+                              "(pip install sentence-transformers, plus onnxruntime for the onnx runtime)")
+        if runtime not in ("torch", "onnx"):
+            raise ValueError(f"Invalid runtime: {runtime}")
+        self.model = model
+        self.runtime = runtime
+        self.batch_size = batch_size
+        extra = {}
+        if runtime == "onnx":
+            model_kwargs = {"provider": "CPUExecutionProvider"}
+            if threads:
+                import onnxruntime
+                session_options = onnxruntime.SessionOptions()
+                session_options.intra_op_num_threads = threads
+                model_kwargs["session_options"] = session_options
+            extra = {"backend": "onnx", "model_kwargs": model_kwargs}
+        elif threads:
+            import torch
+            torch.set_num_threads(threads)
+        self.encoder = SentenceTransformer(model, device="cpu", **extra)
+        # The model's own threads do the parallel work; one forward pass at a time
+        self._lock = threading.Lock()
+        logger.info(f"Loaded local embedding model {model} ({runtime}, {threads or 'all'} threads)")
+
+    @property
+    def model_id(self):
+        """Identifier of the vectors this backend produces (cache keys, collection metadata)."""
+        return f"local:{self.model}"
+
+    @property
+    def exact_tokens(self):
+        """The model's own tokenizer differs from TokenCounter's, so counts are estimates."""
+        return False
+
+    @property
+    def max_input_tokens(self):
+        """Longest input the model reads; longer inputs would be silently truncated."""
+        return self.encoder.max_seq_length
+
+    def full_size(self):
+        """Return the model's vector size."""
+        return self.encoder.get_sentence_embedding_dimension()
+
+    def supports_dimensions(self):
+        """Local models always return full-size vectors."""
+        return False
+
+    def embed(self, texts, dimensions=None):
+        """
+        Embed texts in batches of batch_size.
+
+        Args:
+            texts (list): Texts to embed
+            dimensions (int, optional): Not supported; must be None
+
+        Returns:
+            list: Normalized embedding vector for each text, in order
+        """
+        if dimensions:
+            raise ValueError(f"{self.model} does not support reduced dimensions")
+        with self._lock:
+            vectors = self.encoder.encode(texts, batch_size=self.batch_size, normalize_embeddings=True,
+                                          convert_to_numpy=True, show_progress_bar=False)
+        return vectors.tolist()
+
+
+EMBEDDING_BACKENDS = {
+    "openai": OpenAIBackend,
+    "local": LocalBackend,
+}
+
+
+def create_backend(name, model=None, openai_api_key=None, rate_limit_delay=0.1, runtime="torch", threads=None,
+                   batch_size=64):
+    """
+    Create an embedding backend by name.
+
+    Args:
+        name (str): Backend name in EMBEDDING_BACKENDS
+        model (str, optional): Model name (default: the backend's default model)
+        openai_api_key (str, optional): OpenAI API key (openai backend)
+        rate_limit_delay (float): Delay after each request (openai backend)
+        runtime (str): "torch" or "onnx" (local backend)
+        threads (int, optional): CPU threads (local backend)
+        batch_size (int): Texts per forward pass (local backend)
+
+    Returns:
+        Embedding backend
+    """
+    if name == "openai":
+        return OpenAIBackend(openai_api_key, model or DEFAULT_OPENAI_MODEL, rate_limit_delay)
+    if name == "local":
+        return LocalBackend(model or DEFAULT_LOCAL_MODEL, runtime, threads, batch_size)
+    raise ValueError(f"Unknown embedding backend: {name} (choose from {', '.join(EMBEDDING_BACKENDS)})")
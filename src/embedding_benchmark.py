@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Compare the throughput of embedding backends on real comment texts.
+
+Texts are prepared from an enriched comments file exactly as the importer
+prepares them, then embedded by each backend without the embedding cache.
+Nothing is uploaded to Qdrant.
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import json
+import time
+import logging
+import argparse
+from embedding_backends import EMBEDDING_BACKENDS, DEFAULT_LOCAL_MODEL
+from embedding_importer import CommentEmbedder
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def benchmark_backend(embedder, texts, repeat=1):
+    """
+    Embed texts with an embedder and measure throughput.
+
+    Args:
+        embedder (CommentEmbedder): Embedder using the backend to measure (without cache)
+        texts (list): Prepared embedding texts
+        repeat (int): Passes over the texts; the best pass is reported
+
+    Returns:
+        dict: Texts, tokens, failures, best seconds, texts and tokens per second
+    """
+    tokens = sum(embedder.token_counter.count(text) for text in texts)
+    best = None
+    failed = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        vectors = embedder.create_embeddings(texts)
+        seconds = time.perf_counter() - start
+        failed = sum(vector is None for vector in vectors)
+        best = seconds if best is None else min(best, seconds)
+    vector_size = next((len(vector) for vector in vectors if vector is not None), None)
+    return {
+        "backend": embedder.backend.name,
+        "model": embedder.embedding_model,
+        "vector_size": vector_size,
+        "texts": len(texts),
+        "tokens": tokens,
+        "failed": failed,
+        "seconds": round(best, 3),
+        "texts_per_second": round(len(texts) / best, 1) if best else 0.0,
+        "tokens_per_second": round(tokens / best, 1) if best else 0.0,
+    }
+
+
+def main():
+    """Main function to run the backend benchmark from command line."""
+    parser = argparse.ArgumentParser(description="Compare embedding backend throughput on comment texts")
+
+    parser.add_argument("--input", type=str, required=True,
+                        help="Enriched comments JSON file to take texts from")
+    parser.add_argument("--sample", type=int, default=1000,
+                        help="Comments to embed (default: 1000)")
+    parser.add_argument("--backends", type=str, nargs="+", default=list(EMBEDDING_BACKENDS),
+                        choices=list(EMBEDDING_BACKENDS),
+                        help="Backends to compare (default: all)")
+    parser.add_argument("--openai-key", type=str, default=os.getenv("OPENAI_API_KEY"),
+                        help="OpenAI API key (or use OPENAI_API_KEY env variable)")
+    parser.add_argument("--openai-model", type=str, default="text-embedding-3-small",
+                        help="Model of the openai backend (default: text-embedding-3-small)")
+    parser.add_argument("--local-model", type=str, default=DEFAULT_LOCAL_MODEL,
+                        help=f"Model of the local backend (default: {DEFAULT_LOCAL_MODEL})")
+    parser.add_argument("--local-runtime", type=str, default="torch", choices=["torch", "onnx"],
+                        help="Runtime of the local backend's model (default: torch)")
+    parser.add_argument("--threads", type=int,
+                        help="CPU threads of the local backend's model (default: all cores)")
+    parser.add_argument("--embedding-batch-size", type=int, default=256,
+                        help="Maximum texts per embedding call (default: 256)")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="Passes over the texts per backend; the best is reported (default: 1)")
+    parser.add_argument("--output", type=str,
+                        help="Write the results as JSON to this file")
+
+    args = parser.parse_args()
+
+    try:
+        with open(args.input, 'r', encoding='utf-8') as f:
+            comments = json.load(f)[:args.sample]
+        if not comments:
+            logger.error(f"No comments in {args.input}")
+            return 1
+
+        results = []
+        for name in args.backends:
+            embedder = CommentEmbedder(
+                openai_api_key=args.openai_key,
+                embedding_model=args.openai_model if name == "openai" else args.local_model,
+                embedding_backend=name,
+                local_runtime=args.local_runtime,
+                embedding_threads=args.threads,
+                embedding_batch_size=args.embedding_batch_size,
+                rate_limit_delay=0
+            )
+            texts = []
+            for comment in comments:
+                texts.extend(embedder.split_oversize(embedder.prepare_text_for_embedding(comment)))
+            result = benchmark_backend(embedder, texts, args.repeat)
+            logger.info(f"{name}: {result}")
+            results.append(result)
+
+        print(f"\n{'backend':<9}{'model':<42}{'texts':>7}{'seconds':>10}{'texts/s':>10}{'tokens/s':>11}")
+        for result in results:
+            print(f"{result['backend']:<9}{result['model']:<42}{result['texts']:>7}{result['seconds']:>10.2f}"
+                  f"{result['texts_per_second']:>10.1f}{result['tokens_per_second']:>11.1f}")
+
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+        return 0
+    except Exception as e:
+        logger.error(f"Error: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,194 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import time
+import array
+import sqlite3
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed store of embedding vectors.
+
+    Entries are keyed by a SHA-256 of model, vector dimensions and the prepared
+    text, so reruns, re-indexing into a new Qdrant collection and collection
+    rebuilds are served without API calls. Vectors are stored as float32 blobs
+    in SQLite (half the size of the JSON floats returned by the API), with
+    least-recently-used eviction once max_bytes is exceeded.
+    """
+
+    def __init__(self, cache_file, max_bytes=1024 * 1024 * 1024, bypass=False):
+        """
+        Initialize the cache, creating the database if needed.
+
+        Args:
+            cache_file (str): Path to the SQLite cache file
+            max_bytes (int): Maximum total size of cached vectors before eviction
+            bypass (bool): Skip cache reads (vectors are still written), e.g. to force fresh embeddings
+        """
+        self.cache_file = cache_file
+        self.max_bytes = max_bytes
+        self.bypass = bypass
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+        cache_dir = os.path.dirname(cache_file)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(cache_file, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, model TEXT NOT NULL, dimensions INTEGER NOT NULL, "
+            "vector BLOB NOT NULL, created REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings (last_access)")
+        self._conn.commit()
+        # Running size of all vectors, so writes do not have to scan the table
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()[0]
+
+    @staticmethod
+    def make_key(model, dimensions, text):
+        """
+        Build the cache key for a text.
+
+        Args:
+            model (str): Embedding model name
+            dimensions (int): Vector dimensions requested from the model (None for its default)
+            text (str): Prepared text that is embedded
+
+        Returns:
+            str: Hex digest
+        """
+        payload = f"{model}\0{dimensions or ''}\0{text}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _pack(vector):
+        """Serialize a vector as little-endian float32."""
+        values = array.array("f", vector)
+        if sys.byteorder == "big":
+            values.byteswap()
+        return values.tobytes()
+
+    @staticmethod
+    def _unpack(blob):
+        """Deserialize a little-endian float32 vector."""
+        values = array.array("f")
+        values.frombytes(blob)
+        if sys.byteorder == "big":
+            values.byteswap()
+        return values.tolist()
+
+    def get_many(self, keys):
+        """
+        Look up cached vectors.
+
+        Args:
+            keys (list): Cache keys from make_key()
+
+        Returns:
+            dict: key -> vector for the keys found (empty when bypassing)
+        """
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        with self._lock:
+            if self.bypass:
+                self.stats["misses"] += len(keys)
+                return {}
+            now = time.time()
+            # Stay under SQLite's limit on query parameters
+            for start in range(0, len(unique_keys), 500):
+                chunk = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = self._unpack(blob)
+                if rows:
+                    self._conn.execute(
+                        f"UPDATE embeddings SET last_access = ? WHERE key IN ({placeholders})", [now, *chunk]
+                    )
+            self._conn.commit()
+            self.stats["hits"] += sum(1 for key in keys if key in found)
+            self.stats["misses"] += sum(1 for key in keys if key not in found)
+        return found
+
+    def put_many(self, model, dimensions, entries):
+        """
+        Store vectors and evict least recently used entries if over budget.
+
+        Args:
+            model (str): Embedding model name
+            dimensions (int): Vector dimensions requested from the model (None for its default)
+            entries (list): (key, vector) pairs
+        """
+        if not entries:
+            return
+        now = time.time()
+        rows = {key: (key, model, dimensions or len(vector), self._pack(vector), now, now) for key, vector in entries}
+        keys = list(rows)
+        with self._lock:
+            # Vectors being replaced no longer count towards the size
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                self._total_bytes -= self._conn.execute(
+                    f"SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings "
+                    f"WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchone()[0]
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, dimensions, vector, created, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                list(rows.values())
+            )
+            self._total_bytes += sum(len(row[3]) for row in rows.values())
+            self.stats["writes"] += len(rows)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Delete least recently used entries until the cache fits max_bytes. Caller holds the lock."""
+        while self._total_bytes > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_access LIMIT 256"
+            ).fetchall()
+            if not rows:
+                self._total_bytes = 0
+                return
+            for key, size in rows:
+                if self._total_bytes <= self.max_bytes:
+                    return
+                self._conn.execute("DELETE FROM embeddings WHERE key = ?", (key,))
+                self._total_bytes -= size
+                self.stats["evictions"] += 1
+
+    def get_stats(self):
+        """
+        Get cache statistics.
+
+        Returns:
+            dict: Hits, misses, writes, evictions, hit rate and current size
+        """
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            total = self._total_bytes
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+            "entries": entries,
+            "size_bytes": total,
+        }
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
@@ -11,53 +11,147 @@ import json
 import logging
 import argparse
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import time
-from openai import OpenAI
+from openai import BadRequestError, RateLimitError, APIConnectionError, InternalServerError
 from qdrant_client import QdrantClient
 from qdrant_client.http import models
 import uuid
+import math
 import hashlib
+import threading
+from token_counter import TokenCounter, TokenStats
+from hunk_store import trim_hunk
+from embedding_cache import EmbeddingCache
+from qdrant_uploader import QdrantUploader
+from embedding_backends import EMBEDDING_BACKENDS, create_backend
+from collection_profiles import (COLLECTION_PROFILES, DEFAULT_PAYLOAD_INDEXES, get_profile, collection_config,
+                                 create_payload_indexes)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, 
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Embedding text templates: (label, comment field) in order. The ID is stored in each payload
+# as embedding_template; bump it when a template changes so points are re-embedded.
+EMBEDDING_TEMPLATES = {
+    "json-v1": None,  # Whole record as indented JSON
+    "compact-v1": (
+        ("Review type", "review_type"),
+        ("Language", "language"),
+        ("Framework", "framework"),
+        ("File", "file_path"),
+        ("Comment", "comment"),
+        ("Diff", "diff_context"),
+    ),
+}
+# Same fields as compact-v1, but the comment is never cut to the text budget
+EMBEDDING_TEMPLATES["compact-v2"] = EMBEDDING_TEMPLATES["compact-v1"]
+DEFAULT_EMBEDDING_TEMPLATE = "compact-v2"
+# Fields whose end is kept when the text must be shortened (review hunks end at the commented line)
+TAIL_FIELDS = {"diff_context"}
+# Fields kept whole by a template; texts over the model's input limit are chunked instead
+UNBUDGETED_FIELDS = {"compact-v2": {"comment"}}
+# Errors of an embeddings request that are retried as is (timeouts are connection errors)
+TRANSIENT_ERRORS = (RateLimitError, APIConnectionError, InternalServerError)
+EMBEDDING_MAX_RETRIES = 5
+
 class CommentEmbedder:
     """Class for creating embeddings from GitHub comments and importing to Qdrant."""
     
-    def __init__(self, openai_api_key=None, embedding_model="text-embedding-3-small", 
+    def __init__(self, openai_api_key=None, embedding_model=None, 
                  qdrant_url="http://localhost:6333", qdrant_api_key=None, 
-                 batch_size=100, rate_limit_delay=0.1):
+                 batch_size=100, rate_limit_delay=0.1, near_duplicate_mode="embed",
+                 embedding_batch_size=256, embedding_token_budget=100000, embedding_cache=None,
+                 incremental=True, embedding_template=DEFAULT_EMBEDDING_TEMPLATE,
+                 embedding_text_token_budget=512, embedding_diff_lines=10, chunk_tokens=2048,
+                 chunk_overlap=200, pool_chunks=True, upload_workers=4, prefer_grpc=False,
+                 collection_profile="default", hnsw_m=None, hnsw_ef_construct=None,
+                 payload_indexes=DEFAULT_PAYLOAD_INDEXES, embedding_dimensions=None,
+                 embedding_backend="openai", local_runtime="torch", embedding_threads=None):
         """
         Initialize embedder with API keys and connection settings.
         
         Args:
-            openai_api_key (str): OpenAI API key
-            embedding_model (str): OpenAI embedding model to use
+            openai_api_key (str): OpenAI API key (openai backend)
+            embedding_model (str, optional): Embedding model to use (default: the backend's default model)
             qdrant_url (str): URL to Qdrant server
             qdrant_api_key (str): API key for Qdrant authentication
             batch_size (int): Number of vectors to upload in each batch
-            rate_limit_delay (float): Delay between API calls in seconds
+            rate_limit_delay (float): Delay between API calls in seconds (openai backend)
+            embedding_batch_size (int): Maximum comments per embeddings request
+            embedding_token_budget (int): Maximum total input tokens per embeddings request
+            embedding_cache (EmbeddingCache, optional): Persistent store of vectors already embedded
+            incremental (bool): Only embed and upload comments whose point is missing or whose payload changed
+            embedding_template (str): ID of the embedding text template in EMBEDDING_TEMPLATES
+            embedding_text_token_budget (int): Maximum tokens of the context fields of a templated embedding text
+                (compact-v2 keeps the comment whole; compact-v1 counts it against the budget)
+            embedding_diff_lines (int): Diff lines before the commented line kept in a templated text
+            chunk_tokens (int): Tokens per chunk of a text over the model's input limit
+            chunk_overlap (int): Tokens shared by consecutive chunks
+            pool_chunks (bool): Give a chunked comment the mean of its chunk vectors (otherwise its first chunk's)
+            upload_workers (int): Concurrent Qdrant upsert requests
+            prefer_grpc (bool): Talk to Qdrant over gRPC (port 6334) instead of HTTP
+            collection_profile (str): Storage profile of new collections (see COLLECTION_PROFILES)
+            hnsw_m (int, optional): Override the profile's HNSW edges per node
+            hnsw_ef_construct (int, optional): Override the profile's HNSW build-time neighbours
+            payload_indexes (iterable): Payload fields given a keyword index in new collections
+            embedding_dimensions (int, optional): Vector size of new collections, below the model's full size
+                (text-embedding-3 models only; existing collections keep the size they were created with)
+            embedding_backend (str): "openai" (embeddings API) or "local" (sentence-transformers on the CPU)
+            local_runtime (str): "torch" or "onnx" (local backend)
+            embedding_threads (int, optional): CPU threads of the local model (default: all cores)
+            near_duplicate_mode (str): How to handle comments marked near_duplicate_of:
+                "embed" (embed normally), "share" (reuse the representative's vector) or "skip"
         """
-        # Initialize OpenAI client
-        self.openai_api_key = openai_api_key
-        if not self.openai_api_key:
-            raise ValueError("OpenAI API key not found. Please provide via parameter or OPENAI_API_KEY environment variable")
-        
-        self.openai_client = OpenAI(api_key=self.openai_api_key)
-        self.embedding_model = embedding_model
+        if near_duplicate_mode not in ("embed", "share", "skip"):
+            raise ValueError(f"Invalid near_duplicate_mode: {near_duplicate_mode}")
+        self.near_duplicate_mode = near_duplicate_mode
+        if embedding_template not in EMBEDDING_TEMPLATES:
+            raise ValueError(f"Invalid embedding_template: {embedding_template}")
+        self.embedding_template = embedding_template
+        self.embedding_text_token_budget = embedding_text_token_budget
+        self.embedding_diff_lines = embedding_diff_lines
+        self.chunk_overlap = chunk_overlap
+        self.pool_chunks = pool_chunks
+
+        # Initialize the embedding backend
+        if embedding_backend not in EMBEDDING_BACKENDS:
+            raise ValueError(f"Invalid embedding_backend: {embedding_backend}")
+        self.backend = create_backend(embedding_backend, embedding_model, openai_api_key=openai_api_key,
+                                      rate_limit_delay=rate_limit_delay, runtime=local_runtime,
+                                      threads=embedding_threads)
+        self.embedding_model = self.backend.model
+        self.chunk_tokens = min(chunk_tokens, self.backend.max_input_tokens)
+        if embedding_dimensions:
+            full_size = self.backend.full_size()
+            if not self.backend.supports_dimensions():
+                raise ValueError(f"{self.embedding_model} does not support reduced dimensions")
+            if full_size and embedding_dimensions > full_size:
+                raise ValueError(f"{self.embedding_model} returns at most {full_size} dimensions")
+        self.embedding_dimensions = embedding_dimensions
         self.batch_size = batch_size
         self.rate_limit_delay = rate_limit_delay
+        self.embedding_batch_size = min(embedding_batch_size, self.backend.max_batch_items)
+        self.embedding_token_budget = embedding_token_budget
+        self.token_counter = TokenCounter(self.embedding_model)
+        self.embedding_cache = embedding_cache
+        self.text_token_stats = TokenStats()
+        self.truncated_fields = {}  # field -> texts in which it was cut or dropped to fit the budget
+        self._truncation_lock = threading.Lock()
+        self.incremental = incremental
+        self.upload_workers = upload_workers
+        self.collection_profile = get_profile(collection_profile, hnsw_m, hnsw_ef_construct)
+        self.payload_indexes = tuple(payload_indexes)
         
         # Initialize Qdrant client with API key authentication
         if qdrant_api_key:
-            self.qdrant_client = QdrantClient(url=qdrant_url, api_key=qdrant_api_key)
+            self.qdrant_client = QdrantClient(url=qdrant_url, api_key=qdrant_api_key, prefer_grpc=prefer_grpc)
         else:
             # Try to connect without authentication
-            self.qdrant_client = QdrantClient(url=qdrant_url)
-        logger.info(f"Connected to Qdrant at {qdrant_url}")
+            self.qdrant_client = QdrantClient(url=qdrant_url, prefer_grpc=prefer_grpc)
+        logger.info(f"Connected to Qdrant at {qdrant_url}{' (gRPC)' if prefer_grpc else ''}")
     
     def prepare_text_for_embedding(self, comment: Dict[str, Any], expert_name: str = None) -> str:
         """
@@ -77,12 +171,90 @@ class CommentEmbedder:
         else:
             comment_copy = comment
         
-        # Simply convert the entire dictionary to a formatted JSON string
-        return json.dumps(comment_copy, indent=2, ensure_ascii=False)
+        template = EMBEDDING_TEMPLATES[self.embedding_template]
+        if template is None:
+            # Simply convert the entire dictionary to a formatted JSON string
+            text = json.dumps(comment_copy, indent=2, ensure_ascii=False)
+            self.text_token_stats.record(self.token_counter.count(text))
+            return text
+        
+        parts = []
+        remaining = self.embedding_text_token_budget
+        unbudgeted = UNBUDGETED_FIELDS.get(self.embedding_template, set())
+        for label, field in template:
+            value = comment_copy.get(field)
+            if not value:
+                continue
+            value = str(value).strip()
+            separator = "\n" if "\n" in value else " "
+            if field in unbudgeted:
+                parts.append(f"{label}:{separator}{value}")
+                continue
+            if field == "diff_context":
+                value = trim_hunk(value, self.embedding_diff_lines)
+                separator = "\n" if "\n" in value else " "
+            # The label and separator cost a few tokens of their own
+            kept = self._truncate_field(value, remaining - self.token_counter.count(label) - 2,
+                                        keep_tail=field in TAIL_FIELDS)
+            if kept != value:
+                self._record_truncation(field, comment_copy)
+            value = kept
+            if not value:
+                continue
+            part = f"{label}:{separator}{value}"
+            parts.append(part)
+            remaining -= self.token_counter.count(part) + 1
+        
+        text = "\n".join(parts)
+        self.text_token_stats.record(self.token_counter.count(text))
+        return text
+    
+    def _record_truncation(self, field: str, comment: Dict[str, Any]):
+        """Count a field cut or dropped to fit the text budget (a cut comment is also logged)."""
+        with self._truncation_lock:
+            self.truncated_fields[field] = self.truncated_fields.get(field, 0) + 1
+        if field == "comment":
+            logger.warning(f"Comment {comment.get('comment_url', '')} cut to the embedding text budget "
+                           f"with template {self.embedding_template} (compact-v2 chunks it instead)")
+    
+    def get_truncation_stats(self) -> Dict[str, int]:
+        """Get how many embedding texts had each field cut or dropped to fit the text budget."""
+        with self._truncation_lock:
+            return dict(self.truncated_fields)
+    
+    def _truncate_field(self, value: str, max_tokens: int, keep_tail: bool = False) -> str:
+        """
+        Shorten a field value to a token budget.
+        
+        Tail fields drop whole lines from the start so diffs keep the commented line.
+        
+        Args:
+            value (str): Field value
+            max_tokens (int): Token budget
+            keep_tail (bool): Keep the end instead of the beginning
+            
+        Returns:
+            str: Value within the budget (empty if nothing fits)
+        """
+        if max_tokens <= 0:
+            return ""
+        if self.token_counter.count(value) <= max_tokens:
+            return value
+        if keep_tail:
+            kept, used = [], 0
+            for line in reversed(value.splitlines()):
+                tokens = self.token_counter.count(line) + 1
+                if used + tokens > max_tokens:
+                    break
+                kept.append(line)
+                used += tokens
+            if kept:
+                return "\n".join(reversed(kept))
+        return self.token_counter.truncate(value, max_tokens, keep="tail" if keep_tail else "head")
     
     def create_embedding(self, text: str) -> List[float]:
         """
-        Create an embedding vector for a text using OpenAI's API.
+        Create an embedding vector for a text with the embedding backend.
         
         Args:
             text (str): Text to embed
@@ -90,15 +262,318 @@ class CommentEmbedder:
         Returns:
             list: Embedding vector or None if error occurs
         """
+        return self.create_embeddings([text])[0]
+    
+    def split_oversize(self, text: str) -> List[str]:
+        """
+        Split a text over the model's input limit into overlapping chunks.
+        
+        Without tiktoken, or with a local model's own tokenizer, token counts are
+        estimates, so texts are split a quarter below the limit to stay clear of it.
+        
+        Args:
+            text (str): Prepared embedding text
+            
+        Returns:
+            list: The text itself if it fits, else its chunks
+        """
+        limit = self.backend.max_input_tokens
+        if not (self.token_counter.exact and self.backend.exact_tokens):
+            limit = limit * 3 // 4
+        if self.token_counter.count(text) <= limit:
+            return [text]
+        chunk_tokens = min(self.chunk_tokens, limit)
+        # Short-context local models get small chunks; keep the overlap below half a chunk
+        return self.token_counter.split(text, chunk_tokens, min(self.chunk_overlap, chunk_tokens // 2))
+    
+    @staticmethod
+    def pool(vectors: List[List[float]]) -> List[float]:
+        """Mean-pool vectors and normalize the result to unit length (for cosine distance)."""
+        mean = [sum(values) / len(vectors) for values in zip(*vectors)]
+        norm = math.sqrt(sum(value * value for value in mean)) or 1.0
+        return [value / norm for value in mean]
+    
+    def chunk_point_id(self, parent_id: str, chunk_index: int) -> str:
+        """Generate a deterministic UUID for a chunk of a comment."""
+        hash_bytes = hashlib.md5(f"{parent_id}#chunk{chunk_index}".encode('utf-8')).digest()
+        return str(uuid.UUID(bytes=hash_bytes[:16]))
+    
+    def chunk_payload(self, comment: Dict[str, Any], parent_id: str, chunk_index: int,
+                      chunk_count: int, text: str) -> Dict[str, Any]:
+        """
+        Build the payload of a chunk point.
+        
+        Chunks keep the comment's metadata for filtering, but not its full text.
+        
+        Args:
+            comment (dict): Parent comment
+            parent_id (str): Point ID of the parent comment
+            chunk_index (int): Position of the chunk
+            chunk_count (int): Number of chunks of the parent
+            text (str): Embedded chunk text
+            
+        Returns:
+            dict: Chunk payload
+        """
+        payload = {key: value for key, value in comment.items() if key not in ("comment", "diff_context")}
+        payload.update({"parent_id": parent_id, "chunk_index": chunk_index,
+                        "chunk_count": chunk_count, "chunk_text": text})
+        return payload
+    
+    def delete_chunks(self, collection_name: str, parent_ids: List[str]):
+        """
+        Delete the chunk points of comments that are being re-uploaded.
+        
+        Args:
+            collection_name (str): Name of the Qdrant collection
+            parent_ids (list): Point IDs of the parent comments
+        """
+        for start in range(0, len(parent_ids), self.batch_size):
+            self.qdrant_client.delete(
+                collection_name=collection_name,
+                points_selector=models.FilterSelector(
+                    filter=models.Filter(must=[models.FieldCondition(
+                        key="parent_id",
+                        match=models.MatchAny(any=parent_ids[start:start + self.batch_size])
+                    )])
+                )
+            )
+    
+    def vector_size(self, dimensions: Optional[int] = None) -> Optional[int]:
+        """Return the vector size for requested dimensions (default: the model's), or None if unknown."""
+        return dimensions or self.backend.full_size()
+    
+    def collection_dimensions(self, collection_name: str) -> Optional[int]:
+        """
+        Get the vector size to embed for a collection.
+        
+        An existing collection keeps the size it was created with; new collections
+        use embedding_dimensions. A collection whose metadata records another
+        backend or model is refused, since its vectors are not comparable.
+        
+        Args:
+            collection_name (str): Name of the collection
+            
+        Returns:
+            int: Dimensions to request, or None for the model's full size
+            
+        Raises:
+            ValueError: If the collection was filled by another backend or model
+        """
+        try:
+            if not self.qdrant_client.collection_exists(collection_name):
+                return self.embedding_dimensions
+            config = self.qdrant_client.get_collection(collection_name).config
+        except Exception as e:
+            logger.error(f"Error reading vector size of '{collection_name}': {e}")
+            return self.embedding_dimensions
+        
+        # Collections created without metadata (older clients or servers) are not checked;
+        # those created before backends were recorded hold OpenAI vectors
+        metadata = getattr(config, "metadata", None) or {}
+        recorded = (metadata.get("embedding_backend", "openai"), metadata.get("embedding_model"))
+        if metadata.get("embedding_model") and recorded != (self.backend.name, self.embedding_model):
+            raise ValueError(f"Collection '{collection_name}' holds vectors of {recorded[1]} ({recorded[0]} backend), "
+                             f"not {self.embedding_model} ({self.backend.name} backend)")
+        size = config.params.vectors.size
+        return None if size == self.backend.full_size() else size
+    
+    def _make_embedding_batches(self, texts: List[str]) -> List[List[int]]:
+        """
+        Group text indices into requests within the item cap and token budget.
+        
+        Texts over the per-input token limit get a request of their own, so their
+        rejection does not fail the texts they would have been batched with.
+        
+        Args:
+            texts (list): Texts to embed
+            
+        Returns:
+            list: Lists of indices into texts, one per request
+        """
+        batches = []
+        current = []
+        current_tokens = 0
+        for i, text in enumerate(texts):
+            tokens = self.token_counter.count(text)
+            if tokens > self.backend.max_input_tokens:
+                batches.append([i])
+                continue
+            if current and (len(current) >= self.embedding_batch_size
+                            or current_tokens + tokens > self.embedding_token_budget):
+                batches.append(current)
+                current = []
+                current_tokens = 0
+            current.append(i)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+    
+    def _embed_batch(self, texts: List[str], dimensions: Optional[int] = None) -> List[Optional[List[float]]]:
+        """
+        Embed texts in one request, splitting the batch in half when an input is rejected.
+        
+        A rejected text therefore only costs its own vector: it ends up retried alone
+        and is returned as None. Rate-limit, connection and server errors are retried
+        with backoff and raised once the retries are used up; other errors are raised.
+        
+        Args:
+            texts (list): Texts to embed
+            dimensions (int, optional): Reduced vector size to request
+            
+        Returns:
+            list: Embedding vector (or None if its input was rejected) for each text, in order
+        """
+        for attempt in range(1, EMBEDDING_MAX_RETRIES + 1):
+            try:
+                return self.backend.embed(texts, dimensions)
+            except BadRequestError as e:
+                if len(texts) == 1:
+                    logger.error(f"Embedding input rejected: {e}")
+                    return [None]
+                logger.warning(f"Embedding request of {len(texts)} texts rejected: {e}; splitting batch")
+                break
+            except TRANSIENT_ERRORS as e:
+                if attempt == EMBEDDING_MAX_RETRIES:
+                    raise
+                logger.warning(f"Error creating {len(texts)} embeddings (attempt {attempt}/{EMBEDDING_MAX_RETRIES}): "
+                               f"{e}; retrying")
+                time.sleep(min(2 ** attempt, 60))
+        
+        middle = len(texts) // 2
+        return self._embed_batch(texts[:middle], dimensions) + self._embed_batch(texts[middle:], dimensions)
+    
+    def create_embeddings(self, texts: List[str], dimensions: Optional[int] = None) -> List[Optional[List[float]]]:
+        """
+        Create embedding vectors for many texts with batched requests.
+        
+        Vectors found in the embedding cache are returned without an API call.
+        
+        Args:
+            texts (list): Texts to embed
+            dimensions (int, optional): Reduced vector size (default: the model's full size)
+            
+        Returns:
+            list: Embedding vector (or None if it could not be created) for each text, in order
+        """
+        embeddings = [None] * len(texts)
+        keys = []
+        if self.embedding_cache:
+            keys = [EmbeddingCache.make_key(self.backend.model_id, self.vector_size(dimensions), text) for text in texts]
+            cached = self.embedding_cache.get_many(keys)
+            for i, key in enumerate(keys):
+                embeddings[i] = cached.get(key)
+        
+        missing = [i for i, vector in enumerate(embeddings) if vector is None]
+        batches = self._make_embedding_batches([texts[i] for i in missing])
+        new_entries = []
+        for batch in batches:
+            indices = [missing[j] for j in batch]
+            vectors = self._embed_batch([texts[i] for i in indices], dimensions)
+            for i, vector in zip(indices, vectors):
+                embeddings[i] = vector
+                if vector is not None and keys:
+                    new_entries.append((keys[i], vector))
+        if self.embedding_cache:
+            self.embedding_cache.put_many(self.backend.model_id, self.vector_size(dimensions), new_entries)
+        if len(texts) > 1:
+            logger.debug(f"Embedded {sum(vector is not None for vector in embeddings)}/{len(texts)} texts "
+                        f"({len(texts) - len(missing)} cached) in {len(batches)} requests")
+        return embeddings
+    
+    def comment_point_id(self, comment: Dict[str, Any], index: int = 0) -> str:
+        """
+        Generate a deterministic UUID for a comment so the same comment always gets the same ID.
+        
+        Args:
+            comment (dict): A GitHub comment entry
+            index (int): Position of the comment in its file, used when no URL is available
+            
+        Returns:
+            str: UUID string
+        """
+        if 'comment_url' in comment and comment['comment_url']:
+            unique_string = comment['comment_url']
+        else:
+            # Create a unique string from multiple fields if URL isn't available
+            unique_string = f"{comment.get('repo', '')}-{comment.get('pr_number', '')}-{comment.get('created_at', '')}-{index}"
+        
+        hash_bytes = hashlib.md5(unique_string.encode('utf-8')).digest()
+        return str(uuid.UUID(bytes=hash_bytes[:16]))
+    
+    @staticmethod
+    def payload_hash(comment: Dict[str, Any]) -> str:
+        """
+        Hash a comment's payload, so changed comments can be told from points already uploaded.
+        
+        Args:
+            comment (dict): A GitHub comment entry
+            
+        Returns:
+            str: Hex digest (ignores a stored payload_hash)
+        """
+        payload = {key: value for key, value in comment.items() if key != "payload_hash"}
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+    
+    def get_existing_hashes(self, collection_name: str, point_ids: List[str]) -> Dict[str, Optional[str]]:
+        """
+        Look up which points already exist, without fetching their vectors.
+        
+        Args:
+            collection_name (str): Name of the Qdrant collection
+            point_ids (list): Candidate point IDs
+            
+        Returns:
+            dict: point ID -> stored payload_hash (None for points uploaded without one)
+        """
+        existing = {}
+        try:
+            collections = self.qdrant_client.get_collections().collections
+            if collection_name not in [collection.name for collection in collections]:
+                return existing
+            for start in range(0, len(point_ids), self.batch_size):
+                points = self.qdrant_client.retrieve(
+                    collection_name=collection_name,
+                    ids=point_ids[start:start + self.batch_size],
+                    with_payload=["payload_hash"],
+                    with_vectors=False
+                )
+                for point in points:
+                    existing[str(point.id)] = (point.payload or {}).get("payload_hash")
+        except Exception as e:
+            logger.error(f"Error retrieving existing points, embedding all comments: {e}")
+            return {}
+        return existing
+    
+    def get_shared_embedding(self, representative_url: str, collection_name: str,
+                             vectors_by_url: Dict[str, List[float]]) -> List[float]:
+        """
+        Get the vector of a near-duplicate's representative comment.
+        
+        Looks in the vectors embedded during this run first, then in the Qdrant collection.
+        
+        Args:
+            representative_url (str): comment_url of the representative comment
+            collection_name (str): Name of the Qdrant collection
+            vectors_by_url (dict): Vectors embedded so far, keyed by comment_url
+            
+        Returns:
+            list: Embedding vector or None if the representative has not been embedded
+        """
+        if representative_url in vectors_by_url:
+            return vectors_by_url[representative_url]
         try:
-            response = self.openai_client.embeddings.create(
-                model=self.embedding_model,
-                input=text
+            points = self.qdrant_client.retrieve(
+                collection_name=collection_name,
+                ids=[self.comment_point_id({"comment_url": representative_url})],
+                with_vectors=True
             )
-            return response.data[0].embedding
+            if points and points[0].vector is not None:
+                return points[0].vector
         except Exception as e:
-            logger.error(f"Error creating embedding: {e}")
-            return None  # Return None instead of raising exception
+            logger.error(f"Error retrieving representative vector: {e}")
+        return None
     
     def create_collection(self, collection_name: str, vector_size: int = 1536):
         """
@@ -117,27 +592,46 @@ class CommentEmbedder:
                 logger.info(f"Collection '{collection_name}' already exists")
                 return
             
-            # Create the collection
-            self.qdrant_client.create_collection(
-                collection_name=collection_name,
-                vectors_config=models.VectorParams(
-                    size=vector_size,
-                    distance=models.Distance.COSINE
-                )
-            )
-            logger.info(f"Created collection '{collection_name}' with vector size {vector_size}")
+            # Create the collection, recording how its vectors are made
+            config = collection_config(self.collection_profile, vector_size)
+            metadata = {
+                "embedding_backend": self.backend.name,
+                "embedding_model": self.embedding_model,
+                "embedding_dimensions": vector_size,
+                "embedding_template": self.embedding_template,
+                "collection_profile": self.collection_profile["name"],
+            }
+            try:
+                self.qdrant_client.create_collection(collection_name=collection_name, metadata=metadata, **config)
+            except (TypeError, AssertionError):
+                # Collection metadata needs qdrant-client 1.16+; the vector size is still recorded in the config
+                logger.warning("Qdrant client does not support collection metadata; creating without it")
+                self.qdrant_client.create_collection(collection_name=collection_name, **config)
+            logger.info(f"Created collection '{collection_name}' with vector size {vector_size} "
+                        f"(profile {self.collection_profile['name']})")
+            
+            # Index filter fields before points arrive, so the HNSW graph is built filter-aware
+            create_payload_indexes(self.qdrant_client, collection_name, self.payload_indexes)
         except Exception as e:
             logger.error(f"Error creating collection: {e}")
             raise
     
-    def process_and_upload(self, input_file: str, collection_name: str):
+    def process_and_upload(self, input_file: str, collection_name: str) -> Dict[str, int]:
         """
         Process comments from JSON file, create embeddings, and upload to Qdrant.
         
+        In incremental mode, comments whose point exists with the same payload_hash are skipped.
+        
         Args:
             input_file (str): Path to JSON file with comments
             collection_name (str): Name of the Qdrant collection
+            
+        Returns:
+            dict: Counts of new, updated, unchanged, failed and skipped near-duplicate comments,
+                plus uploaded vectors and upload time
         """
+        stats = {"new": 0, "updated": 0, "unchanged": 0, "failed": 0, "skipped_duplicates": 0,
+                 "uploaded_vectors": 0, "upload_seconds": 0.0}
         # Extract expert name from the path based on our new directory structure
         input_path = Path(input_file)
         expert_name = None
@@ -170,81 +664,149 @@ class CommentEmbedder:
             logger.info(f"Loaded {len(comments)} comments from {input_file}")
         except Exception as e:
             logger.error(f"Error loading comments: {e}")
-            return
+            return stats
         
         # Add expert_name to each comment if not already present
         for comment in comments:
             if expert_name and 'expert_name' not in comment:
                 comment['expert_name'] = expert_name
         
-        # Create collection if it doesn't exist
-        # First, create a sample embedding to get the vector size
-        sample_text = self.prepare_text_for_embedding(comments[0], expert_name)
-        sample_embedding = self.create_embedding(sample_text)
-        vector_size = len(sample_embedding)
-        
-        self.create_collection(collection_name, vector_size)
+        if not comments:
+            logger.info(f"No comments to embed in {input_file}")
+            return stats
         
-        # Process comments in batches
         total_comments = len(comments)
-        batch_points = []
-        skipped_comments = 0
+        point_ids = [self.comment_point_id(comment, i) for i, comment in enumerate(comments)]
+        for comment in comments:
+            comment['embedding_template'] = self.embedding_template
+            comment['payload_hash'] = self.payload_hash(comment)
+        existing = self.get_existing_hashes(collection_name, point_ids) if self.incremental else {}
         
+        # Decide per comment whether to skip it, share its representative's vector or embed it
+        to_embed = []  # comment indices
+        to_share = []  # comment indices
         for i, comment in enumerate(comments):
-            # Generate a deterministic UUID based on comment content
-            # This ensures the same comment always gets the same ID
-            
-            # Create a unique string based on available fields
-            unique_string = ""
-            if 'comment_url' in comment and comment['comment_url']:
-                unique_string = comment['comment_url']
+            representative_url = comment.get('near_duplicate_of')
+            if existing.get(point_ids[i]) == comment['payload_hash']:
+                stats["unchanged"] += 1
+            elif representative_url and self.near_duplicate_mode == "skip":
+                stats["skipped_duplicates"] += 1
+            elif representative_url and self.near_duplicate_mode == "share":
+                to_share.append(i)
             else:
-                # Create a unique string from multiple fields if URL isn't available
-                unique_string = f"{comment.get('repo', '')}-{comment.get('pr_number', '')}-{comment.get('created_at', '')}-{i}"
-            
-            # Create a deterministic UUID from the unique string
-            hash_bytes = hashlib.md5(unique_string.encode('utf-8')).digest()
-            comment_id = str(uuid.UUID(bytes=hash_bytes[:16]))
-            
-            logger.debug(f"Generated UUID for comment {i}: {comment_id} from {unique_string}")
+                to_embed.append(i)
+        
+        dimensions = self.collection_dimensions(collection_name)
+        embeddings = {}  # comment index -> vector
+        chunks = {}  # comment index -> [(chunk text, vector)] for comments over the input limit
+        vectors_by_url = {}
+        
+        def embed(indices):
+            # Texts over the model's input limit are embedded as overlapping chunks
+            pieces = []  # (comment index, text)
+            for i in indices:
+                for text in self.split_oversize(self.prepare_text_for_embedding(comments[i], expert_name)):
+                    pieces.append((i, text))
+            vectors = {}
+            for (i, text), embedding in zip(pieces, self.create_embeddings([text for _, text in pieces], dimensions)):
+                vectors.setdefault(i, []).append((text, embedding))
             
-            # Prepare text and create embedding
-            text = self.prepare_text_for_embedding(comment, expert_name)
+            for i, parts in vectors.items():
+                if any(embedding is None for _, embedding in parts):
+                    continue
+                if len(parts) > 1:
+                    chunks[i] = parts
+                    embedding = self.pool([vector for _, vector in parts]) if self.pool_chunks else parts[0][1]
+                else:
+                    embedding = parts[0][1]
+                embeddings[i] = embedding
+                if comments[i].get('comment_url'):
+                    vectors_by_url[comments[i]['comment_url']] = embedding
+        
+        uploader = None
+        
+        def upload(indices):
+            """Hand the points of embedded comments to the uploader."""
+            nonlocal uploader
+            if not embeddings:
+                return
+            if uploader is None:
+                # Create collection if it doesn't exist
+                self.create_collection(collection_name,
+                                       self.vector_size(dimensions) or len(next(iter(embeddings.values()))))
+                uploader = QdrantUploader(self.qdrant_client, collection_name,
+                                          batch_size=self.batch_size, workers=self.upload_workers)
             
-            embedding = self.create_embedding(text)
+            # Re-uploaded comments may have had a different number of chunks
+            stale_parents = [point_ids[i] for i in indices if i in embeddings and point_ids[i] in existing]
+            if stale_parents:
+                self.delete_chunks(collection_name, stale_parents)
             
-            # Skip this comment if embedding failed (too long, etc.)
+            points = []
+            for i in indices:
+                if i not in embeddings:
+                    continue
+                comment = comments[i]
+                stats["updated" if point_ids[i] in existing else "new"] += 1
+                if i in chunks:
+                    comment['chunk_count'] = len(chunks[i])
+                    for n, (text, vector) in enumerate(chunks[i]):
+                        points.append(models.PointStruct(
+                            id=self.chunk_point_id(point_ids[i], n),
+                            vector=vector,
+                            payload=self.chunk_payload(comment, point_ids[i], n, len(chunks[i]), text)
+                        ))
+                points.append(models.PointStruct(
+                    id=point_ids[i],  # UUID-based ID
+                    vector=embeddings[i],
+                    payload=comment
+                ))
+            uploader.add(points)
+        
+        # Embed in windows so uploads of earlier windows overlap with embedding of later ones
+        window = max(self.embedding_batch_size, self.batch_size)
+        for start in range(0, len(to_embed), window):
+            indices = to_embed[start:start + window]
+            embed(indices)
+            upload(indices)
+            logger.info(f"Embedded {min(start + window, len(to_embed))}/{len(to_embed)} comments")
+        
+        # Near-duplicates reuse their representative's vector, or are embedded if it has none yet
+        unshared = []
+        for i in to_share:
+            embedding = self.get_shared_embedding(comments[i]['near_duplicate_of'], collection_name, vectors_by_url)
             if embedding is None:
-                skipped_comments += 1
-                logger.warning(f"Skipping comment {i+1}/{total_comments} (too long or error occurred)")
-                continue
-            
-            # Prepare point for Qdrant
-            point = models.PointStruct(
-                id=comment_id,  # UUID-based ID
-                vector=embedding,
-                payload=comment
-            )
-            
-            batch_points.append(point)
-            
-            # Upload batch if it reaches batch size or is the last item
-            if len(batch_points) >= self.batch_size or i == total_comments - 1:
-                if batch_points:  # Only upload if we have points
-                    self.qdrant_client.upsert(
-                        collection_name=collection_name,
-                        points=batch_points
-                    )
-                    logger.info(f"Uploaded batch of {len(batch_points)} vectors to Qdrant ({i+1}/{total_comments})")
-                batch_points = []
-            
-            # Add delay to avoid rate limiting
-            time.sleep(self.rate_limit_delay)
+                unshared.append(i)
+            else:
+                embeddings[i] = embedding
+        embed(unshared)
+        upload(to_share)
         
-        if skipped_comments > 0:
-            logger.warning(f"Skipped {skipped_comments} comments due to length or errors")
+        for i in to_embed + to_share:
+            if i not in embeddings:
+                # Skip this comment if embedding failed
+                stats["failed"] += 1
+                logger.warning(f"Skipping comment {i+1}/{total_comments} (embedding error)")
         
-        logger.info(f"Completed upload of {total_comments - skipped_comments} comments to Qdrant collection '{collection_name}'")
+        if uploader:
+            upload_stats = uploader.close()
+            stats["uploaded_vectors"] = upload_stats["vectors"]
+            stats["upload_seconds"] = upload_stats["seconds"]
+            logger.info(f"Uploaded {upload_stats['vectors']} vectors in {upload_stats['requests']} requests "
+                        f"({upload_stats['vectors_per_second']} vectors/s)")
+        
+        if chunks:
+            logger.info(f"Split {len(chunks)} long comments into {sum(len(parts) for parts in chunks.values())} chunks")
+        if stats["failed"] > 0:
+            logger.warning(f"Skipped {stats['failed']} comments due to embedding errors")
+        if stats["skipped_duplicates"] > 0:
+            logger.info(f"Skipped {stats['skipped_duplicates']} near-duplicate comments")
+        if stats["unchanged"] > 0:
+            logger.info(f"Skipped {stats['unchanged']} comments already in Qdrant")
+        
+        logger.info(f"Completed upload of {stats['new']} new and {stats['updated']} updated comments "
+                    f"to Qdrant collection '{collection_name}'")
+        return stats
 
 
 def main():
@@ -257,8 +819,15 @@ def main():
                         help="Qdrant collection name")
     parser.add_argument("--openai-key", type=str,
                         help="OpenAI API key (or use OPENAI_API_KEY env variable)")
-    parser.add_argument("--model", type=str, default="text-embedding-3-small",
-                        help="OpenAI embedding model (default: text-embedding-3-small)")
+    parser.add_argument("--backend", type=str, default="openai", choices=list(EMBEDDING_BACKENDS),
+                        help="Embedding backend: OpenAI API or a local CPU model (default: openai)")
+    parser.add_argument("--model", type=str,
+                        help="Embedding model (default: text-embedding-3-small, or "
+                             "sentence-transformers/all-MiniLM-L6-v2 with the local backend)")
+    parser.add_argument("--local-runtime", type=str, default="torch", choices=["torch", "onnx"],
+                        help="Runtime of the local backend's model (default: torch)")
+    parser.add_argument("--threads", type=int,
+                        help="CPU threads of the local backend's model (default: all cores)")
     parser.add_argument("--qdrant-url", type=str, default="http://localhost:6333",
                         help="Qdrant server URL")
     parser.add_argument("--qdrant-key", type=str,
@@ -267,10 +836,58 @@ def main():
                         help="Batch size for Qdrant uploads")
     parser.add_argument("--delay", type=float, default=0.1,
                         help="Delay between API calls in seconds")
+    parser.add_argument("--embedding-batch-size", type=int, default=256,
+                        help="Maximum comments per embeddings request (default: 256)")
+    parser.add_argument("--embedding-token-budget", type=int, default=100000,
+                        help="Maximum input tokens per embeddings request (default: 100000)")
+    parser.add_argument("--embedding-cache", type=str,
+                        help="SQLite file caching embedding vectors by model and text hash (default: no cache)")
+    parser.add_argument("--embedding-cache-max-mb", type=int, default=1024,
+                        help="Maximum size of cached vectors in MB before eviction (default: 1024)")
+    parser.add_argument("--bypass-embedding-cache", action="store_true",
+                        help="Ignore cached vectors (fresh vectors are still written to the cache)")
+    parser.add_argument("--template", type=str, default=DEFAULT_EMBEDDING_TEMPLATE, choices=list(EMBEDDING_TEMPLATES),
+                        help=f"Embedding text template (default: {DEFAULT_EMBEDDING_TEMPLATE})")
+    parser.add_argument("--text-token-budget", type=int, default=512,
+                        help="Maximum tokens of the context fields of a templated embedding text (default: 512)")
+    parser.add_argument("--diff-lines", type=int, default=10,
+                        help="Diff lines before the commented line kept in a templated text (default: 10)")
+    parser.add_argument("--chunk-tokens", type=int, default=2048,
+                        help="Tokens per chunk of a comment over the model's input limit (default: 2048)")
+    parser.add_argument("--chunk-overlap", type=int, default=200,
+                        help="Tokens shared by consecutive chunks (default: 200)")
+    parser.add_argument("--no-pool-chunks", action="store_true",
+                        help="Give chunked comments their first chunk's vector instead of the mean of all chunks")
+    parser.add_argument("--upload-workers", type=int, default=4,
+                        help="Concurrent Qdrant upsert requests (default: 4)")
+    parser.add_argument("--prefer-grpc", action="store_true",
+                        help="Talk to Qdrant over gRPC (port 6334)")
+    parser.add_argument("--profile", type=str, default="default", choices=list(COLLECTION_PROFILES),
+                        help="Storage profile of a new collection (default: default)")
+    parser.add_argument("--hnsw-m", type=int,
+                        help="Override the profile's HNSW edges per node")
+    parser.add_argument("--hnsw-ef-construct", type=int,
+                        help="Override the profile's HNSW build-time neighbours")
+    parser.add_argument("--payload-indexes", type=str, default=",".join(DEFAULT_PAYLOAD_INDEXES),
+                        help="Comma-separated payload fields indexed in a new collection")
+    parser.add_argument("--dimensions", type=int,
+                        help="Vector size of a new collection below the model's full size (text-embedding-3 models)")
+    parser.add_argument("--full", action="store_true",
+                        help="Embed and upload every comment, even points already in the collection")
+    parser.add_argument("--near-duplicates", type=str, default="embed", choices=["embed", "share", "skip"],
+                        help="How to handle near-duplicate comments (default: embed)")
     
     args = parser.parse_args()
     
     try:
+        embedding_cache = None
+        if args.embedding_cache:
+            embedding_cache = EmbeddingCache(
+                args.embedding_cache,
+                max_bytes=args.embedding_cache_max_mb * 1024 * 1024,
+                bypass=args.bypass_embedding_cache
+            )
+        
         # Initialize and run embedder
         embedder = CommentEmbedder(
             openai_api_key=args.openai_key,
@@ -278,13 +895,39 @@ def main():
             qdrant_url=args.qdrant_url,
             qdrant_api_key=args.qdrant_key,
             batch_size=args.batch_size,
-            rate_limit_delay=args.delay
+            rate_limit_delay=args.delay,
+            near_duplicate_mode=args.near_duplicates,
+            embedding_batch_size=args.embedding_batch_size,
+            embedding_token_budget=args.embedding_token_budget,
+            embedding_cache=embedding_cache,
+            incremental=not args.full,
+            embedding_template=args.template,
+            embedding_text_token_budget=args.text_token_budget,
+            embedding_diff_lines=args.diff_lines,
+            chunk_tokens=args.chunk_tokens,
+            chunk_overlap=args.chunk_overlap,
+            pool_chunks=not args.no_pool_chunks,
+            upload_workers=args.upload_workers,
+            prefer_grpc=args.prefer_grpc,
+            collection_profile=args.profile,
+            hnsw_m=args.hnsw_m,
+            hnsw_ef_construct=args.hnsw_ef_construct,
+            payload_indexes=[field.strip() for field in args.payload_indexes.split(",") if field.strip()],
+            embedding_dimensions=args.dimensions,
+            embedding_backend=args.backend,
+            local_runtime=args.local_runtime,
+            embedding_threads=args.threads
         )
         
         embedder.process_and_upload(
             input_file=args.input,
             collection_name=args.collection
         )
+        logger.info(f"Embedding text tokens: {embedder.text_token_stats.summary()}")
+        if embedder.get_truncation_stats():
+            logger.info(f"Fields cut to the embedding text budget: {embedder.get_truncation_stats()}")
+        if embedding_cache:
+            logger.info(f"Embedding cache stats: {embedding_cache.get_stats()}")
         
         return 0
     except Exception as e:
@@ -0,0 +1,112 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+class EnrichmentJournal:
+    """
+    Append-only JSONL journal in front of an enriched comments file.
+
+    New results are appended to <output_file>.journal as they arrive, which is
+    O(1) per record instead of rewriting the whole JSON list. The journal is
+    periodically compacted into the final file via a temp file and atomic rename.
+    Readers merge the final file with any journal entries, later entries winning.
+    """
+
+    def __init__(self, output_file, compact_every=100):
+        """
+        Initialize the journal.
+
+        Args:
+            output_file (str): Path to the final enriched JSON file
+            compact_every (int): Compact after this many appended records (0 compacts only on demand)
+        """
+        self.output_file = output_file
+        self.journal_file = f"{output_file}.journal"
+        self.compact_every = compact_every
+        self.pending = 0
+
+    def load(self):
+        """
+        Load enriched records from the final file plus the journal.
+
+        Returns:
+            list: Records in order, deduplicated by comment_url (journal entries replace older ones)
+        """
+        records = []
+        if os.path.exists(self.output_file):
+            try:
+                with open(self.output_file, "r", encoding="utf-8") as f:
+                    records = json.load(f)
+            except Exception as e:
+                logger.error(f"Cannot load previously enriched data: {e}")
+                records = []
+
+        journal_records = []
+        if os.path.exists(self.journal_file):
+            with open(self.journal_file, "r", encoding="utf-8") as f:
+                for line_number, line in enumerate(f, start=1):
+                    if not line.strip():
+                        continue
+                    try:
+                        journal_records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # A crash can leave a torn last line; everything before it is intact
+                        logger.warning(f"Ignoring corrupt journal line {line_number} in {self.journal_file}")
+
+        if not journal_records:
+            return records
+
+        position = {record.get("comment_url"): i for i, record in enumerate(records) if record.get("comment_url")}
+        for record in journal_records:
+            url = record.get("comment_url")
+            if url and url in position:
+                records[position[url]] = record
+            else:
+                if url:
+                    position[url] = len(records)
+                records.append(record)
+        self.pending = len(journal_records)
+        return records
+
+    def append(self, new_records):
+        """
+        Append records to the journal.
+
+        Args:
+            new_records (list): Enriched records to append
+        """
+        if not new_records:
+            return
+        with open(self.journal_file, "a", encoding="utf-8") as f:
+            for record in new_records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.pending += len(new_records)
+
+    def should_compact(self):
+        """Whether enough records were appended since the last compaction."""
+        return self.compact_every > 0 and self.pending >= self.compact_every
+
+    def compact(self, records):
+        """
+        Write the full record list to the final file atomically and drop the journal.
+
+        Args:
+            records (list): Complete list of enriched records
+        """
+        tmp_file = f"{self.output_file}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(records, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_file, self.output_file)
+        # The final file now holds everything; a crash before this point only leaves duplicates that load() merges
+        self.reset()
+
+    def reset(self):
+        """Remove the journal without touching the final file."""
+        if os.path.exists(self.journal_file):
+            os.remove(self.journal_file)
+        self.pending = 0
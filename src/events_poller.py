@@ -0,0 +1,426 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import json
+import time
+import logging
+import argparse
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import requests
+
+from comment_crawler import GitHubCommentCrawler
+from hunk_store import HunkStore, compact_comments
+
+logger = logging.getLogger(__name__)
+
+class ExpertEventsPoller:
+    """
+    Lightweight freshness poller built on the GitHub user events feed.
+
+    Polls /users/{login}/events with If-None-Match so unchanged feeds cost a free
+    304, appends new PullRequestReviewCommentEvent comments straight into the
+    expert's comments.json and only falls back to a full crawl when the events
+    window (at most 300 events from the last 90 days) no longer reaches back to
+    the last poll.
+    """
+
+    EVENTS_URL = "https://api.github.com/users/{username}/events"
+    REVIEW_COMMENT_EVENT = "PullRequestReviewCommentEvent"
+    PER_PAGE = 100
+    MAX_PAGES = 3  # GitHub only serves the latest 300 events
+    WINDOW_DAYS = 90  # ... created within the past 90 days
+
+    def __init__(self, github_tokens, crawl_headroom=50, hunk_store=None, hunk_window_lines=10):
+        """
+        Initialize the poller with one or multiple GitHub tokens.
+
+        Args:
+            github_tokens (str or list): A single GitHub token or a list of tokens
+            crawl_headroom (int): Extra comments allowed on top of the stored ones when a full crawl is triggered
+            hunk_store (HunkStore, optional): Store for full diff hunks; new comments are compacted like crawled ones
+            hunk_window_lines (int): Diff lines kept inline when compacting
+        """
+        if isinstance(github_tokens, str):
+            self.github_tokens = [github_tokens]
+        else:
+            self.github_tokens = github_tokens
+
+        self.headers = {
+            "Authorization": f"token {self.github_tokens[0]}",
+            "Accept": "application/vnd.github.v3+json",
+        }
+        self.crawl_headroom = crawl_headroom
+        self.hunk_store = hunk_store
+        self.hunk_window_lines = hunk_window_lines
+        self.crawler = GitHubCommentCrawler(self.github_tokens)
+        self.poll_interval = 60
+
+    def _load_state(self, state_file):
+        """Load the poll state (ETag and last seen event ID) for an expert."""
+        if os.path.exists(state_file):
+            try:
+                with open(state_file, "r") as f:
+                    return json.load(f)
+            except Exception as e:
+                logger.error(f"Error loading events state {state_file}: {e}")
+        return {"etag": None, "last_event_id": None}
+
+    def _save_state(self, state_file, state):
+        """Persist the poll state for an expert."""
+        state["last_polled"] = datetime.now(timezone.utc).isoformat()
+        with open(state_file, "w") as f:
+            json.dump(state, f)
+
+    def fetch_events_page(self, username, page=1, etag=None):
+        """
+        Fetch one page of the user's public events.
+
+        Args:
+            username (str): GitHub username
+            page (int): Page number (1-based)
+            etag (str, optional): ETag from the previous poll, sent as If-None-Match
+
+        Returns:
+            tuple: (status_code, events, etag) where events is None on 304 or error
+        """
+        url = self.EVENTS_URL.format(username=username)
+        headers = dict(self.headers)
+        if etag:
+            headers["If-None-Match"] = etag
+
+        try:
+            response = requests.get(url, headers=headers,
+                                    params={"per_page": self.PER_PAGE, "page": page})
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Request error polling events for {username}: {e}")
+            return None, None, etag
+
+        # Honour the server's requested polling interval
+        poll_interval = response.headers.get("X-Poll-Interval")
+        if poll_interval and poll_interval.isdigit():
+            self.poll_interval = max(self.poll_interval, int(poll_interval))
+
+        if response.status_code == 304:
+            return 304, None, etag
+
+        if response.status_code == 403:
+            reset_time = int(response.headers.get("X-RateLimit-Reset", 0))
+            wait_time = max(0, reset_time - int(time.time()))
+            logger.warning(f"Rate limit exceeded. Waiting for {wait_time} seconds.")
+            time.sleep(wait_time + 1)
+            return self.fetch_events_page(username, page, etag)
+
+        if response.status_code != 200:
+            logger.error(f"Failed to fetch events for {username}: {response.status_code} - {response.text}")
+            return response.status_code, None, etag
+
+        return 200, response.json(), response.headers.get("ETag")
+
+    def event_to_comment(self, event, username):
+        """
+        Convert a PullRequestReviewCommentEvent into the stored comment format.
+
+        Args:
+            event (dict): Event object from the events feed
+            username (str): GitHub username the comment must belong to
+
+        Returns:
+            dict: Comment in the crawler output format, or None if not applicable
+        """
+        if event.get("type") != self.REVIEW_COMMENT_EVENT:
+            return None
+
+        payload = event.get("payload", {})
+        if payload.get("action", "created") != "created":
+            return None
+
+        comment = payload.get("comment") or {}
+        author = (comment.get("user") or {}).get("login") or (event.get("actor") or {}).get("login")
+        if not author or author.lower() != username.lower():
+            return None
+
+        comment_text = comment.get("body", "")
+        if not self.crawler.is_valid_comment(comment_text):
+            return None
+
+        pull_request = payload.get("pull_request") or {}
+        return {
+            "repo": (event.get("repo") or {}).get("name"),
+            "pr_number": pull_request.get("number"),
+            "pr_title": pull_request.get("title"),
+            "file_path": comment.get("path"),
+            "comment": comment_text,
+            "diff_context": comment.get("diff_hunk"),
+            "comment_url": comment.get("html_url"),
+        }
+
+    def poll_expert(self, username, output_file):
+        """
+        Poll the events feed once for an expert and append new review comments.
+
+        Args:
+            username (str): GitHub username
+            output_file (str): Path to the expert's comments.json
+
+        Returns:
+            dict: Poll summary with status, number of new comments and whether a full crawl ran
+        """
+        state_file = f"{output_file}.events"
+        state = self._load_state(state_file)
+        last_event_id = state.get("last_event_id")
+
+        status, events, etag = self.fetch_events_page(username, 1, state.get("etag"))
+        if status == 304:
+            logger.debug(f"No new events for {username}")
+            return {"status": "not_modified", "new_comments": 0, "full_crawl": False}
+        if events is None:
+            return {"status": "error", "new_comments": 0, "full_crawl": False}
+
+        # Walk the feed newest-first until we reach the last event we have already seen
+        newest_event_id = events[0]["id"] if events else None
+        new_events = []
+        reached_last_seen = last_event_id is None
+        window_truncated = False  # stopped at the 300-event cap or by an error, not at the feed's end
+        page = 1
+        while True:
+            for event in events:
+                if last_event_id is not None and int(event["id"]) <= int(last_event_id):
+                    reached_last_seen = True
+                    break
+                new_events.append(event)
+            if reached_last_seen or len(events) < self.PER_PAGE:
+                break
+            if page >= self.MAX_PAGES:
+                window_truncated = True
+                break
+            page += 1
+            _, events, _ = self.fetch_events_page(username, page)
+            if events is None:
+                window_truncated = True
+                break
+            if not events:
+                break
+
+        # Load the existing comment store
+        existing_comments = []
+        if os.path.exists(output_file):
+            try:
+                with open(output_file, "r", encoding="utf-8") as f:
+                    existing_comments = json.load(f)
+            except Exception as e:
+                logger.error(f"Error loading existing comments for {username}: {e}")
+                return {"status": "error", "new_comments": 0, "full_crawl": False}
+        existing_urls = {c.get("comment_url") for c in existing_comments if c.get("comment_url")}
+
+        # Events are newest-first; append oldest-first to keep the store chronological
+        new_comments = []
+        for event in reversed(new_events):
+            comment = self.event_to_comment(event, username)
+            if comment and comment["comment_url"] not in existing_urls:
+                new_comments.append(comment)
+                existing_urls.add(comment["comment_url"])
+
+        # If the window does not reach back to the last poll we may have missed comments
+        full_crawl = not reached_last_seen and self._window_has_gap(new_events, window_truncated,
+                                                                    state.get("last_polled"))
+        if full_crawl:
+            logger.warning(f"Events window overflowed for {username}, triggering full crawl")
+            new_comments.extend(self._overflow_crawl(username, output_file, existing_urls,
+                                                     len(existing_comments) + self.crawl_headroom))
+
+        if new_comments:
+            if self.hunk_store is not None:
+                new_comments = compact_comments(new_comments, self.hunk_store, self.hunk_window_lines)
+            existing_comments.extend(new_comments)
+            with open(output_file, "w", encoding="utf-8") as f:
+                json.dump(existing_comments, f, ensure_ascii=False, indent=2)
+            logger.info(f"Appended {len(new_comments)} new comments for {username}")
+
+        # Always move past the newest event seen, so a gap is only crawled once
+        if newest_event_id is not None and (last_event_id is None or int(newest_event_id) > int(last_event_id)):
+            state["last_event_id"] = newest_event_id
+        state["etag"] = etag
+        self._save_state(state_file, state)
+
+        return {"status": "updated", "new_comments": len(new_comments), "full_crawl": full_crawl}
+
+    def _window_has_gap(self, new_events, window_truncated, last_polled):
+        """
+        Decide whether events since the last poll may be missing from the feed.
+
+        The feed ends at the 300-event cap or at events older than 90 days. A feed
+        read to its end covers the last 90 days; a truncated one only goes back to
+        its oldest event. There is a gap only if that is after the last poll.
+
+        Args:
+            new_events (list): Events read, newest first
+            window_truncated (bool): Whether reading stopped before the end of the feed
+            last_polled (str, optional): ISO time of the last poll, in UTC with its offset
+
+        Returns:
+            bool: True if comments may have been missed
+        """
+        if not last_polled:
+            return True
+        last_polled = datetime.fromisoformat(last_polled)
+        covered_since = datetime.now(timezone.utc) - timedelta(days=self.WINDOW_DAYS)
+        if window_truncated:
+            if not new_events:
+                return True
+            covered_since = datetime.fromisoformat(new_events[-1]["created_at"].replace("Z", "+00:00"))
+        return last_polled < covered_since
+
+    def _overflow_crawl(self, username, output_file, existing_urls, limit):
+        """
+        Crawl the expert from a fresh cursor and return comments missing from the store.
+
+        The stored GraphQL cursor has already passed older pull requests, whose new
+        comments are what the events window lost, so the crawl starts over into a
+        scratch file.
+
+        Args:
+            username (str): GitHub username
+            output_file (str): Path to the expert's comments.json
+            existing_urls (set): URLs already stored (updated with the returned comments)
+            limit (int): Maximum number of comments to crawl
+
+        Returns:
+            list: Comments not yet in the store
+        """
+        scratch_file = f"{output_file}.overflow"
+        try:
+            crawled = self.crawler.collect_comments(
+                username=username,
+                limit=limit,
+                output_file=scratch_file,
+                continue_crawl=False
+            ) or []
+        finally:
+            for path in (scratch_file, f"{scratch_file}.state"):
+                if os.path.exists(path):
+                    os.remove(path)
+
+        missing = []
+        for comment in crawled:
+            if comment.get("comment_url") and comment["comment_url"] not in existing_urls:
+                missing.append(comment)
+                existing_urls.add(comment["comment_url"])
+        logger.info(f"Full crawl found {len(missing)} comments missing from the events feed for {username}")
+        return missing
+
+    def poll_all(self, experts):
+        """
+        Poll every expert once.
+
+        Args:
+            experts (list): List of (username, output_file) tuples
+
+        Returns:
+            dict: Aggregated poll summary
+        """
+        summary = {"experts_polled": 0, "not_modified": 0, "new_comments": 0, "full_crawls": 0, "errors": 0}
+        for username, output_file in experts:
+            result = self.poll_expert(username, output_file)
+            summary["experts_polled"] += 1
+            summary["new_comments"] += result["new_comments"]
+            if result["status"] == "not_modified":
+                summary["not_modified"] += 1
+            elif result["status"] == "error":
+                summary["errors"] += 1
+            if result["full_crawl"]:
+                summary["full_crawls"] += 1
+        return summary
+
+    def run_forever(self, experts, interval=60):
+        """
+        Poll all experts in a loop, sleeping between rounds.
+
+        Args:
+            experts (list): List of (username, output_file) tuples
+            interval (int): Minimum seconds between polling rounds
+        """
+        self.poll_interval = interval
+        while True:
+            summary = self.poll_all(experts)
+            logger.info(f"Poll round complete: {summary}")
+            time.sleep(self.poll_interval)
+
+
+def find_experts_to_poll(data_dir, language, expert=None):
+    """
+    Find expert comment stores under the pipeline data layout.
+
+    Args:
+        data_dir (str): Base data directory
+        language (str): Programming language directory to scan
+        expert (str, optional): Restrict to a single expert
+
+    Returns:
+        list: List of (username, output_file) tuples
+    """
+    experts_dir = Path(data_dir) / language.lower() / "experts"
+    if not experts_dir.is_dir():
+        return []
+
+    experts = []
+    for expert_dir in sorted(experts_dir.iterdir()):
+        if not expert_dir.is_dir() or (expert and expert_dir.name != expert):
+            continue
+        comments_file = expert_dir / "comments.json"
+        if comments_file.exists():
+            experts.append((expert_dir.name, str(comments_file)))
+    return experts
+
+
+def main():
+    """Main function to run the events poller from command line."""
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Keep expert comment stores fresh via the GitHub events feed")
+    parser.add_argument("--tokens", type=str, nargs="+", help="GitHub API tokens (provide one or multiple)",
+                        default=[os.environ.get("GITHUB_TOKEN")])
+    parser.add_argument("--data-dir", type=str, default="data",
+                        help="Base directory for data (default: 'data')")
+    parser.add_argument("--language", type=str, required=True,
+                        help="Language directory to poll (e.g. 'python')")
+    parser.add_argument("--expert", type=str,
+                        help="Poll only this expert")
+    parser.add_argument("--daemon", action="store_true",
+                        help="Keep polling in a loop instead of a single round")
+    parser.add_argument("--interval", type=int, default=60,
+                        help="Seconds between polling rounds in daemon mode (default: 60)")
+    parser.add_argument("--hunk-compaction", action="store_true",
+                        default=os.environ.get("HUNK_COMPACTION", "false").lower() == "true",
+                        help="Trim diff hunks of new comments and keep full hunks in <data-dir>/hunks "
+                             "(default: HUNK_COMPACTION)")
+    parser.add_argument("--hunk-window-lines", type=int, default=int(os.environ.get("HUNK_WINDOW_LINES", "10")),
+                        help="Diff lines kept inline when compacting (default: HUNK_WINDOW_LINES or 10)")
+
+    args = parser.parse_args()
+
+    tokens = [token for token in args.tokens if token]
+    if not tokens:
+        logger.error("Missing GitHub token. Please provide via --tokens or GITHUB_TOKEN environment variable")
+        return 1
+
+    experts = find_experts_to_poll(args.data_dir, args.language, args.expert)
+    if not experts:
+        logger.error(f"No expert comment files found for {args.language} in {args.data_dir}")
+        return 1
+
+    hunk_store = HunkStore(os.path.join(args.data_dir, "hunks")) if args.hunk_compaction else None
+    poller = ExpertEventsPoller(tokens, hunk_store=hunk_store, hunk_window_lines=args.hunk_window_lines)
+    if args.daemon:
+        poller.run_forever(experts, args.interval)
+    else:
+        summary = poller.poll_all(experts)
+        print(f"Poll summary: {summary}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Find experts for free-text queries in a comment collection.
+
+Queries are embedded in one batched call and searched with one Qdrant batch
+request. Matching comments are ranked into experts by similarity and by how
+many of their comments match.
+
+    python src/expert_search.py --collection github_python_experts "async error handling" "ORM query performance"
+    python src/expert_search.py --collection github_python_experts --serve --port 8080
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import json
+import math
+import time
+import logging
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from qdrant_client.http import models
+from embedding_importer import CommentEmbedder
+from embedding_backends import EMBEDDING_BACKENDS
+from collection_profiles import COLLECTION_PROFILES, get_profile, search_params
+from collection_benchmark import percentile
+from payload_indexes import build_filter
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Payload fields read from each hit (the comment text itself is not transferred)
+HIT_PAYLOAD_FIELDS = ["expert_name", "comment_url", "review_type", "language", "framework", "repo", "parent_id"]
+# Weight of an expert's number of matching comments against their mean similarity
+DEFAULT_COMMENT_WEIGHT = 0.25
+
+
+def rank_experts(points, comment_weight=DEFAULT_COMMENT_WEIGHT, limit=10, top_comments=3):
+    """
+    Aggregate the hits of one query into ranked experts.
+
+    Chunk points count as their parent comment, with the best score of the
+    comment's points. An expert scores the mean similarity of their matching
+    comments times (1 + comment_weight * ln(matching comments)).
+
+    Args:
+        points (list): Scored points of one query
+        comment_weight (float): Weight of the number of matching comments
+        limit (int): Experts to return
+        top_comments (int): Best matching comments listed per expert
+
+    Returns:
+        list: Experts with score, matching comments, best similarity and top comments, best first
+    """
+    comments = {}  # comment point ID -> (score, payload)
+    for point in points:
+        payload = point.payload or {}
+        if not payload.get("expert_name"):
+            continue
+        comment_id = payload.get("parent_id") or str(point.id)
+        if comment_id not in comments or point.score > comments[comment_id][0]:
+            comments[comment_id] = (point.score, payload)
+
+    by_expert = {}
+    for score, payload in comments.values():
+        by_expert.setdefault(payload["expert_name"], []).append((score, payload))
+
+    experts = []
+    for expert_name, matches in by_expert.items():
+        matches.sort(key=lambda match: match[0], reverse=True)
+        mean_similarity = sum(score for score, _ in matches) / len(matches)
+        experts.append({
+            "expert_name": expert_name,
+            "score": round(mean_similarity * (1 + comment_weight * math.log(len(matches))), 4),
+            "comments": len(matches),
+            "best_similarity": round(matches[0][0], 4),
+            "top_comments": [
+                {"comment_url": payload.get("comment_url"), "review_type": payload.get("review_type"),
+                 "similarity": round(score, 4)}
+                for score, payload in matches[:top_comments]
+            ],
+        })
+    experts.sort(key=lambda expert: expert["score"], reverse=True)
+    return experts[:limit]
+
+
+class ExpertSearcher:
+    """
+    Batched expert search over one comment collection.
+
+    Query vectors are made by the same backend, model and size as the
+    collection's, and searched with the search parameters of the collection's
+    profile. Latencies of every search call are kept for p50/p95 stats.
+    """
+
+    def __init__(self, embedder, collection_name, profile="default", hnsw_ef=None, hits_per_query=50,
+                 comment_weight=DEFAULT_COMMENT_WEIGHT):
+        """
+        Initialize the searcher.
+
+        Args:
+            embedder (CommentEmbedder): Embedder of the collection's backend and model (also gives the Qdrant client)
+            collection_name (str): Name of the comment collection
+            profile (str): Collection profile, if the collection's metadata does not record one
+            hnsw_ef (int, optional): Candidates explored per search (default: Qdrant's)
+            hits_per_query (int): Comment points retrieved per query before aggregation
+            comment_weight (float): Weight of an expert's number of matching comments
+        """
+        self.embedder = embedder
+        self.client = embedder.qdrant_client
+        self.collection_name = collection_name
+        self.hits_per_query = hits_per_query
+        self.comment_weight = comment_weight
+
+        if not self.client.collection_exists(collection_name):
+            raise ValueError(f"Collection '{collection_name}' does not exist")
+        metadata = getattr(self.client.get_collection(collection_name).config, "metadata", None) or {}
+        self.profile = get_profile(metadata.get("collection_profile", profile))
+        self.search_params = search_params(self.profile, hnsw_ef=hnsw_ef)
+        # Raises if the collection holds vectors of another backend or model
+        self.dimensions = embedder.collection_dimensions(collection_name)
+
+        self.latencies = {"embed_ms": [], "search_ms": [], "total_ms": []}
+        self.query_count = 0
+        self._lock = threading.Lock()
+
+    def search(self, queries, limit=10, filters=None):
+        """
+        Find experts for many queries at once.
+
+        Args:
+            queries (list): Query texts
+            limit (int): Experts returned per query
+            filters (dict, optional): Payload field -> value every hit must match (e.g. {"language": "python"})
+
+        Returns:
+            dict: "results" (query and ranked experts per query) and "latency_ms" of this call
+        """
+        start = time.perf_counter()
+        vectors = self.embedder.create_embeddings(list(queries), self.dimensions)
+        embedded = time.perf_counter()
+
+        query_filter = build_filter(filters, list(filters)) if filters else None
+        requests = [
+            models.QueryRequest(query=vector, filter=query_filter, limit=self.hits_per_query,
+                                params=self.search_params, with_payload=HIT_PAYLOAD_FIELDS)
+            for vector in vectors if vector is not None
+        ]
+        responses = iter(self.client.query_batch_points(collection_name=self.collection_name, requests=requests)
+                         if requests else [])
+        searched = time.perf_counter()
+
+        results = []
+        for query, vector in zip(queries, vectors):
+            if vector is None:
+                results.append({"query": query, "experts": [], "error": "embedding failed"})
+                continue
+            points = next(responses).points
+            results.append({"query": query, "experts": rank_experts(points, self.comment_weight, limit)})
+        finished = time.perf_counter()
+
+        latency = {
+            "embed_ms": round((embedded - start) * 1000, 2),
+            "search_ms": round((searched - embedded) * 1000, 2),
+            "total_ms": round((finished - start) * 1000, 2),
+        }
+        with self._lock:
+            for key, value in latency.items():
+                self.latencies[key].append(value)
+            self.query_count += len(queries)
+        return {"results": results, "latency_ms": latency}
+
+    def get_latency_stats(self):
+        """
+        Get p50/p95 latencies of the search calls so far.
+
+        Returns:
+            dict: Calls, queries and p50/p95 of embedding, search and total time in ms
+        """
+        with self._lock:
+            stats = {"calls": len(self.latencies["total_ms"]), "queries": self.query_count}
+            for key, values in self.latencies.items():
+                stats[f"{key}_p50"] = percentile(values, 50)
+                stats[f"{key}_p95"] = percentile(values, 95)
+        return stats
+
+
+def parse_search_request(request, max_queries=256):
+    """
+    Validate the body of a POST /search request.
+
+    Args:
+        request: Decoded JSON body
+        max_queries (int): Maximum queries per request
+
+    Returns:
+        tuple: (queries, limit, filters)
+
+    Raises:
+        ValueError: If the body is not a valid search request
+    """
+    if not isinstance(request, dict):
+        raise ValueError("expected a JSON object")
+    queries = request.get("queries") or ([request["query"]] if request.get("query") else [])
+    if not isinstance(queries, list) or not queries or not all(isinstance(query, str) for query in queries):
+        raise ValueError("expected a list of query strings in 'queries'")
+    if len(queries) > max_queries:
+        raise ValueError(f"at most {max_queries} queries per request")
+
+    limit = request.get("limit", 10)
+    if not isinstance(limit, int) or isinstance(limit, bool) or limit < 1:
+        raise ValueError("'limit' must be an integer of at least 1")
+
+    filters = request.get("filters")
+    if filters is not None and (not isinstance(filters, dict) or not all(
+            isinstance(key, str) and isinstance(value, str) for key, value in filters.items())):
+        raise ValueError("'filters' must be an object mapping payload fields to string values")
+    return queries, limit, filters
+
+
+def parse_filter_argument(value):
+    """
+    Parse a --filter command line value of the form field=value.
+
+    Returns:
+        tuple: (field, value)
+
+    Raises:
+        argparse.ArgumentTypeError: If the value is not field=value with a non-empty field
+    """
+    field, separator, field_value = value.partition("=")
+    if not separator or not field.strip():
+        raise argparse.ArgumentTypeError(f"expected field=value, got '{value}'")
+    return field.strip(), field_value
+
+
+def make_handler(searcher, max_queries=256):
+    """
+    Build the HTTP request handler of a searcher.
+
+    POST /search takes {"queries": [...], "limit": 10, "filters": {...}} and
+    returns the search result; GET /stats returns the latency stats.
+    """
+
+    class SearchHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._send_json(200, searcher.get_latency_stats())
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/search":
+                self._send_json(404, {"error": "not found"})
+                return
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                queries, limit, filters = parse_search_request(request, max_queries)
+            except ValueError as e:
+                self._send_json(400, {"error": str(e)})
+                return
+            try:
+                self._send_json(200, searcher.search(queries, limit, filters))
+            except Exception as e:
+                logger.error(f"Error searching: {e}")
+                self._send_json(500, {"error": str(e)})
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    return SearchHandler
+
+
+def main():
+    """Main function to run expert search from command line or as an HTTP service."""
+    parser = argparse.ArgumentParser(description="Find experts for queries in a comment collection")
+
+    parser.add_argument("queries", type=str, nargs="*",
+                        help="Query texts")
+    parser.add_argument("--queries-file", type=str,
+                        help="File with one query per line")
+    parser.add_argument("--collection", type=str, default=os.getenv("COLLECTION_NAME", "github_experts"),
+                        help="Comment collection to search (default: COLLECTION_NAME or github_experts)")
+    parser.add_argument("--limit", type=int, default=10,
+                        help="Experts returned per query (default: 10)")
+    parser.add_argument("--hits", type=int, default=50,
+                        help="Comment points retrieved per query before aggregation (default: 50)")
+    parser.add_argument("--comment-weight", type=float, default=DEFAULT_COMMENT_WEIGHT,
+                        help=f"Weight of an expert's number of matching comments (default: {DEFAULT_COMMENT_WEIGHT})")
+    parser.add_argument("--filter", type=parse_filter_argument, action="append", default=[],
+                        help="Payload filter as field=value (repeatable), e.g. --filter review_type=performance")
+    parser.add_argument("--batch-size", type=int, default=64,
+                        help="Queries per search call (default: 64)")
+    parser.add_argument("--hnsw-ef", type=int,
+                        help="Candidates explored per search (default: Qdrant's)")
+    parser.add_argument("--profile", type=str, default=os.getenv("QDRANT_COLLECTION_PROFILE", "default"),
+                        choices=list(COLLECTION_PROFILES),
+                        help="Collection profile, if the collection does not record one (default: default)")
+    parser.add_argument("--backend", type=str, default=os.getenv("EMBEDDING_BACKEND", "openai"),
+                        choices=list(EMBEDDING_BACKENDS),
+                        help="Embedding backend of the collection (default: openai)")
+    parser.add_argument("--model", type=str, default=os.getenv("EMBEDDING_MODEL") or None,
+                        help="Embedding model of the collection (default: the backend's default model)")
+    parser.add_argument("--openai-key", type=str, default=os.getenv("OPENAI_API_KEY"),
+                        help="OpenAI API key (or use OPENAI_API_KEY env variable)")
+    parser.add_argument("--qdrant-url", type=str, default=os.getenv("QDRANT_URL", "http://localhost:6333"),
+                        help="Qdrant server URL")
+    parser.add_argument("--qdrant-key", type=str, default=os.getenv("QDRANT_API_KEY"),
+                        help="Qdrant API key for authentication")
+    parser.add_argument("--prefer-grpc", action="store_true",
+                        help="Talk to Qdrant over gRPC (port 6334)")
+    parser.add_argument("--serve", action="store_true",
+                        help="Serve POST /search and GET /stats over HTTP instead of searching once")
+    parser.add_argument("--host", type=str, default="127.0.0.1",
+                        help="HTTP host (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8080,
+                        help="HTTP port (default: 8080)")
+
+    args = parser.parse_args()
+
+    try:
+        embedder = CommentEmbedder(
+            openai_api_key=args.openai_key,
+            embedding_model=args.model,
+            embedding_backend=args.backend,
+            qdrant_url=args.qdrant_url,
+            qdrant_api_key=args.qdrant_key,
+            prefer_grpc=args.prefer_grpc,
+            rate_limit_delay=0
+        )
+        searcher = ExpertSearcher(embedder, args.collection, profile=args.profile, hnsw_ef=args.hnsw_ef,
+                                  hits_per_query=args.hits, comment_weight=args.comment_weight)
+
+        if args.serve:
+            server = ThreadingHTTPServer((args.host, args.port), make_handler(searcher))
+            logger.info(f"Serving expert search over '{args.collection}' on http://{args.host}:{args.port}")
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                server.server_close()
+            return 0
+
+        queries = list(args.queries)
+        if args.queries_file:
+            with open(args.queries_file, 'r', encoding='utf-8') as f:
+                queries.extend(line.strip() for line in f if line.strip())
+        if not queries:
+            logger.error("No queries given")
+            return 1
+        filters = dict(args.filter)
+
+        for start in range(0, len(queries), args.batch_size):
+            response = searcher.search(queries[start:start + args.batch_size], args.limit, filters)
+            for result in response["results"]:
+                print(f"\n{result['query']}")
+                if result.get("error"):
+                    print(f"  ({result['error']})")
+                for rank, expert in enumerate(result["experts"], 1):
+                    print(f"  {rank:>2}. {expert['expert_name']:<24} score {expert['score']:.4f}  "
+                          f"({expert['comments']} comments, best {expert['best_similarity']:.4f})")
+
+        print(f"\nLatency: {json.dumps(searcher.get_latency_stats())}")
+        return 0
+    except Exception as e:
+        logger.error(f"Error: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,223 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import json
+import hashlib
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+class HunkStore:
+    """
+    Content-addressed side store for full diff hunks.
+
+    Each hunk is written once to <store_dir>/<hash[:2]>/<hash>.diff, so comments in
+    the same thread or file that share a hunk only carry its hash.
+    """
+
+    def __init__(self, store_dir):
+        """
+        Initialize the store.
+
+        Args:
+            store_dir (str): Directory holding the hunk files
+        """
+        self.store_dir = Path(store_dir)
+
+    @staticmethod
+    def hunk_hash(hunk):
+        """Return the SHA-256 hex digest of a hunk."""
+        return hashlib.sha256(hunk.encode("utf-8")).hexdigest()
+
+    def _path(self, digest):
+        return self.store_dir / digest[:2] / f"{digest}.diff"
+
+    def put(self, hunk):
+        """
+        Store a hunk if it is not already present.
+
+        Args:
+            hunk (str): Full diff hunk
+
+        Returns:
+            str: Hash referencing the hunk
+        """
+        digest = self.hunk_hash(hunk)
+        path = self._path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a unique temp file and rename so concurrent writers (threads or
+            # processes) never share a temp file or expose partial hunks
+            with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=path.parent,
+                                             suffix=".tmp", delete=False) as f:
+                f.write(hunk)
+            os.replace(f.name, path)
+        return digest
+
+    def get(self, digest):
+        """
+        Load a hunk by hash.
+
+        Args:
+            digest (str): Hash returned by put()
+
+        Returns:
+            str: Full diff hunk, or None if it is not in the store
+        """
+        path = self._path(digest)
+        if not path.exists():
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+
+
+def trim_hunk(hunk, window_lines):
+    """
+    Trim a diff hunk to the last lines ending at the commented line.
+
+    GitHub review hunks end at the line the comment is attached to, so the tail
+    of the hunk is the relevant context. The @@ header is kept when present.
+
+    Args:
+        hunk (str): Full diff hunk
+        window_lines (int): Number of diff lines to keep
+
+    Returns:
+        str: Trimmed hunk (unchanged if it already fits the window)
+    """
+    lines = hunk.splitlines()
+    header = [lines[0]] if lines and lines[0].startswith("@@") else []
+    body = lines[len(header):]
+    if len(body) <= window_lines:
+        return hunk
+    return "\n".join(header + body[-window_lines:])
+
+
+def compact_comment(comment, store, window_lines=10):
+    """
+    Replace a comment's diff_context with a trimmed window and store the full hunk.
+
+    Already compacted comments are returned unchanged.
+
+    Args:
+        comment (dict): Comment object
+        store (HunkStore): Side store for full hunks
+        window_lines (int): Number of diff lines to keep inline
+
+    Returns:
+        dict: Compacted comment
+    """
+    hunk = comment.get("diff_context")
+    if not hunk or "diff_context_hash" in comment:
+        return comment
+
+    trimmed = trim_hunk(hunk, window_lines)
+    if trimmed == hunk:
+        return comment
+
+    return {**comment, "diff_context": trimmed, "diff_context_hash": store.put(hunk)}
+
+
+def compact_comments(comments, store, window_lines=10):
+    """
+    Compact the diff context of a list of comments.
+
+    Args:
+        comments (list): Comment objects
+        store (HunkStore): Side store for full hunks
+        window_lines (int): Number of diff lines to keep inline
+
+    Returns:
+        list: Compacted comments
+    """
+    return [compact_comment(comment, store, window_lines) for comment in comments]
+
+
+def expand_comment(comment, store):
+    """
+    Restore the full diff hunk of a compacted comment.
+
+    Args:
+        comment (dict): Comment object
+        store (HunkStore): Side store holding the full hunks
+
+    Returns:
+        dict: Comment with the full diff_context (unchanged if not compacted or missing)
+    """
+    digest = comment.get("diff_context_hash")
+    if not digest:
+        return comment
+    hunk = store.get(digest)
+    if hunk is None:
+        logger.warning(f"Hunk {digest} not found in {store.store_dir}")
+        return comment
+    expanded = {**comment, "diff_context": hunk}
+    del expanded["diff_context_hash"]
+    return expanded
+
+
+def compact_file(input_file, store, window_lines=10):
+    """
+    Compact a comments JSON file in place.
+
+    Args:
+        input_file (str): Path to a comments.json or comments.enriched.json file
+        store (HunkStore): Side store for full hunks
+        window_lines (int): Number of diff lines to keep inline
+
+    Returns:
+        tuple: (bytes before, bytes after)
+    """
+    size_before = os.path.getsize(input_file)
+    with open(input_file, "r", encoding="utf-8") as f:
+        comments = json.load(f)
+
+    compacted = compact_comments(comments, store, window_lines)
+
+    tmp_file = f"{input_file}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(compacted, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_file, input_file)
+    return size_before, os.path.getsize(input_file)
+
+
+def main():
+    """Main function to compact existing comment files from command line."""
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Trim diff hunks in comment files and store full hunks by hash")
+    parser.add_argument("--data-dir", type=str, default="data",
+                        help="Base directory for data (default: 'data')")
+    parser.add_argument("--window", type=int, default=10,
+                        help="Number of diff lines to keep inline (default: 10)")
+    parser.add_argument("--language", type=str,
+                        help="Process only this language")
+
+    args = parser.parse_args()
+
+    data_path = Path(args.data_dir)
+    store = HunkStore(data_path / "hunks")
+    pattern = f"{args.language.lower()}/experts/*/comments*.json" if args.language else "*/experts/*/comments*.json"
+
+    total_before = total_after = 0
+    for comment_file in sorted(data_path.glob(pattern)):
+        try:
+            before, after = compact_file(str(comment_file), store, args.window)
+        except Exception as e:
+            logger.error(f"Error compacting {comment_file}: {e}")
+            continue
+        total_before += before
+        total_after += after
+        logger.info(f"Compacted {comment_file}: {before} -> {after} bytes")
+
+    print(f"Total: {total_before} -> {total_after} bytes")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
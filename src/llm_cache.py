@@ -0,0 +1,162 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+class LLMResponseCache:
+    """
+    Persistent, content-addressed cache of chat completion responses.
+
+    Entries are keyed by a SHA-256 of model, prompt version, messages and
+    temperature, so identical prompts from enrichment and tone analysis (after a
+    crash or under a second language directory) are answered without an API call.
+    Stored in SQLite with least-recently-used eviction once max_bytes is exceeded.
+    """
+
+    def __init__(self, cache_file, max_bytes=256 * 1024 * 1024, bypass=False):
+        """
+        Initialize the cache, creating the database if needed.
+
+        Args:
+            cache_file (str): Path to the SQLite cache file
+            max_bytes (int): Maximum total size of cached responses before eviction
+            bypass (bool): Skip cache reads (responses are still written), e.g. to force fresh answers
+        """
+        self.cache_file = cache_file
+        self.max_bytes = max_bytes
+        self.bypass = bypass
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+        cache_dir = os.path.dirname(cache_file)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(cache_file, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON responses (last_access)")
+        self._conn.commit()
+        # Running size of all responses, so writes do not have to scan the table
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def make_key(model, messages, temperature=0, prompt_version=""):
+        """
+        Build the cache key for a request.
+
+        Args:
+            model (str): Model name
+            messages (list): Chat messages
+            temperature (float): Sampling temperature
+            prompt_version (str): Version tag of the prompt template
+
+        Returns:
+            str: Hex digest
+        """
+        payload = json.dumps(
+            {"model": model, "prompt_version": prompt_version, "messages": messages, "temperature": temperature},
+            sort_keys=True, ensure_ascii=False, separators=(",", ":")
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """
+        Look up a cached response.
+
+        Args:
+            key (str): Cache key from make_key()
+
+        Returns:
+            str: Cached response content, or None on a miss or when bypassing
+        """
+        with self._lock:
+            if self.bypass:
+                self.stats["misses"] += 1
+                return None
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.stats["hits"] += 1
+            return row[0]
+
+    def put(self, key, response):
+        """
+        Store a response and evict least recently used entries if over budget.
+
+        Args:
+            key (str): Cache key from make_key()
+            response (str): Response content
+        """
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            replaced = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, response, size, now, now)
+            )
+            self._total_bytes += size - (replaced[0] if replaced else 0)
+            self.stats["writes"] += 1
+            self._evict()
+            self._conn.commit()
+
+    def delete(self, key):
+        """Remove an entry, e.g. when its response turned out to be unusable."""
+        with self._lock:
+            deleted = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._conn.commit()
+            if deleted:
+                self._total_bytes -= deleted[0]
+
+    def _evict(self):
+        """Delete least recently used entries until the cache fits max_bytes. Caller holds the lock."""
+        while self._total_bytes > self.max_bytes:
+            rows = self._conn.execute("SELECT key, size FROM responses ORDER BY last_access LIMIT 256").fetchall()
+            if not rows:
+                self._total_bytes = 0
+                return
+            for key, size in rows:
+                if self._total_bytes <= self.max_bytes:
+                    return
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._total_bytes -= size
+                self.stats["evictions"] += 1
+
+    def get_stats(self):
+        """
+        Get cache statistics.
+
+        Returns:
+            dict: Hits, misses, writes, evictions, hit rate and current size
+        """
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            total = self._total_bytes
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+            "entries": entries,
+            "size_bytes": total,
+        }
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,441 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import re
+import json
+import math
+import zlib
+import random
+import logging
+import argparse
+import threading
+from pathlib import Path
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# File extension -> language, using the lowercase names the LLM classifier returns
+EXTENSION_LANGUAGES = {
+    ".py": "python", ".pyi": "python", ".pyx": "python",
+    ".js": "javascript", ".jsx": "javascript", ".mjs": "javascript", ".cjs": "javascript",
+    ".ts": "typescript", ".tsx": "typescript", ".mts": "typescript", ".cts": "typescript",
+    ".java": "java", ".kt": "kotlin", ".kts": "kotlin", ".scala": "scala", ".groovy": "groovy",
+    ".go": "go", ".rs": "rust", ".rb": "ruby", ".php": "php", ".swift": "swift",
+    ".c": "c", ".h": "c", ".cc": "c++", ".cpp": "c++", ".cxx": "c++", ".hpp": "c++", ".hh": "c++",
+    ".cs": "c#", ".fs": "f#", ".m": "objective-c", ".mm": "objective-c",
+    ".dart": "dart", ".ex": "elixir", ".exs": "elixir", ".erl": "erlang", ".hs": "haskell",
+    ".clj": "clojure", ".lua": "lua", ".pl": "perl", ".r": "r", ".jl": "julia", ".zig": "zig",
+    ".sh": "shell", ".bash": "shell", ".sql": "sql", ".vue": "vue", ".svelte": "svelte",
+}
+
+# (language, pattern over import lines of the diff, framework)
+FRAMEWORK_IMPORT_PATTERNS = [
+    ("python", r"^\s*(?:from|import)\s+django\b", "django"),
+    ("python", r"^\s*(?:from|import)\s+flask\b", "flask"),
+    ("python", r"^\s*(?:from|import)\s+fastapi\b", "fastapi"),
+    ("python", r"^\s*(?:from|import)\s+pytest\b", "pytest"),
+    ("python", r"^\s*(?:from|import)\s+(?:torch)\b", "pytorch"),
+    ("python", r"^\s*(?:from|import)\s+tensorflow\b", "tensorflow"),
+    ("python", r"^\s*(?:from|import)\s+pandas\b", "pandas"),
+    ("python", r"^\s*(?:from|import)\s+numpy\b", "numpy"),
+    ("javascript", r"""from\s+['"]react['"]|require\(\s*['"]react['"]\s*\)""", "react"),
+    ("javascript", r"""from\s+['"]vue['"]""", "vue"),
+    ("javascript", r"""from\s+['"]@angular/""", "angular"),
+    ("javascript", r"""from\s+['"]express['"]|require\(\s*['"]express['"]\s*\)""", "express"),
+    ("javascript", r"""from\s+['"]next/""", "next.js"),
+    ("typescript", r"""from\s+['"]react['"]""", "react"),
+    ("typescript", r"""from\s+['"]vue['"]""", "vue"),
+    ("typescript", r"""from\s+['"]@angular/""", "angular"),
+    ("typescript", r"""from\s+['"]@nestjs/""", "nestjs"),
+    ("typescript", r"""from\s+['"]next/""", "next.js"),
+    ("java", r"^\s*import\s+org\.springframework\.", "spring"),
+    ("java", r"^\s*import\s+org\.junit\.", "junit"),
+    ("kotlin", r"^\s*import\s+org\.springframework\.", "spring"),
+    ("kotlin", r"^\s*import\s+androidx?\.", "android"),
+    ("php", r"^\s*use\s+Illuminate\\", "laravel"),
+    ("php", r"^\s*use\s+Symfony\\", "symfony"),
+    ("ruby", r"^\s*require\s+['\"]rails", "rails"),
+    ("go", r"\"github\.com/gin-gonic/gin\"", "gin"),
+    ("rust", r"^\s*use\s+tokio::", "tokio"),
+    ("rust", r"^\s*use\s+actix_web::", "actix-web"),
+]
+_FRAMEWORK_IMPORT_RES = [
+    (language, re.compile(pattern, re.MULTILINE), framework)
+    for language, pattern, framework in FRAMEWORK_IMPORT_PATTERNS
+]
+
+_TOKEN_RE = re.compile(r"[a-z_][a-z0-9_]{2,}")
+_PATH_SPLIT_RE = re.compile(r"[/\\._\-]+")
+
+
+def tokenize(text):
+    """Lowercase word tokens of at least three characters."""
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+class NaiveBayes:
+    """Multinomial naive Bayes with Laplace smoothing over token counts."""
+
+    def __init__(self, alpha=1.0):
+        """
+        Initialize an empty model.
+
+        Args:
+            alpha (float): Additive smoothing
+        """
+        self.alpha = alpha
+        self.label_counts = Counter()
+        self.token_counts = {}  # label -> Counter
+        self.token_totals = Counter()
+        self.vocabulary = set()
+
+    def update(self, label, tokens):
+        """Add one labelled example."""
+        self.label_counts[label] += 1
+        counts = self.token_counts.setdefault(label, Counter())
+        counts.update(tokens)
+        self.token_totals[label] += len(tokens)
+        self.vocabulary.update(tokens)
+
+    def predict(self, tokens):
+        """
+        Predict the most likely label.
+
+        Args:
+            tokens (list): Feature tokens
+
+        Returns:
+            tuple: (label, posterior probability), or (None, 0.0) for an untrained model
+        """
+        if not self.label_counts:
+            return None, 0.0
+
+        total_examples = sum(self.label_counts.values())
+        vocabulary_size = len(self.vocabulary) or 1
+        token_counts = Counter(token for token in tokens if token in self.vocabulary)
+
+        scores = {}
+        for label, label_count in self.label_counts.items():
+            counts = self.token_counts[label]
+            denominator = self.token_totals[label] + self.alpha * vocabulary_size
+            score = math.log(label_count / total_examples)
+            for token, count in token_counts.items():
+                score += count * math.log((counts[token] + self.alpha) / denominator)
+            scores[label] = score
+
+        best = max(scores, key=scores.get)
+        # Normalize in log space to get the posterior of the best label
+        normalizer = sum(math.exp(score - scores[best]) for score in scores.values())
+        return best, 1.0 / normalizer
+
+    def to_dict(self):
+        """Serialize the model to a JSON-compatible dict."""
+        return {
+            "alpha": self.alpha,
+            "label_counts": dict(self.label_counts),
+            "token_counts": {label: dict(counts) for label, counts in self.token_counts.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a model from to_dict() output."""
+        model = cls(alpha=data.get("alpha", 1.0))
+        for label, counts in data.get("token_counts", {}).items():
+            model.token_counts[label] = Counter(counts)
+            model.token_totals[label] = sum(counts.values())
+            model.vocabulary.update(counts)
+        model.label_counts = Counter(data.get("label_counts", {}))
+        return model
+
+
+class LocalClassifier:
+    """
+    Local pre-classifier for the fields CommentEnricher asks the model for.
+
+    language comes from the file extension, framework from import lines in the
+    diff (falling back to naive Bayes over path and diff tokens), and review_type
+    from naive Bayes over comment tokens. Both models are trained on previously
+    enriched comments. A comment is answered locally only when every field is
+    confident; a small deterministic sample of those is still sent to the model
+    to measure agreement.
+    """
+
+    def __init__(self, min_confidence=0.9, audit_rate=0.05, min_training_examples=200):
+        """
+        Initialize an untrained classifier.
+
+        Args:
+            min_confidence (float): Minimum posterior probability to accept a naive Bayes prediction
+            audit_rate (float): Fraction of confident comments still sent to the model to measure agreement
+            min_training_examples (int): Minimum training examples before any prediction is accepted
+        """
+        self.min_confidence = min_confidence
+        self.audit_rate = audit_rate
+        self.min_training_examples = min_training_examples
+        self.review_type_model = NaiveBayes()
+        self.framework_model = NaiveBayes()
+        self.training_examples = 0
+        self._lock = threading.Lock()
+        self.stats = {
+            "comments_seen": 0,
+            "answered_locally": 0,
+            "sent_to_llm": 0,
+            "audited": 0,
+            "compared": {"review_type": 0, "language": 0, "framework": 0},
+            "agreed": {"review_type": 0, "language": 0, "framework": 0},
+        }
+
+    @staticmethod
+    def infer_language(comment):
+        """Return the language implied by the comment's file extension, or None."""
+        file_path = comment.get("file_path") or ""
+        return EXTENSION_LANGUAGES.get(os.path.splitext(file_path)[1].lower())
+
+    @staticmethod
+    def infer_framework_from_imports(comment, language):
+        """Return the framework imported in the comment's diff context, or None."""
+        diff_context = comment.get("diff_context") or ""
+        for pattern_language, pattern, framework in _FRAMEWORK_IMPORT_RES:
+            if pattern_language == language and pattern.search(diff_context):
+                return framework
+        return None
+
+    @staticmethod
+    def _framework_features(comment, language):
+        """Language, path segment and diff tokens used by the framework model."""
+        file_path = (comment.get("file_path") or "").lower()
+        features = [f"l:{language}"]
+        features += [f"p:{part}" for part in _PATH_SPLIT_RE.split(file_path) if len(part) > 1]
+        features += [f"d:{token}" for token in tokenize(comment.get("diff_context"))[:200]]
+        return features
+
+    def train(self, records):
+        """
+        Train both models on enriched comments.
+
+        Records answered locally or copied from a near-duplicate are skipped so the
+        classifier only learns from model labels.
+
+        Args:
+            records (list): Enriched comment objects
+
+        Returns:
+            int: Number of training examples used
+        """
+        used = 0
+        for record in records:
+            if record.get("classified_by") == "local" or record.get("near_duplicate_of"):
+                continue
+            review_type = record.get("review_type")
+            framework = record.get("framework")
+            if not review_type or not framework:
+                continue
+            self.review_type_model.update(review_type, tokenize(record.get("comment")))
+            language = record.get("language") or self.infer_language(record)
+            self.framework_model.update(framework, self._framework_features(record, language))
+            used += 1
+        self.training_examples += used
+        return used
+
+    def predict(self, comment):
+        """
+        Predict every field with its confidence.
+
+        Args:
+            comment (dict): Comment object
+
+        Returns:
+            dict: field -> (value, confidence); value is None when unknown
+        """
+        language = self.infer_language(comment)
+        framework = self.infer_framework_from_imports(comment, language)
+        if framework:
+            framework_prediction = (framework, 1.0)
+        else:
+            framework_prediction = self.framework_model.predict(self._framework_features(comment, language))
+        return {
+            "review_type": self.review_type_model.predict(tokenize(comment.get("comment"))),
+            "language": (language, 1.0 if language else 0.0),
+            "framework": framework_prediction,
+        }
+
+    def _is_audited(self, comment):
+        """Deterministically pick a sample of comments by URL."""
+        key = (comment.get("comment_url") or comment.get("comment") or "").encode("utf-8")
+        return zlib.crc32(key) % 10000 < self.audit_rate * 10000
+
+    def classify(self, comment):
+        """
+        Classify a comment locally if every field is confident.
+
+        Args:
+            comment (dict): Comment object
+
+        Returns:
+            dict: Classification fields, or None if the comment should go to the model
+        """
+        with self._lock:
+            self.stats["comments_seen"] += 1
+        if self.training_examples < self.min_training_examples:
+            with self._lock:
+                self.stats["sent_to_llm"] += 1
+            return None
+
+        prediction = self.predict(comment)
+        confident = all(value and confidence >= self.min_confidence for value, confidence in prediction.values())
+        audited = confident and self._is_audited(comment)
+        with self._lock:
+            if confident and not audited:
+                self.stats["answered_locally"] += 1
+            else:
+                self.stats["sent_to_llm"] += 1
+                if audited:
+                    self.stats["audited"] += 1
+        if not confident or audited:
+            return None
+        return {field: value for field, (value, _) in prediction.items()}
+
+    def observe(self, comment, classification):
+        """
+        Compare a model classification with the local prediction for agreement stats.
+
+        Args:
+            comment (dict): Comment object
+            classification (dict): Classification returned by the model
+        """
+        if self.training_examples < self.min_training_examples:
+            return
+        prediction = self.predict(comment)
+        with self._lock:
+            for field, (value, confidence) in prediction.items():
+                # Only confident local answers would have replaced the model, so only they count
+                if not value or confidence < self.min_confidence or field not in classification:
+                    continue
+                self.stats["compared"][field] += 1
+                if classification[field] == value:
+                    self.stats["agreed"][field] += 1
+
+    def get_stats(self):
+        """
+        Get savings and agreement statistics.
+
+        Returns:
+            dict: Counts, LLM-call savings rate and per-field agreement rates
+        """
+        with self._lock:
+            stats = json.loads(json.dumps(self.stats))
+        seen = stats["comments_seen"]
+        stats["training_examples"] = self.training_examples
+        stats["llm_call_savings"] = round(stats["answered_locally"] / seen, 4) if seen else 0.0
+        stats["agreement_rate"] = {
+            field: round(stats["agreed"][field] / compared, 4) if compared else None
+            for field, compared in stats["compared"].items()
+        }
+        return stats
+
+    def evaluate(self, records):
+        """
+        Measure coverage and agreement of confident predictions against model labels.
+
+        Args:
+            records (list): Enriched comment objects not used for training
+
+        Returns:
+            dict: Number evaluated, fraction answered locally and agreement of those answers
+        """
+        evaluated = answered = agreed = 0
+        for record in records:
+            if record.get("classified_by") == "local" or not record.get("review_type"):
+                continue
+            evaluated += 1
+            prediction = self.predict(record)
+            if not all(value and confidence >= self.min_confidence for value, confidence in prediction.values()):
+                continue
+            answered += 1
+            if all(record.get(field) == value for field, (value, _) in prediction.items()):
+                agreed += 1
+        return {
+            "evaluated": evaluated,
+            "coverage": round(answered / evaluated, 4) if evaluated else 0.0,
+            "agreement_rate": round(agreed / answered, 4) if answered else None,
+        }
+
+    def save(self, model_file):
+        """Persist the trained models as JSON."""
+        with open(model_file, "w", encoding="utf-8") as f:
+            json.dump({
+                "training_examples": self.training_examples,
+                "review_type": self.review_type_model.to_dict(),
+                "framework": self.framework_model.to_dict(),
+            }, f, ensure_ascii=False)
+
+    def load(self, model_file):
+        """Load models saved by save()."""
+        with open(model_file, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        self.training_examples = data.get("training_examples", 0)
+        self.review_type_model = NaiveBayes.from_dict(data["review_type"])
+        self.framework_model = NaiveBayes.from_dict(data["framework"])
+
+
+def load_enriched_corpus(data_dir):
+    """
+    Load every enriched comment under a data directory.
+
+    Args:
+        data_dir (str): Base data directory ({language}/experts/{user}/comments.enriched.json)
+
+    Returns:
+        list: Enriched comment objects
+    """
+    records = []
+    for enriched_file in sorted(Path(data_dir).glob("*/experts/*/comments.enriched.json")):
+        try:
+            with open(enriched_file, "r", encoding="utf-8") as f:
+                records.extend(json.load(f))
+        except Exception as e:
+            logger.warning(f"Skipping {enriched_file}: {e}")
+    return records
+
+
+def main():
+    """Main function to train and evaluate the local classifier from command line."""
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Train the local pre-classifier on enriched comments")
+    parser.add_argument("--data-dir", type=str, default="data",
+                        help="Base directory for data (default: 'data')")
+    parser.add_argument("--output", type=str,
+                        help="Model file (default: <data-dir>/local_classifier.json)")
+    parser.add_argument("--min-confidence", type=float, default=0.9,
+                        help="Minimum confidence to answer without the model (default: 0.9)")
+    parser.add_argument("--holdout", type=float, default=0.2,
+                        help="Fraction of comments held out for evaluation (default: 0.2)")
+
+    args = parser.parse_args()
+
+    records = load_enriched_corpus(args.data_dir)
+    if not records:
+        logger.error(f"No enriched comments found in {args.data_dir}")
+        return 1
+
+    random.Random(0).shuffle(records)
+    split = int(len(records) * (1 - args.holdout))
+    classifier = LocalClassifier(min_confidence=args.min_confidence)
+    classifier.train(records[:split])
+    evaluation = classifier.evaluate(records[split:])
+    print(f"Held-out evaluation: {evaluation}")
+
+    # Retrain on everything for the saved model
+    classifier = LocalClassifier(min_confidence=args.min_confidence)
+    used = classifier.train(records)
+    output = args.output or os.path.join(args.data_dir, "local_classifier.json")
+    classifier.save(output)
+    print(f"Trained on {used} comments; model saved to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,286 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import re
+import json
+import zlib
+import random
+import logging
+import threading
+
+from local_classifier import LocalClassifier
+
+logger = logging.getLogger(__name__)
+
+# Mersenne prime used for the MinHash permutations
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Fields copied from a representative comment onto its near-duplicates. Similar
+# review text recurs across repos and languages, so language and framework are
+# derived from the duplicate itself (see NearDuplicateDetector.find)
+ENRICHMENT_FIELDS = ("review_type",)
+# Fields kept on a representative (with its repo) to derive a duplicate's language and framework
+CONTEXT_FIELDS = ("language", "framework")
+
+
+def normalize_text(text):
+    """Lowercase and collapse whitespace so trivial formatting differences do not matter."""
+    return _WHITESPACE_RE.sub(" ", (text or "").lower()).strip()
+
+
+class NearDuplicateIndex:
+    """
+    Persistent MinHash LSH index for near-duplicate comment detection.
+
+    Each indexed comment keeps its MinHash signature and, once classified, its
+    enrichment fields so near-duplicates can reuse them instead of calling the LLM.
+    Signatures are split into bands; comments sharing any band bucket are candidates
+    and are confirmed by their estimated Jaccard similarity.
+    """
+
+    def __init__(self, index_file=None, threshold=0.8, num_perm=64, bands=16, shingle_size=5, seed=1):
+        """
+        Initialize the index, loading it from disk if it exists.
+
+        Args:
+            index_file (str, optional): Path to persist the index as JSON
+            threshold (float): Minimum estimated Jaccard similarity to count as a near-duplicate
+            num_perm (int): Number of MinHash permutations
+            bands (int): Number of LSH bands (must divide num_perm)
+            shingle_size (int): Character shingle size
+            seed (int): Seed for the permutation coefficients
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+
+        self.index_file = index_file
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        rng = random.Random(seed)
+        self._perms = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+
+        self.entries = {}  # comment_url -> {"signature": [...], "enrichment": {...}}
+        self.buckets = {}  # (band, band_hash) -> [comment_url, ...]
+        self._lock = threading.Lock()
+        self._dirty = False
+
+        if index_file and os.path.exists(index_file):
+            self.load()
+
+    def signature(self, text):
+        """
+        Compute the MinHash signature of a comment text.
+
+        Args:
+            text (str): Comment text
+
+        Returns:
+            list: num_perm integers
+        """
+        normalized = normalize_text(text)
+        k = self.shingle_size
+        if len(normalized) <= k:
+            shingles = {normalized}
+        else:
+            shingles = {normalized[i:i + k] for i in range(len(normalized) - k + 1)}
+        hashes = [zlib.crc32(shingle.encode("utf-8")) for shingle in shingles]
+
+        return [
+            min(((a * h + b) % _PRIME) & _MAX_HASH for h in hashes)
+            for a, b in self._perms
+        ]
+
+    def _band_keys(self, signature):
+        """Yield the LSH bucket keys for a signature."""
+        for band in range(self.bands):
+            start = band * self.rows
+            yield (band, hash(tuple(signature[start:start + self.rows])))
+
+    def similarity(self, sig_a, sig_b):
+        """Estimate Jaccard similarity from two MinHash signatures."""
+        return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / self.num_perm
+
+    def query(self, signature, require_enrichment=False):
+        """
+        Find the most similar indexed comment above the threshold.
+
+        Args:
+            signature (list): MinHash signature of the comment
+            require_enrichment (bool): Only consider entries that already carry enrichment
+
+        Returns:
+            tuple: (comment_url, similarity) or None if no near-duplicate exists
+        """
+        with self._lock:
+            candidates = set()
+            for key in self._band_keys(signature):
+                candidates.update(self.buckets.get(key, ()))
+
+            best = None
+            for url in candidates:
+                entry = self.entries[url]
+                if require_enrichment and not entry.get("enrichment"):
+                    continue
+                score = self.similarity(signature, entry["signature"])
+                if score >= self.threshold and (best is None or score > best[1]):
+                    best = (url, score)
+            return best
+
+    def add(self, comment_url, signature, enrichment=None):
+        """
+        Add a representative comment to the index.
+
+        Args:
+            comment_url (str): Unique comment URL
+            signature (list): MinHash signature of the comment
+            enrichment (dict, optional): Classification fields of the comment
+        """
+        if not comment_url:
+            return
+        with self._lock:
+            if comment_url not in self.entries:
+                for key in self._band_keys(signature):
+                    self.buckets.setdefault(key, []).append(comment_url)
+            self.entries[comment_url] = {"signature": signature, "enrichment": enrichment}
+            self._dirty = True
+
+    def get_enrichment(self, comment_url):
+        """Get the stored enrichment fields of an indexed comment."""
+        entry = self.entries.get(comment_url)
+        return entry.get("enrichment") if entry else None
+
+    def load(self):
+        """Load the index from its JSON file."""
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading near-duplicate index {self.index_file}: {e}")
+            return
+
+        config = data.get("config", {})
+        if config.get("num_perm") != self.num_perm or config.get("shingle_size") != self.shingle_size:
+            logger.warning(f"Near-duplicate index {self.index_file} was built with different settings, rebuilding")
+            return
+
+        for url, entry in data.get("entries", {}).items():
+            self.add(url, entry["signature"], entry.get("enrichment"))
+        self._dirty = False
+        logger.info(f"Loaded near-duplicate index with {len(self.entries)} entries from {self.index_file}")
+
+    def save(self):
+        """Persist the index to its JSON file if it changed."""
+        if not self.index_file or not self._dirty:
+            return
+        with self._lock:
+            data = {
+                "config": {"num_perm": self.num_perm, "shingle_size": self.shingle_size},
+                "entries": self.entries,
+            }
+            tmp_file = f"{self.index_file}.tmp"
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_file, self.index_file)
+            self._dirty = False
+
+
+class NearDuplicateDetector:
+    """Looks up near-duplicates across several indexes (e.g. per expert, then per language)."""
+
+    def __init__(self, indexes):
+        """
+        Initialize with indexes ordered from most to least specific.
+
+        Args:
+            indexes (list): NearDuplicateIndex instances sharing the same MinHash settings
+        """
+        self.indexes = indexes
+        self.stats = {"checked": 0, "duplicates": 0, "context_mismatches": 0}
+
+    @staticmethod
+    def duplicate_enrichment(comment, stored):
+        """
+        Build the enrichment of a near-duplicate from its representative's stored fields.
+
+        Only review_type is copied. Language comes from the duplicate's file extension
+        and framework from the imports in its diff context; the representative's values
+        are used only when both comments are from the same repo (and, for framework,
+        the same language).
+
+        Args:
+            comment (dict): Near-duplicate comment object
+            stored (dict): Stored fields of the representative
+
+        Returns:
+            dict: Enrichment fields, or None if language or framework cannot be determined
+        """
+        same_repo = bool(comment.get("repo")) and comment.get("repo") == stored.get("repo")
+        language = LocalClassifier.infer_language(comment)
+        if not language and same_repo:
+            language = stored.get("language")
+        if not language:
+            return None
+
+        framework = LocalClassifier.infer_framework_from_imports(comment, language)
+        if not framework and same_repo and language == stored.get("language"):
+            framework = stored.get("framework")
+        if not framework:
+            return None
+
+        enrichment = {key: stored[key] for key in ENRICHMENT_FIELDS if key in stored}
+        enrichment.update(language=language, framework=framework)
+        return enrichment
+
+    def find(self, comment):
+        """
+        Find an already classified near-duplicate of a comment.
+
+        Matches whose language or framework cannot be determined for this comment
+        are skipped, so the comment is classified normally.
+
+        Args:
+            comment (dict): Comment object
+
+        Returns:
+            tuple: (representative comment_url, enrichment dict, signature); url and enrichment are None if no match
+        """
+        signature = self.indexes[0].signature(comment.get("comment", ""))
+        self.stats["checked"] += 1
+        for index in self.indexes:
+            match = index.query(signature, require_enrichment=True)
+            if not match:
+                continue
+            enrichment = self.duplicate_enrichment(comment, index.get_enrichment(match[0]))
+            if enrichment:
+                self.stats["duplicates"] += 1
+                return match[0], enrichment, signature
+            self.stats["context_mismatches"] += 1
+        return None, None, signature
+
+    def register(self, comment, enrichment, signature=None):
+        """
+        Register a classified comment as a representative in every index.
+
+        Args:
+            comment (dict): Comment object
+            enrichment (dict): Classification fields returned for the comment
+            signature (list, optional): Precomputed MinHash signature
+        """
+        if signature is None:
+            signature = self.indexes[0].signature(comment.get("comment", ""))
+        fields = {key: enrichment[key] for key in ENRICHMENT_FIELDS + CONTEXT_FIELDS if key in enrichment}
+        fields["repo"] = comment.get("repo")
+        for index in self.indexes:
+            index.add(comment.get("comment_url"), signature, fields)
+
+    def save(self):
+        """Persist every index."""
+        for index in self.indexes:
+            index.save()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Add payload indexes to existing comment collections and measure filtered search.
+
+    python src/payload_indexes.py migrate --collection github_comments
+    python src/payload_indexes.py benchmark --collection github_comments --filter-fields expert_name review_type
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import json
+import time
+import logging
+import argparse
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+from collection_profiles import (COLLECTION_PROFILES, DEFAULT_PAYLOAD_INDEXES, get_profile, collection_config,
+                                 create_payload_indexes)
+from collection_benchmark import sample_points, wait_until_indexed, percentile
+from qdrant_uploader import QdrantUploader
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def build_filter(payload, fields):
+    """
+    Build a filter matching the values of some payload fields.
+
+    Args:
+        payload (dict): Payload to take the values from
+        fields (list): Fields to filter on (fields missing from the payload are left out)
+
+    Returns:
+        models.Filter: Filter, or None if no field has a value
+    """
+    conditions = [
+        models.FieldCondition(key=field, match=models.MatchValue(value=payload[field]))
+        for field in fields if payload.get(field)
+    ]
+    return models.Filter(must=conditions) if conditions else None
+
+
+def filtered_search_latencies(client, collection_name, queries, k=10):
+    """
+    Run filtered searches and time them.
+
+    Args:
+        client (QdrantClient): Qdrant client
+        collection_name (str): Name of the collection
+        queries (list): (vector, filter) pairs
+        k (int): Results per search
+
+    Returns:
+        tuple: (latencies in ms, result IDs per query)
+    """
+    latencies = []
+    results = []
+    for vector, query_filter in queries:
+        start = time.perf_counter()
+        points = client.query_points(
+            collection_name=collection_name, query=vector, query_filter=query_filter,
+            limit=k, with_payload=False
+        ).points
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append([point.id for point in points])
+    return latencies, results
+
+
+def benchmark_filtered_search(client, source, fields, filter_fields, sample=10000, queries=100, k=10,
+                              profile="default", keep=False):
+    """
+    Compare filtered search latency on a sample of a collection with and without payload indexes.
+
+    The sample is loaded into a scratch collection without indexes, searched, then
+    indexed and searched again with the same queries.
+
+    Args:
+        client (QdrantClient): Qdrant client
+        source (str): Collection to sample from
+        fields (list): Payload fields to index
+        filter_fields (list): Payload fields each query filters on (values taken from held-out points)
+        sample (int): Points loaded into the scratch collection
+        queries (int): Held-out points used as filtered queries
+        k (int): Results per search
+        profile (str): Collection profile of the scratch collection
+        keep (bool): Keep the scratch collection
+
+    Returns:
+        dict: p50/p95 latency without and with indexes, and result overlap between the two
+    """
+    points = sample_points(client, source, sample + queries)
+    if len(points) <= queries:
+        raise ValueError(f"Collection '{source}' has too few points ({len(points)}) to benchmark")
+    corpus = points[:-queries]
+    query_list = [(record.vector, build_filter(record.payload or {}, filter_fields)) for record in points[-queries:]]
+    query_list = [(vector, query_filter) for vector, query_filter in query_list if query_filter is not None]
+    if not query_list:
+        raise ValueError(f"No held-out point has values for {', '.join(filter_fields)}")
+
+    collection_name = f"{source}_bench_filters"
+    if client.collection_exists(collection_name):
+        client.delete_collection(collection_name)
+    client.create_collection(collection_name=collection_name,
+                             **collection_config(get_profile(profile), len(corpus[0].vector)))
+    uploader = QdrantUploader(client, collection_name)
+    uploader.add(models.PointStruct(id=record.id, vector=record.vector, payload=record.payload) for record in corpus)
+    uploader.close()
+    wait_until_indexed(client, collection_name)
+
+    without_latencies, without_results = filtered_search_latencies(client, collection_name, query_list, k)
+
+    start = time.time()
+    create_payload_indexes(client, collection_name, fields)
+    wait_until_indexed(client, collection_name)
+    index_seconds = time.time() - start
+
+    with_latencies, with_results = filtered_search_latencies(client, collection_name, query_list, k)
+
+    if not keep:
+        client.delete_collection(collection_name)
+
+    overlaps = [len(set(a) & set(b)) / len(a) for a, b in zip(without_results, with_results) if a]
+    return {
+        "points": len(corpus),
+        "queries": len(query_list),
+        "filter_fields": list(filter_fields),
+        "index_seconds": round(index_seconds, 2),
+        "without_indexes_ms_p50": round(percentile(without_latencies, 50), 2),
+        "without_indexes_ms_p95": round(percentile(without_latencies, 95), 2),
+        "with_indexes_ms_p50": round(percentile(with_latencies, 50), 2),
+        "with_indexes_ms_p95": round(percentile(with_latencies, 95), 2),
+        "result_overlap": round(sum(overlaps) / len(overlaps), 4) if overlaps else None,
+    }
+
+
+def main():
+    """Main function to migrate or benchmark payload indexes from command line."""
+    parser = argparse.ArgumentParser(description="Payload indexes for filtered expert search")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    migrate_parser = subparsers.add_parser("migrate", help="Create missing payload indexes on existing collections")
+    benchmark_parser = subparsers.add_parser("benchmark",
+                                             help="Compare filtered search latency with and without indexes")
+    for subparser in (migrate_parser, benchmark_parser):
+        subparser.add_argument("--collection", type=str, nargs="+", default=["github_comments"],
+                               help="Collection(s) to migrate, or the collection to sample for the benchmark")
+        subparser.add_argument("--qdrant-url", type=str, default="http://localhost:6333",
+                               help="Qdrant server URL")
+        subparser.add_argument("--qdrant-key", type=str,
+                               help="Qdrant API key for authentication")
+        subparser.add_argument("--fields", type=str, nargs="+", default=list(DEFAULT_PAYLOAD_INDEXES),
+                               help="Payload fields to index")
+    benchmark_parser.add_argument("--filter-fields", type=str, nargs="+", default=["expert_name", "review_type"],
+                                  help="Fields each benchmark query filters on (default: expert_name review_type)")
+    benchmark_parser.add_argument("--sample", type=int, default=10000,
+                                  help="Points loaded into the scratch collection (default: 10000)")
+    benchmark_parser.add_argument("--queries", type=int, default=100,
+                                  help="Held-out points used as queries (default: 100)")
+    benchmark_parser.add_argument("--k", type=int, default=10,
+                                  help="Results per search (default: 10)")
+    benchmark_parser.add_argument("--profile", type=str, default="default", choices=list(COLLECTION_PROFILES),
+                                  help="Collection profile of the scratch collection (default: default)")
+    benchmark_parser.add_argument("--keep", action="store_true",
+                                  help="Keep the scratch collection")
+
+    args = parser.parse_args()
+
+    try:
+        client = QdrantClient(url=args.qdrant_url, api_key=args.qdrant_key) if args.qdrant_key \
+            else QdrantClient(url=args.qdrant_url)
+
+        if args.command == "migrate":
+            for collection_name in args.collection:
+                created = create_payload_indexes(client, collection_name, args.fields)
+                print(f"{collection_name}: indexed {', '.join(created) if created else 'nothing (all present)'}")
+            return 0
+
+        result = benchmark_filtered_search(
+            client, args.collection[0], args.fields, args.filter_fields,
+            sample=args.sample, queries=args.queries, k=args.k, profile=args.profile, keep=args.keep
+        )
+        print(json.dumps(result, indent=2))
+        return 0
+    except Exception as e:
+        logger.error(f"Error: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    exit(main())
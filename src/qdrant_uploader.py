@@ -0,0 +1,127 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+class QdrantUploader:
+    """
+    Parallel, non-blocking upserts of points into a Qdrant collection.
+
+    Points are fed in as they are embedded and sent in batches by a pool of
+    worker threads with wait=False, so uploads overlap with embedding. A
+    wait=False upsert returns once Qdrant has accepted the update, not once it
+    is applied. close() first waits for every such upsert to be accepted, then
+    sends the held-back last batch with wait=True. Qdrant applies updates in
+    order only within one shard's update queue, so the last batch being applied
+    means every point is searchable only for a single-shard collection (the
+    default on a single node); with several shards or replicas, earlier points may
+    become searchable slightly later.
+    """
+
+    def __init__(self, client, collection_name, batch_size=100, workers=4, max_retries=3):
+        """
+        Initialize the uploader.
+
+        Args:
+            client (QdrantClient): Qdrant client (HTTP or gRPC)
+            collection_name (str): Name of the target collection
+            batch_size (int): Points per upsert request
+            workers (int): Concurrent upsert requests
+            max_retries (int): Attempts per batch before the upload fails
+        """
+        self.client = client
+        self.collection_name = collection_name
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.stats = {"vectors": 0, "requests": 0, "retries": 0}
+
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        # Bound in-flight batches so a fast producer cannot queue the whole file in memory
+        self._slots = threading.BoundedSemaphore(workers * 2)
+        self._futures = []
+        self._buffer = []
+        self._held_back = None
+        self._lock = threading.Lock()
+        self._started = None
+
+    def add(self, points):
+        """
+        Queue points for upload; full batches are handed to the workers.
+
+        Args:
+            points (iterable): PointStruct objects
+        """
+        for point in points:
+            self._buffer.append(point)
+            if len(self._buffer) >= self.batch_size:
+                self._dispatch(self._buffer)
+                self._buffer = []
+
+    def _dispatch(self, batch):
+        """Send the previously held-back batch and hold back this one."""
+        if self._started is None:
+            self._started = time.time()
+        previous, self._held_back = self._held_back, batch
+        if previous is None:
+            return
+        self._slots.acquire()
+        future = self._executor.submit(self._upsert, previous, False)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures.append(future)
+
+    def _upsert(self, batch, wait):
+        """Upsert one batch, retrying with backoff; only a successful upsert is counted."""
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                self.client.upsert(collection_name=self.collection_name, points=batch, wait=wait)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                with self._lock:
+                    self.stats["retries"] += 1
+                logger.warning(f"Upsert of {len(batch)} points failed (attempt {attempt}/{self.max_retries}): {e}")
+                time.sleep(2 ** attempt)
+                continue
+            with self._lock:
+                self.stats["vectors"] += len(batch)
+                self.stats["requests"] += 1
+            return
+
+    def close(self):
+        """
+        Upload the remaining points and wait until all of them are applied.
+
+        Returns:
+            dict: Vectors, requests, retries, seconds and vectors per second
+
+        Raises:
+            Exception: The first upsert error, after every batch has finished
+        """
+        if self._buffer:
+            self._dispatch(self._buffer)
+            self._buffer = []
+        errors = []
+        for future in self._futures:
+            try:
+                future.result()
+            except Exception as e:
+                errors.append(e)
+        self._executor.shutdown()
+        if self._held_back and not errors:
+            # Every earlier batch has been accepted; wait=True returns once this one is applied
+            self._upsert(self._held_back, True)
+        if errors:
+            raise errors[0]
+
+        seconds = time.time() - self._started if self._started else 0.0
+        return {
+            **self.stats,
+            "seconds": round(seconds, 3),
+            "vectors_per_second": round(self.stats["vectors"] / seconds, 1) if seconds else 0.0,
+        }
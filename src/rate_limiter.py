@@ -0,0 +1,149 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import re
+import time
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_reset_duration(value):
+    """
+    Parse an OpenAI x-ratelimit-reset-* value such as "1s", "6m0s" or "20ms".
+
+    Args:
+        value (str): Header value
+
+    Returns:
+        float: Duration in seconds, or None if it cannot be parsed
+    """
+    if not value:
+        return None
+    matches = _DURATION_RE.findall(value)
+    if not matches:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in matches)
+
+
+class TokenBucket:
+    """Single token bucket refilled continuously at capacity per minute."""
+
+    def __init__(self, per_minute):
+        """
+        Initialize a full bucket.
+
+        Args:
+            per_minute (float): Bucket capacity, refilled over one minute
+        """
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.last_refill = time.monotonic()
+
+    @property
+    def rate(self):
+        """Refill rate in units per second."""
+        return self.capacity / 60.0
+
+    def refill(self, now):
+        """Add the units accrued since the last refill."""
+        self.level = min(self.capacity, self.level + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def wait_time(self, amount):
+        """Seconds until amount units are available (0 if available now)."""
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+
+class TokenBucketRateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute limiter for OpenAI calls.
+
+    Thread-safe and usable from several event loops at once, so one limiter can be
+    shared by every expert processed in parallel. Bucket sizes and levels are
+    corrected from the x-ratelimit-* response headers.
+    """
+
+    def __init__(self, requests_per_minute=500, tokens_per_minute=200000):
+        """
+        Initialize the limiter.
+
+        Args:
+            requests_per_minute (int): Initial request budget per minute
+            tokens_per_minute (int): Initial token budget per minute
+        """
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self._lock = threading.Lock()
+
+    def _try_acquire(self, tokens):
+        """Take one request and the given tokens if available; return the wait time otherwise."""
+        with self._lock:
+            now = time.monotonic()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            wait = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+            if wait == 0:
+                self.requests.level -= 1
+                self.tokens.level -= min(tokens, self.tokens.capacity)
+            return wait
+
+    async def acquire(self, tokens):
+        """
+        Wait until one request and the estimated tokens fit in the budget.
+
+        Args:
+            tokens (int): Estimated tokens (prompt plus completion) of the request
+        """
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait == 0:
+                return
+            await asyncio.sleep(wait)
+
+    def acquire_sync(self, tokens):
+        """Blocking variant of acquire() for synchronous callers."""
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait == 0:
+                return
+            time.sleep(wait)
+
+    def update_from_headers(self, headers):
+        """
+        Correct the buckets from x-ratelimit-* response headers.
+
+        Args:
+            headers (Mapping): Response headers
+        """
+        with self._lock:
+            now = time.monotonic()
+            for kind, bucket in (("requests", self.requests), ("tokens", self.tokens)):
+                limit = headers.get(f"x-ratelimit-limit-{kind}")
+                remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+                try:
+                    if limit is not None:
+                        bucket.refill(now)
+                        bucket.capacity = float(limit)
+                    if remaining is not None:
+                        bucket.refill(now)
+                        # The server's view wins when it is stricter than ours
+                        bucket.level = min(bucket.level, float(remaining))
+                except ValueError:
+                    logger.debug(f"Ignoring malformed x-ratelimit-*-{kind} headers")
+                    continue
+
+                reset = parse_reset_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                if remaining is not None and reset and float(remaining) <= 0:
+                    # Bucket is empty until the reset; push the next refill out accordingly
+                    bucket.level = 0.0
+                    bucket.last_refill = now + reset
@@ -10,6 +10,7 @@ import os
 from pathlib import Path
 from tqdm import tqdm
 from datetime import datetime
+from comment_filter import CommentFilter
 
 # Set up logging
 logging.basicConfig(
@@ -21,17 +22,19 @@ logging.basicConfig(
 class RestAPICommentCrawler:
     """GitHub comment crawler using REST API as fallback when GraphQL is rate limited."""
     
-    def __init__(self, github_token):
+    def __init__(self, github_token, comment_filter=None):
         """Initialize the REST API crawler.
         
         Args:
             github_token (str): GitHub API token
+            comment_filter (CommentFilter, optional): Shared comment filter (default rules if omitted)
         """
         self.github_token = github_token
         self.headers = {
             "Authorization": f"token {github_token}",
             "Accept": "application/vnd.github.v3+json",
         }
+        self.comment_filter = comment_filter or CommentFilter()
         
     def search_pull_requests(self, username, page=1, per_page=100):
         """Search for PRs where the user has commented."""
@@ -349,6 +352,7 @@ class RestAPICommentCrawler:
                         logging.info(f"Saved {len(all_comments)} comments to {output_file} (progress)")
 
             logging.info(f"Finished collecting comments. Total: {len(all_comments)}")
+            logging.info(f"Comment filter stats: {self.comment_filter.format_stats()}")
 
         except Exception as e:
             logging.error(f"Error in collect_comments: {e}")
@@ -383,12 +387,7 @@ class RestAPICommentCrawler:
 
     def is_valid_comment(self, comment_text):
         """
-        Check if a comment is valid for collection.
-        
-        Criteria:
-        - Not blank or only whitespace
-        - Not too short (at least 10 characters)
-        - Appears to be in English (heuristic check)
+        Check if a comment is valid for collection using the shared comment filter.
         
         Args:
             comment_text (str): The comment text to validate
@@ -396,40 +395,7 @@ class RestAPICommentCrawler:
         Returns:
             bool: True if the comment is valid, False otherwise
         """
-        if not comment_text or not comment_text.strip():
-            logging.debug("Skipping blank comment")
-            return False
-            
-        # Skip very short comments
-        if len(comment_text.strip()) < 10:
-            logging.debug(f"Skipping short comment: {comment_text.strip()}")
-            return False
-            
-        # Simple heuristic to check if comment is likely in English
-        # Count English alphabet characters vs. total non-whitespace characters
-        text = comment_text.strip()
-        alpha_count = sum(c.isalpha() and c.isascii() for c in text)
-        non_space_count = sum(not c.isspace() for c in text)
-        
-        if non_space_count == 0:
-            return False
-            
-        # If less than 40% of characters are English alphabet letters, likely not English
-        english_ratio = alpha_count / non_space_count
-        if english_ratio < 0.4:
-            logging.debug(f"Skipping likely non-English comment (ratio: {english_ratio:.2f})")
-            return False
-            
-        # Additional check for common English words
-        # common_words = ['the', 'a', 'an', 'and', 'or', 'but', 'if', 'this', 'that', 'is', 'are', 
-        #                  'it', 'to', 'in', 'for', 'with', 'on', 'as', 'by', 'at', 'from']
-        
-        # words = set(text.lower().split())
-        # if not any(word in words for word in common_words) and len(words) > 5:
-        #     logging.debug("Comment lacks common English words, might not be English")
-        #     return False
-            
-        return True
+        return self.comment_filter.is_valid(comment_text)
 
 
 # For backward compatibility
@@ -0,0 +1,175 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import logging
+import threading
+
+try:
+    import tiktoken
+except ImportError:  # Optional: fall back to a character-based estimate
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Encoding used when tiktoken does not know the model (gpt-4o family)
+DEFAULT_ENCODING = "o200k_base"
+# Characters per token of the fallback estimate
+CHARS_PER_TOKEN = 4
+
+
+class TokenCounter:
+    """
+    Counts and truncates text in model tokens.
+
+    Uses tiktoken when it is installed; otherwise estimates about four characters
+    per token, which is close enough for budgeting English text and code.
+    """
+
+    def __init__(self, model="gpt-4o-mini"):
+        """
+        Initialize the counter for a model.
+
+        Args:
+            model (str): Model name used to pick the tokenizer
+        """
+        self.model = model
+        self.encoding = None
+        if tiktoken is not None:
+            try:
+                try:
+                    self.encoding = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    self.encoding = tiktoken.get_encoding(DEFAULT_ENCODING)
+            except Exception as e:
+                # The encoding files are downloaded on first use, which fails offline
+                logger.warning(f"Cannot load tokenizer for {model}, estimating token counts: {e}")
+        else:
+            logger.debug("tiktoken is not installed; estimating token counts from text length")
+
+    @property
+    def exact(self):
+        """Whether counts come from the real tokenizer."""
+        return self.encoding is not None
+
+    def count(self, text):
+        """
+        Count the tokens of a text.
+
+        Args:
+            text (str): Text to count
+
+        Returns:
+            int: Number of tokens
+        """
+        if not text:
+            return 0
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        return len(text) // CHARS_PER_TOKEN + 1
+
+    def count_messages(self, messages):
+        """Count the tokens of chat messages, including the per-message overhead."""
+        return sum(self.count(message["content"]) + 4 for message in messages) + 3
+
+    def truncate(self, text, max_tokens, keep="head"):
+        """
+        Truncate a text to at most max_tokens.
+
+        Args:
+            text (str): Text to truncate
+            max_tokens (int): Token budget
+            keep (str): "head" keeps the beginning, "tail" keeps the end
+
+        Returns:
+            str: Text within the budget (unchanged if it already fits)
+        """
+        if not text:
+            return text
+        if max_tokens <= 0:
+            return ""
+        if self.encoding is not None:
+            tokens = self.encoding.encode(text, disallowed_special=())
+            if len(tokens) <= max_tokens:
+                return text
+            kept = tokens[:max_tokens] if keep == "head" else tokens[-max_tokens:]
+            return self.encoding.decode(kept)
+
+        max_chars = max_tokens * CHARS_PER_TOKEN
+        if len(text) <= max_chars:
+            return text
+        return text[:max_chars] if keep == "head" else text[-max_chars:]
+
+    def split(self, text, max_tokens, overlap=0):
+        """
+        Split a text into chunks of at most max_tokens that overlap by `overlap` tokens.
+
+        Args:
+            text (str): Text to split
+            max_tokens (int): Token budget per chunk
+            overlap (int): Tokens repeated at the start of each following chunk
+
+        Returns:
+            list: Chunks in order (the text itself if it already fits)
+        """
+        if self.count(text) <= max_tokens:
+            return [text]
+        step = max(1, max_tokens - overlap)
+        if self.encoding is not None:
+            tokens = self.encoding.encode(text, disallowed_special=())
+            return [self.encoding.decode(tokens[start:start + max_tokens])
+                    for start in range(0, len(tokens) - overlap, step)]
+
+        max_chars = max_tokens * CHARS_PER_TOKEN
+        step_chars = step * CHARS_PER_TOKEN
+        return [text[start:start + max_chars]
+                for start in range(0, max(1, len(text) - overlap * CHARS_PER_TOKEN), step_chars)]
+
+
+class TokenStats:
+    """Thread-safe distribution of prompt token counts."""
+
+    def __init__(self):
+        self.samples = []
+        self.comments = 0
+        self._lock = threading.Lock()
+
+    def record(self, tokens, comments=1):
+        """
+        Record one prompt.
+
+        Args:
+            tokens (int): Prompt tokens
+            comments (int): Comments classified by the prompt
+        """
+        with self._lock:
+            self.samples.append(tokens)
+            self.comments += comments
+
+    def summary(self):
+        """
+        Summarize the recorded prompts.
+
+        Returns:
+            dict: Count, total, mean, percentiles and max of prompt tokens, plus tokens per comment
+        """
+        with self._lock:
+            samples = sorted(self.samples)
+            comments = self.comments
+        if not samples:
+            return {"prompts": 0}
+
+        def percentile(p):
+            return samples[min(len(samples) - 1, int(p / 100 * len(samples)))]
+
+        total = sum(samples)
+        return {
+            "prompts": len(samples),
+            "total": total,
+            "mean": round(total / len(samples), 1),
+            "p50": percentile(50),
+            "p90": percentile(90),
+            "p99": percentile(99),
+            "max": samples[-1],
+            "per_comment": round(total / comments, 1) if comments else None,
+        }
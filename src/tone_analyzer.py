@@ -8,19 +8,23 @@ import time
 import logging
 from pathlib import Path
 from openai import OpenAI
+from llm_cache import LLMResponseCache
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, 
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Bump when the analysis prompts change so cached responses are not reused
+PROMPT_VERSION = "tone-v1"
+
 class MapReduceToneAnalyzer:
     """
     Analyzes user tone, style, and language usage using map-reduce approach.
     Processes large comment datasets by breaking them into manageable chunks.
     """
     
-    def __init__(self, api_key=None, model="gpt-4o-mini", rate_limit_delay=0.5):
+    def __init__(self, api_key=None, model="gpt-4o-mini", rate_limit_delay=0.5, llm_cache=None):
         """
         Initialize with OpenAI API key.
         
@@ -28,6 +32,7 @@ class MapReduceToneAnalyzer:
             api_key (str): OpenAI API key
             model (str): OpenAI model to use
             rate_limit_delay (float): Delay between API calls (seconds)
+            llm_cache (LLMResponseCache, optional): Persistent cache of responses to identical prompts
         """
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         if not self.api_key:
@@ -37,6 +42,7 @@ class MapReduceToneAnalyzer:
         self.client = OpenAI(api_key=self.api_key)
         self.model = model
         self.rate_limit_delay = rate_limit_delay
+        self.llm_cache = llm_cache
         
         # Constants for token management
         self.COMPLETION_TOKEN_BUFFER_RATIO = 0.2  # 20% of context window for completion buffer
@@ -88,6 +94,39 @@ class MapReduceToneAnalyzer:
         logger.info(f"Analysis complete! Results saved to {output_file}")
         return analysis
         
+    def _chat(self, system_prompt, user_prompt):
+        """
+        Send a chat completion request, answering from the response cache when possible.
+        
+        Args:
+            system_prompt (str): System message
+            user_prompt (str): User message
+            
+        Returns:
+            str: Stripped response content
+        """
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+        cache_key = None
+        if self.llm_cache:
+            cache_key = LLMResponseCache.make_key(self.model, messages, temperature=0, prompt_version=PROMPT_VERSION)
+            cached = self.llm_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=0
+        )
+        content = response.choices[0].message.content.strip()
+        
+        if cache_key:
+            self.llm_cache.put(cache_key, content)
+        return content
+        
     def _map_reduce_analysis(self, comments, max_context_size):
         """
         Process comments using map-reduce approach.
@@ -155,15 +194,7 @@ Here is the list of comments:
 
         try:
             # Call OpenAI API
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0
-            )
-            content = response.choices[0].message.content.strip()
+            content = self._chat(system_prompt, user_prompt)
             
             # Create output with raw text only
             analysis = {
@@ -225,15 +256,7 @@ Here are the analyses to combine:
 
         try:
             # Call OpenAI API for meta-analysis
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0
-            )
-            content = response.choices[0].message.content.strip()
+            content = self._chat(system_prompt, user_prompt)
             
             # Create output with raw text only
             combined_analysis = {
@@ -351,14 +374,20 @@ def main():
                       help="OpenAI model to use (default: gpt-4o-mini)")
     parser.add_argument("--delay", type=float, default=0.5,
                       help="Delay between API calls in seconds (default: 0.5)")
+    parser.add_argument("--cache-file", type=str,
+                      help="SQLite file caching model responses to identical prompts (default: no cache)")
+    parser.add_argument("--bypass-cache", action="store_true",
+                      help="Ignore cached responses (fresh answers are still written to the cache)")
     
     args = parser.parse_args()
     
     try:
+        llm_cache = LLMResponseCache(args.cache_file, bypass=args.bypass_cache) if args.cache_file else None
         analyzer = MapReduceToneAnalyzer(
             api_key=args.api_key,
             model=args.model,
-            rate_limit_delay=args.delay
+            rate_limit_delay=args.delay,
+            llm_cache=llm_cache
         )
         
         analyzer.analyze_tone(
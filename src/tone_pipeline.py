@@ -8,6 +8,7 @@ import logging
 import argparse
 from pathlib import Path
 from src.tone_analyzer import MapReduceToneAnalyzer
+from src.llm_cache import LLMResponseCache
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, 
@@ -20,7 +21,7 @@ class ToneAnalysisPipeline:
     This pipeline is separate from other analysis pipelines.
     """
     
-    def __init__(self, api_key=None, model="gpt-4o-mini", data_dir="data"):
+    def __init__(self, api_key=None, model="gpt-4o-mini", data_dir="data", llm_cache=None):
         """
         Initialize the pipeline.
         
@@ -28,6 +29,7 @@ class ToneAnalysisPipeline:
             api_key (str): OpenAI API key
             model (str): OpenAI model to use
             data_dir (str): Directory for input/output data
+            llm_cache (LLMResponseCache, optional): Persistent cache of responses to identical prompts
         """
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         self.model = model
@@ -36,7 +38,8 @@ class ToneAnalysisPipeline:
         # Initialize the tone analyzer
         self.analyzer = MapReduceToneAnalyzer(
             api_key=self.api_key,
-            model=self.model
+            model=self.model,
+            llm_cache=llm_cache
         )
         
     def run(self, input_file, output_dir=None, file_pattern="*.json"):
@@ -214,14 +217,28 @@ def main():
                         help="Process all repositories in data directory")
     parser.add_argument("--repo", type=str,
                         help="Process specific repository (format: owner/name or path)")
+    parser.add_argument("--cache", action="store_true",
+                        help="Reuse model responses from the LLM response cache (off by default)")
+    parser.add_argument("--cache-file", type=str,
+                        help="SQLite file caching model responses; implies --cache (default: <data-dir>/llm_cache.sqlite)")
+    parser.add_argument("--bypass-cache", action="store_true",
+                        help="Ignore cached responses (fresh answers are still written to the cache)")
     
     args = parser.parse_args()
     
     try:
+        llm_cache = None
+        if args.cache or args.cache_file:
+            llm_cache = LLMResponseCache(
+                args.cache_file or os.path.join(args.data_dir, "llm_cache.sqlite"),
+                bypass=args.bypass_cache
+            )
+        
         pipeline = ToneAnalysisPipeline(
             api_key=args.api_key,
             model=args.model,
-            data_dir=args.data_dir
+            data_dir=args.data_dir,
+            llm_cache=llm_cache
         )
         
         if args.process_all: